@@ -1,25 +1,68 @@
-import argparse
-import concurrent.futures
-import json
-import sys
-from collections import defaultdict
-from functools import partial
-from pathlib import Path
-from typing import Sequence, Mapping
-
-import numpy as np
-import rawpy
-from PySide6.QtCore import QFile, QIODevice, QDir, QFileInfo, QModelIndex, Qt, QStringListModel
-from PySide6.QtGui import QPixmap, QIcon
-from PySide6.QtUiTools import QUiLoader
-from PySide6.QtWidgets import (
-    QApplication, QGraphicsScene, QFileDialog, QFileSystemModel, QListView, QFileIconProvider, QCompleter
+import time
+
+# Before the Qt and the other imports, so that --startup-timing includes the time they take
+STARTED_AT = time.perf_counter()
+
+import argparse  # noqa: E402
+import bisect  # noqa: E402
+import sys  # noqa: E402
+from array import array  # noqa: E402
+from pathlib import Path  # noqa: E402
+from typing import TYPE_CHECKING, Iterable, Mapping, Sequence  # noqa: E402
+
+from PySide6.QtCore import (  # noqa: E402
+    QModelIndex, Qt, QStringListModel, QObject, QRunnable, QThreadPool, QTimer,
+    Signal, QFileSystemWatcher, QAbstractListModel
+)
+from PySide6.QtGui import QPixmap, QIcon, QImage, QKeySequence, QShortcut  # noqa: E402
+from PySide6.QtWidgets import (  # noqa: E402
+    QApplication, QGraphicsScene, QGraphicsView, QFileDialog, QListView, QFileIconProvider, QCompleter, QLabel,
+    QMainWindow
 )
 
+from dataset_image_annotator import thumbs  # noqa: E402
+from dataset_image_annotator.cache import LRUCache  # noqa: E402
+from dataset_image_annotator.filtering import filter_file_names  # noqa: E402
+from dataset_image_annotator.metadata import (  # noqa: E402
+    METADATA_BACKENDS, JSONMetadataBackend, MetadataWriter, get_metadata_dir_path, open_metadata_backend
+)
+from dataset_image_annotator.packed_thumbs import open_packed_store  # noqa: E402
+from dataset_image_annotator.preview_cache import (  # noqa: E402
+    PreviewDiskCache, get_default_preview_cache_dir, open_preview_cache
+)
+from dataset_image_annotator.scanner import IMAGE_EXTENSIONS, is_raw_file, parse_extensions  # noqa: E402
+from dataset_image_annotator.similarity import (  # noqa: E402
+    DEFAULT_MAX_DISTANCE, collapse_file_names, get_group_members, group_similar, update_image_hashes
+)
+from dataset_image_annotator.ui_main_window import Ui_MainWindow  # noqa: E402
+from dataset_image_annotator.vocabulary import (  # noqa: E402
+    VOCABULARY_FIELDS, VocabularyIndex, load_vocabulary, save_vocabulary
+)
+from dataset_image_annotator.watch import DirectorySnapshot  # noqa: E402
+
+# numpy and rawpy are only needed once images are decoded, in worker threads, after the window is up
+if TYPE_CHECKING:
+    import numpy as np
+
 
 def get_parsed_args():
     parser = argparse.ArgumentParser(add_help=False)
     parser.add_argument('--data-root', type=str)
+    parser.add_argument('--packed-thumbnails', action='store_true')
+    parser.add_argument('--pixmap-cache-mb', type=int, default=512)
+    parser.add_argument('--prefetch-count', type=int, default=3)
+    parser.add_argument('--prefetch-mb', type=int, default=256)
+    parser.add_argument('--metadata-flush-delay-ms', type=int, default=1000)
+    parser.add_argument('--metadata-backend', choices=tuple(METADATA_BACKENDS), default='json')
+    parser.add_argument('--sort-by', choices=RawImageListModel.SORT_KEYS, default='name')
+    parser.add_argument('--extensions', type=str, help='comma separated, all supported image formats by default')
+    parser.add_argument('--develop', action='store_true', help='develop selected raw images at full resolution')
+    parser.add_argument('--preview-cache-dir', type=str)
+    parser.add_argument('--preview-cache-mb', type=int, default=0,
+                        help='size of the disk cache of re-encoded previews, 0 (the default) shows the embedded JPEG')
+    parser.add_argument('--burst-distance', type=int, default=DEFAULT_MAX_DISTANCE,
+                        help='max perceptual hash distance (of 64 bits) of near-duplicates, 0 disables grouping')
+    parser.add_argument('--startup-timing', action='store_true', help='print startup milestones to stderr')
     # parser.add_argument('--datasets', metavar='DS', type=str, nargs='+')
 
     args, args_other = parser.parse_known_args()
@@ -27,152 +70,699 @@ def get_parsed_args():
     return args
 
 
-def list_dir(path: Path, mask: str) -> Sequence[Path]:
-    if path.is_dir():
-        files = sorted(path.glob(mask))
+def get_pixmap_size(pixmap: QPixmap) -> int:
+    return pixmap.width() * pixmap.height() * pixmap.depth() // 8
+
+
+def get_preview_cache_key(file_path: Path) -> tuple[str, str, int]:
+    return 'preview', str(file_path), file_path.stat().st_mtime_ns
+
+
+def update_string_list(model: QStringListModel, values: Sequence[str]):
+    """
+    Removes the strings that are not in values and inserts the new ones where values has them, row by row: resetting
+    the model would close a popup showing it. The strings already there keep their order.
+    """
+    old_values = model.stringList()
+    value_set = set(values)
+    old_value_set = set(old_values)
+
+    for row in reversed(range(len(old_values))):
+        if old_values[row] not in value_set:
+            model.removeRows(row, 1)
+
+    for row, value in enumerate(values):
+        if value not in old_value_set:
+            row = min(row, model.rowCount())
+            model.insertRows(row, 1)
+            model.setData(model.index(row), value)
+
+
+def get_rgb_image(rgb: 'np.ndarray') -> QImage:
+    import numpy as np
+
+    rgb = np.ascontiguousarray(rgb)
+    height, width = rgb.shape[:2]
+
+    # copy(): the QImage must not outlive the array it wraps
+    return QImage(rgb.data, width, height, rgb.strides[0], QImage.Format.Format_RGB888).copy()
+
+
+def get_image_tiles(image: QImage, tile_size: int = 1024) -> list[tuple[int, int, QImage]]:
+    return [
+        (x, y, image.copy(x, y, min(tile_size, image.width() - x), min(tile_size, image.height() - y)))
+        for y in range(0, image.height(), tile_size)
+        for x in range(0, image.width(), tile_size)
+    ]
+
+
+def load_preview_image(file_path: Path, preview_cache: PreviewDiskCache | None = None) -> QImage:
+    import rawpy
+
+    image = QImage()
+
+    if preview_cache is not None:
+        image.loadFromData(thumbs.get_cached_preview(file_path, preview_cache))
+    elif not is_raw_file(file_path):
+        image.load(str(file_path))
+    elif (thumb := thumbs.get_raw_thumbnail(file_path)) is None:
+        image = get_rgb_image(thumbs.develop_raw(file_path, half_size=True))
+    elif thumb.format == rawpy.ThumbFormat.JPEG:
+        image.loadFromData(thumb.data)
     else:
-        raise FileNotFoundError('Path must be directory')
+        image = get_rgb_image(thumb.data)
 
-    return files
+    return image
 
 
-def list_dir_images(path: Path) -> Sequence[Path]:
-    return list_dir(path, '*.ARW')
+class StartupTimer:
+    """
+    Milestones since the process started importing this module, printed to stderr once the initial data root
+    is loaded.
+    """
 
+    def __init__(self, enabled: bool = False, started_at: float = STARTED_AT):
+        self.enabled = enabled
+        self.started_at = started_at
+        self.marks: list[tuple[str, float]] = []
 
-def list_dir_metadata(path: Path) -> Sequence[Path] | None:
-    metadata_dir_path = Path(path, '.metadata')
+    def mark(self, label: str):
+        if self.enabled:
+            self.marks.append((label, time.perf_counter()))
 
-    if metadata_dir_path.exists():
-        return list_dir(metadata_dir_path, '*.json')
+    def report(self):
+        if not self.enabled or not self.marks:
+            return
 
-    return None
+        previous_at = self.started_at
 
+        for label, marked_at in self.marks:
+            print(
+                f'{label}: {(marked_at - self.started_at) * 1000:.0f} ms (+{(marked_at - previous_at) * 1000:.0f} ms)',
+                file=sys.stderr
+            )
+            previous_at = marked_at
 
-def load_metadata(data_root_path: Path):
-    metadata = defaultdict(dict)
-    metadata_files = list_dir_metadata(data_root_path)
+        self.marks.clear()
 
-    if metadata_files:
-        for metadata_file in metadata_files:
-            try:
-                with open(metadata_file, 'r') as f:
-                    metadata[metadata_file.name.lower()] = json.load(f)
-            except FileNotFoundError:
-                pass
 
-    return metadata
+class MainWindowForm(QMainWindow, Ui_MainWindow):
+    """
+    The window built by the form compiled from main_window.ui (pyside6-uic), rather than parsed with QUiLoader
+    at every start. Emits first_painted once the window has been painted for the first time.
+    """
+    first_painted = Signal()
+
+    def __init__(self):
+        super().__init__()
+        self.setupUi(self)
+        self.is_painted = False
 
+    def paintEvent(self, event):
+        super().paintEvent(event)
 
-def save_metadata(data_root_path: Path, file_name: str, metadata: Mapping):
-    metadata_dir_path = Path(data_root_path, '.metadata')
-    metadata_file_path = Path(metadata_dir_path, f'{file_name.lower()}.json')
+        if not self.is_painted:
+            self.is_painted = True
+            # Queued, so the frame is on screen before any slow work starts
+            QTimer.singleShot(0, self.first_painted.emit)
 
-    metadata_dir_path.mkdir(exist_ok=True)
 
-    with open(metadata_file_path, 'w') as f:
-        json.dump(metadata, f)
+class ThumbnailTask(QRunnable):
+    def __init__(self, loader: 'ThumbnailLoader', file_path: Path):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.loader = loader
+        self.file_path = file_path
 
+    def run(self):
+        thumbnail_dir_path = thumbs.get_thumbnail_dir_path(self.file_path.parent)
+        is_successful = True
 
-def get_raw_thumbnail(path: Path):
-    with rawpy.imread(str(path)) as raw:
         try:
-            thumb = raw.extract_thumb()
-        except rawpy.LibRawNoThumbnailError:
-            print('no thumbnail found')
-        except rawpy.LibRawUnsupportedThumbnailError:
-            print('unsupported thumbnail')
+            # The batch generator may have produced it since this task was queued
+            if not thumbs.is_thumbnail_fresh(thumbnail_dir_path, self.file_path, self.loader.packed):
+                thumbnail_dir_path.mkdir(exist_ok=True)
+                thumbs.generate_thumbnail(thumbnail_dir_path, self.file_path, self.loader.packed)
+        except Exception as e:
+            print(f'Cannot generate thumbnail for {self.file_path}: {e}')
+            is_successful = False
+
+        self.loader.thumbnail_finished.emit(str(self.file_path), is_successful)
+
+
+class PackFlushTask(QRunnable):
+    def __init__(self, thumbnail_dir_path: Path):
+        super().__init__()
+        self.thumbnail_dir_path = thumbnail_dir_path
+
+    def run(self):
+        # Saves the index and may rewrite the whole pack, which must not hold up the GUI thread
+        try:
+            open_packed_store(self.thumbnail_dir_path).flush()
+        except OSError as e:
+            print(f'Cannot save packed thumbnails in {self.thumbnail_dir_path}: {e}')
+
+
+class GroupTask(QRunnable):
+    def __init__(self, batch: 'ThumbnailBatch', data_root_path: Path, packed: bool,
+                 entries: Mapping[str, tuple[int, int]], burst_distance: int):
+        super().__init__()
+        self.batch = batch
+        self.data_root_path = data_root_path
+        self.packed = packed
+        self.entries = entries
+        self.burst_distance = burst_distance
+
+    def group(self):
+        # Hashed from the thumbnails, so only once they are there. Hashes of unchanged images are reused.
+        try:
+            hashes = update_image_hashes(self.data_root_path, self.entries, self.packed)
+        except Exception as e:
+            print(f'Cannot hash images of {self.data_root_path}: {e}')
         else:
-            return thumb
+            self.batch.grouped.emit(str(self.data_root_path), group_similar(hashes, self.burst_distance))
 
+    def run(self):
+        self.group()
 
-def generate_thumbnail(thumbnail_dir_path: Path, path: Path) -> QPixmap:
-    thumbnail = get_raw_thumbnail(path)
 
-    thumb_pixmap = QPixmap()
-    thumb_pixmap.loadFromData(thumbnail)
+class ThumbnailBatchTask(GroupTask):
+    def __init__(self, batch: 'ThumbnailBatch', data_root_path: Path, packed: bool,
+                 entries: Mapping[str, tuple[int, int]], burst_distance: int):
+        super().__init__(batch, data_root_path, packed, entries, burst_distance)
 
-    thumbnail_path = thumbnail_dir_path / f'anon_{path.name}.jpg'
+    def on_progress(self, done: int, total: int, file_path: Path, error: Exception | None):
+        self.batch.progress.emit(str(self.data_root_path), done, total, str(file_path), str(error) if error else '')
+
+    def run(self):
+        try:
+            errors = thumbs.generate_thumbnails(self.data_root_path, progress_callback=self.on_progress,
+                                                packed=self.packed, entries=self.entries)
+        except Exception as e:
+            print(f'Cannot generate thumbnails for {self.data_root_path}: {e}')
+            errors = {self.data_root_path: e}
 
-    f = QFile(thumbnail_path)
-    f.open(QIODevice.OpenModeFlag.WriteOnly)
+        self.batch.finished.emit(str(self.data_root_path), len(errors))
 
-    try:
-        thumb_pixmap.save(f, 'JPG')
-    finally:
-        f.close()
+        if self.burst_distance > 0:
+            self.group()
 
-    thumb_pixmap = thumb_pixmap.scaledToWidth(80)
-    thumbnail_path = thumbnail_dir_path / f'{path.name}.jpg'
 
-    f = QFile(thumbnail_path)
-    f.open(QIODevice.OpenModeFlag.WriteOnly)
+class ThumbnailBatch(QObject):
+    progress = Signal(str, int, int, str, str)
+    finished = Signal(str, int)
+    grouped = Signal(str, object)
 
-    try:
-        thumb_pixmap.save(f, 'JPG')
-    finally:
-        f.close()
+    def __init__(self, parent: QObject | None = None):
+        super().__init__(parent)
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(1)
+
+    def start(self, data_root_path: Path, packed: bool, entries: Mapping[str, tuple[int, int]],
+              burst_distance: int = 0):
+        # entries come from the directory scan the image list was built from, the batch does not scan again
+        self.thread_pool.start(ThumbnailBatchTask(self, data_root_path, packed, dict(entries), burst_distance))
+
+    def regroup(self, data_root_path: Path, packed: bool, entries: Mapping[str, tuple[int, int]],
+                burst_distance: int):
+        # Same single thread as the batch, so it runs after a batch in progress rather than alongside it
+        self.thread_pool.start(GroupTask(self, data_root_path, packed, dict(entries), burst_distance))
+
+
+class PreviewTask(QRunnable):
+    def __init__(self, loader: 'PreviewLoader', cache_key: tuple, file_path: Path):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.loader = loader
+        self.cache_key = cache_key
+        self.file_path = file_path
+
+    def run(self):
+        try:
+            image = load_preview_image(self.file_path, self.loader.open_preview_cache())
+        except Exception as e:
+            print(f'Cannot load preview of {self.file_path}: {e}')
+            image = QImage()
+
+        self.loader.preview_loaded.emit(self.cache_key, image)
+
+
+class PreviewLoader(QObject):
+    preview_loaded = Signal(object, QImage)
+
+    def __init__(self, preview_cache_dir_path: Path | None = None, preview_cache_size: int = 0,
+                 parent: QObject | None = None):
+        super().__init__(parent)
+        self.preview_cache_dir_path = preview_cache_dir_path
+        self.preview_cache_size = preview_cache_size
+        self.preview_cache: PreviewDiskCache | None = None
+        self.thread_pool = QThreadPool(self)
+        self.pending: dict[tuple, PreviewTask] = {}
+        self.preview_loaded.connect(self.on_preview_loaded)
+
+    def open_preview_cache(self) -> PreviewDiskCache | None:
+        # Opening scans the whole cache directory: done by the first preview task, in its thread, rather than before
+        # the window shows up. open_preview_cache() hands concurrent tasks the same instance.
+        if self.preview_cache is None and self.preview_cache_dir_path is not None:
+            self.preview_cache = open_preview_cache(self.preview_cache_dir_path, self.preview_cache_size)
+
+        return self.preview_cache
+
+    def request(self, cache_key: tuple, file_path: Path, priority: int = 0):
+        if task := self.pending.get(cache_key):
+            # Already queued as a prefetch: requeue it with the new priority unless it is being decoded already
+            if not self.thread_pool.tryTake(task):
+                return
+        else:
+            task = PreviewTask(self, cache_key, file_path)
+            self.pending[cache_key] = task
 
-    return thumb_pixmap
+        self.thread_pool.start(task, priority)
 
+    def cancel_pending(self, keep: set[tuple]):
+        for cache_key, task in tuple(self.pending.items()):
+            if cache_key not in keep and self.thread_pool.tryTake(task):
+                del self.pending[cache_key]
 
-def generate_thumbnails(path: Path):
-    arw_files = tuple(f for f in path.iterdir() if f.is_file() and f.name.lower().endswith('.arw'))
+    def on_preview_loaded(self, cache_key: tuple, image: QImage):
+        self.pending.pop(cache_key, None)
 
-    if arw_files:
-        thumbnail_dir_path = path / '.thumbs'
-        thumbnail_dir_path.mkdir(exist_ok=True)
-        generate_thumbnail_partial = partial(generate_thumbnail, thumbnail_dir_path)
 
-        # tuple(map(generate_thumbnail_partial, arw_files))
-        with concurrent.futures.ProcessPoolExecutor() as executor:
-            executor.map(generate_thumbnail_partial, arw_files)
+class DevelopTask(QRunnable):
+    def __init__(self, loader: 'DevelopLoader', cache_key: tuple, file_path: Path):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.loader = loader
+        self.cache_key = cache_key
+        self.file_path = file_path
+        self.is_cancelled = False
+
+    def run(self):
+        # Half size first so something sharper than the embedded preview shows up quickly
+        for half_size in (True, False):
+            if self.is_cancelled:
+                break
+
+            try:
+                image = get_rgb_image(thumbs.develop_raw(self.file_path, half_size))
+            except Exception as e:
+                print(f'Cannot develop {self.file_path}: {e}')
+                break
+
+            # Tiles are cut here rather than in the GUI thread, which then only uploads the visible ones
+            self.loader.developed.emit(self.cache_key, get_image_tiles(image), 2 if half_size else 1, not half_size)
+
+        self.loader.develop_finished.emit(self.cache_key)
+
+
+class DevelopLoader(QObject):
+    """
+    Full resolution raw development of the selected image in a small thread pool (LibRaw releases the GIL).
+    Emits developed(cache key, [(x, y, tile)], scale, is_final) once per pass: half size, then full size.
+    """
+    developed = Signal(object, object, int, bool)
+    develop_finished = Signal(object)
+
+    def __init__(self, parent: QObject | None = None):
+        super().__init__(parent)
+        self.thread_pool = QThreadPool(self)
+        # A running develop cannot be interrupted, the second thread lets the next selection start meanwhile
+        self.thread_pool.setMaxThreadCount(2)
+        self.pending: dict[tuple, DevelopTask] = {}
+        self.develop_finished.connect(self.on_develop_finished)
+
+    def request(self, cache_key: tuple, file_path: Path):
+        for pending_cache_key, task in tuple(self.pending.items()):
+            if pending_cache_key != cache_key:
+                task.is_cancelled = True
+
+                if self.thread_pool.tryTake(task):
+                    del self.pending[pending_cache_key]
+
+        if cache_key not in self.pending:
+            task = self.pending[cache_key] = DevelopTask(self, cache_key, file_path)
+            self.thread_pool.start(task)
+
+    def on_develop_finished(self, cache_key: tuple):
+        self.pending.pop(cache_key, None)
+
+
+class ThumbnailLoader(QObject):
+    thumbnail_finished = Signal(str, bool)
+    thumbnail_ready = Signal(str)
+
+    def __init__(self, packed: bool = False, parent: QObject | None = None):
+        super().__init__(parent)
+        self.packed = packed
+        self.thread_pool = QThreadPool(self)
+        self.pending: dict[str, ThumbnailTask] = {}
+        self.failed: set[str] = set()
+        self.priority = 0
+        self.thumbnail_finished.connect(self.on_thumbnail_finished)
+
+    def request(self, file_path: str):
+        if file_path in self.pending or file_path in self.failed:
+            return
+
+        # Latest requests come from rows that have just been scrolled into view, so they are served first
+        self.priority += 1
+        task = ThumbnailTask(self, Path(file_path))
+        self.pending[file_path] = task
+        self.thread_pool.start(task, self.priority)
+
+    def cancel_pending(self, keep: set[str]):
+        for file_path, task in tuple(self.pending.items()):
+            if file_path not in keep and self.thread_pool.tryTake(task):
+                del self.pending[file_path]
+
+    def clear(self):
+        self.cancel_pending(set())
+        self.failed.clear()
+
+    def refresh(self, file_path: str):
+        self.failed.discard(file_path)
+        self.request(file_path)
+
+    def on_thumbnail_finished(self, file_path: str, is_successful: bool):
+        self.pending.pop(file_path, None)
+
+        if is_successful:
+            self.thumbnail_ready.emit(file_path)
+        else:
+            self.failed.add(file_path)
+
+        if self.packed and not self.pending:
+            self.thread_pool.start(PackFlushTask(thumbs.get_thumbnail_dir_path(Path(file_path).parent)))
 
 
 class RawIconProvider(QFileIconProvider):
-    def icon(self, file_info: QFileInfo) -> QIcon:
-        if isinstance(file_info, QFileInfo):
-            file_path = file_info.absoluteFilePath()
-            file_name = file_info.fileName().lower()
+    def __init__(self, thumbnail_loader: ThumbnailLoader, pixmap_cache: LRUCache, packed: bool = False):
+        super().__init__()
+        self.thumbnail_loader = thumbnail_loader
+        self.pixmap_cache = pixmap_cache
+        self.packed = packed
+        self.placeholder_icon = super().icon(self.IconType.File)
 
-            if file_name.endswith('.arw'):
-                thumbnail_dir_path = Path(f'{Path(file_path).parent}/.thumbs')
+    def get_thumbnail_pixmap(self, file_path: Path, mtime_ms: int, size: int) -> QPixmap | None:
+        cache_key = ('thumbnail', str(file_path), mtime_ms)
 
-                thumbnail_dir_path.mkdir(exist_ok=True)
-                thumbnail_path = Path(f'{thumbnail_dir_path}/{file_name}.jpg')
+        if (thumb_pixmap := self.pixmap_cache.get(cache_key)) is not None:
+            return thumb_pixmap
+
+        thumbnail_dir_path = thumbs.get_thumbnail_dir_path(file_path.parent)
+        thumbnail_data = None
 
-                if thumbnail_path.exists():
-                    thumb_pixmap = QPixmap()
-                    thumb_pixmap.load(str(thumbnail_path))
-                else:
-                    thumb_pixmap = generate_thumbnail(thumbnail_dir_path, Path(file_path))
+        # Without packed thumbnails no store is opened, i.e. no index is read and kept for each directory
+        if self.packed:
+            thumbnail_data = open_packed_store(thumbnail_dir_path).get(file_path.name, mtime_ms, size)
 
-                return QIcon(thumb_pixmap)
+        if thumbnail_data is not None:
+            thumb_pixmap = QPixmap()
+            thumb_pixmap.loadFromData(thumbnail_data)
+        else:
+            thumbnail_path = thumbs.get_thumbnail_path(thumbnail_dir_path, file_path)
 
-            return super().icon(self.IconType.File)
+            try:
+                if thumbnail_path.stat().st_mtime_ns // 1_000_000 < mtime_ms:
+                    return None
+            except FileNotFoundError:
+                return None
 
+            thumb_pixmap = QPixmap()
+            thumb_pixmap.load(str(thumbnail_path))
 
-class MainWindow:
-    def __init__(self, data_root_path: Path):
-        self.data_root_path: Path | None = None
-        self.metadata = defaultdict(dict)
-        self.selected_file_name: str | None = None
-        self.types = set()
-        self.makes = set()
-        self.models = set()
-        self.bodies = set()
-        self.colors = set()
+        self.pixmap_cache.put(cache_key, thumb_pixmap)
+
+        return thumb_pixmap
 
-        ui_file_name = 'main_window.ui'
-        ui_file = QFile(Path(__file__).resolve().parent / ui_file_name)
+    def get_icon(self, file_path: Path, mtime_ms: int, size: int) -> QIcon:
+        if (thumb_pixmap := self.get_thumbnail_pixmap(file_path, mtime_ms, size)) is not None:
+            return QIcon(thumb_pixmap)
 
-        if not ui_file.open(QIODevice.OpenModeFlag.ReadOnly):
-            print(f'Cannot open {ui_file_name}: {ui_file.errorString()}')
-            sys.exit(-1)
+        self.thumbnail_loader.request(str(file_path))
 
-        loader = QUiLoader()
-        self.window = loader.load(ui_file)
-        ui_file.close()
+        return self.placeholder_icon
+
+
+class RawImageListModel(QAbstractListModel):
+    """
+    Flat list of the images of one directory, filled from a single directory scan and kept in compact arrays.
+    Rows are exposed to the view in batches through canFetchMore()/fetchMore().
+    An optional set of lowercased file names restricts the rows to the matches of a filter.
+    """
+    SORT_KEYS = ('name', 'mtime')
+    FETCH_BATCH_SIZE = 1000
+
+    def __init__(self, icon_provider: RawIconProvider, sort_key: str = 'name', parent: QObject | None = None):
+        super().__init__(parent)
+        self.icon_provider = icon_provider
+        self.sort_key = sort_key
+        self.dir_path: Path | None = None
+        self.entries: dict[str, tuple[int, int]] = {}
+        self.filter_names: set[str] | None = None
+        self.names: list[str] = []
+        self.mtimes = array('q')
+        self.sizes = array('q')
+        self.rows_by_name: dict[str, int] = {}
+        self.fetched_count = 0
+
+    def set_entries(self, dir_path: Path, entries: Mapping[str, tuple[int, int]]):
+        self.dir_path = dir_path
+        self.entries = dict(entries)
+        self.apply_entries()
+
+    def set_filter(self, filter_names: set[str] | None):
+        self.filter_names = filter_names
+        self.apply_entries()
+
+    def is_filtered_out(self, name: str) -> bool:
+        return self.filter_names is not None and name.lower() not in self.filter_names
+
+    def apply_entries(self):
+        entries = self.entries
+
+        if self.filter_names is not None:
+            entries = {name: key for name, key in entries.items() if name.lower() in self.filter_names}
+
+        if self.sort_key == 'mtime':
+            names = sorted(entries, key=lambda name: (entries[name][0], name))
+        else:
+            names = sorted(entries)
+
+        self.beginResetModel()
+        self.names = names
+        self.mtimes = array('q', (entries[name][0] for name in names))
+        self.sizes = array('q', (entries[name][1] for name in names))
+        self.rows_by_name = {name: row for row, name in enumerate(names)}
+        self.fetched_count = min(len(names), self.FETCH_BATCH_SIZE)
+        self.endResetModel()
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else self.fetched_count
+
+    def canFetchMore(self, parent: QModelIndex = QModelIndex()) -> bool:
+        return not parent.isValid() and self.fetched_count < len(self.names)
+
+    def fetchMore(self, parent: QModelIndex = QModelIndex()):
+        if parent.isValid():
+            return
+
+        count = min(len(self.names) - self.fetched_count, self.FETCH_BATCH_SIZE)
+
+        if count > 0:
+            self.beginInsertRows(QModelIndex(), self.fetched_count, self.fetched_count + count - 1)
+            self.fetched_count += count
+            self.endInsertRows()
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= self.fetched_count:
+            return None
+
+        row = index.row()
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self.names[row]
+
+        if role == Qt.ItemDataRole.DecorationRole:
+            return self.icon_provider.get_icon(self.get_file_path(row), self.mtimes[row] // 1_000_000, self.sizes[row])
+
+        return None
+
+    def get_file_path(self, row: int) -> Path:
+        return Path(self.dir_path, self.names[row])
+
+    def get_mtime_ms(self, row: int) -> int:
+        return self.mtimes[row] // 1_000_000
+
+    def index_of_path(self, file_path: str | Path) -> QModelIndex:
+        file_path = Path(file_path)
+        row = self.rows_by_name.get(file_path.name, -1)
+
+        if file_path.parent != self.dir_path or not 0 <= row < self.fetched_count:
+            return QModelIndex()
+
+        return self.index(row, 0)
+
+    def remove_entries(self, names: Iterable[str]):
+        names = tuple(names)
+
+        for name in names:
+            self.entries.pop(name, None)
+
+        rows = sorted((row for name in names if (row := self.rows_by_name.get(name)) is not None), reverse=True)
+
+        if not rows:
+            return
+
+        # Bottom up, so the rows still to be removed keep their positions
+        for row in rows:
+            is_fetched = row < self.fetched_count
+
+            if is_fetched:
+                self.beginRemoveRows(QModelIndex(), row, row)
+
+            del self.names[row]
+            del self.mtimes[row]
+            del self.sizes[row]
+
+            if is_fetched:
+                self.fetched_count -= 1
+                self.endRemoveRows()
+
+        self.rows_by_name = {name: row for row, name in enumerate(self.names)}
+
+    def get_sort_key(self, row: int) -> tuple[int, str] | str:
+        # The same order as apply_entries()
+        return (self.mtimes[row], self.names[row]) if self.sort_key == 'mtime' else self.names[row]
+
+    def add_entries(self, entries: Mapping[str, tuple[int, int]]):
+        """
+        Inserts each new file at its sorted position. It only shows up in the view if that position has been
+        fetched already, or is right after the last row.
+        """
+        for name, (mtime_ns, size) in entries.items():
+            if name in self.rows_by_name:
+                self.update_entry(name, mtime_ns, size)
+                continue
+
+            self.entries[name] = (mtime_ns, size)
+
+            if self.is_filtered_out(name):
+                continue
+
+            sort_key = (mtime_ns, name) if self.sort_key == 'mtime' else name
+            row = bisect.bisect_right(range(len(self.names)), sort_key, key=self.get_sort_key)
+            is_fetched = row < self.fetched_count or row == self.fetched_count == len(self.names)
+
+            if is_fetched:
+                self.beginInsertRows(QModelIndex(), row, row)
+
+            self.names.insert(row, name)
+            self.mtimes.insert(row, mtime_ns)
+            self.sizes.insert(row, size)
+
+            for shifted_row in range(row, len(self.names)):
+                self.rows_by_name[self.names[shifted_row]] = shifted_row
+
+            if is_fetched:
+                self.fetched_count += 1
+                self.endInsertRows()
+
+    def update_entry(self, name: str, mtime_ns: int, size: int):
+        if name in self.entries:
+            self.entries[name] = (mtime_ns, size)
+
+        if (row := self.rows_by_name.get(name)) is None:
+            return
+
+        if self.sort_key == 'mtime' and self.mtimes[row] != mtime_ns:
+            # Moves to its new sorted position
+            self.remove_entries((name,))
+            self.add_entries({name: (mtime_ns, size)})
+            return
+
+        self.mtimes[row] = mtime_ns
+        self.sizes[row] = size
+
+        if row < self.fetched_count:
+            index = self.index(row, 0)
+            self.dataChanged.emit(index, index, [Qt.ItemDataRole.DecorationRole])
+
+
+class MainWindow:
+    def __init__(self, data_root_path: Path, packed_thumbnails: bool = False, pixmap_cache_size: int = 512 << 20,
+                 prefetch_count: int = 3, prefetch_size: int = 256 << 20, metadata_flush_delay_ms: int = 1000,
+                 metadata_backend_name: str = 'json', image_sort_key: str = 'name',
+                 image_extensions: tuple[str, ...] = IMAGE_EXTENSIONS, develop: bool = False,
+                 preview_cache_dir_path: Path | None = None, preview_cache_size: int = 0,
+                 startup_timer: StartupTimer | None = None, burst_distance: int = DEFAULT_MAX_DISTANCE):
+        self.startup_timer = startup_timer or StartupTimer()
+        self.initial_data_root_path = data_root_path
+        self.data_root_path: Path | None = None
+        self.image_extensions = image_extensions
+        self.develop = develop
+        self.develop_loader = DevelopLoader()
+        self.develop_loader.developed.connect(self.on_developed)
+        self.is_developed_shown = False
+        self.packed_thumbnails = packed_thumbnails
+        self.pixmap_cache = LRUCache(pixmap_cache_size, get_pixmap_size)
+        self.prefetch_count = prefetch_count
+        self.prefetch_size = prefetch_size
+        self.preview_loader = PreviewLoader(preview_cache_dir_path, preview_cache_size)
+        self.preview_loader.preview_loaded.connect(self.on_preview_loaded)
+        self.metadata: dict[str, dict] = {}
+        # Images gone from the data root: their records stay on disk, but out of the vocabulary
+        self.removed_file_names: set[str] = set()
+        self.metadata_backend_name = metadata_backend_name
+        self.metadata_writer: MetadataWriter | None = None
+        self.metadata_flush_timer = QTimer()
+        self.metadata_flush_timer.setSingleShot(True)
+        self.metadata_flush_timer.setInterval(metadata_flush_delay_ms)
+        self.metadata_flush_timer.timeout.connect(self.flush_metadata)
+        # Field values typed for the selected image, by field
+        self.pending_edits: dict[str, str] = {}
+        self.selected_file_name: str | None = None
+        self.selected_preview_cache_key: tuple | None = None
+        self.last_preview_size = 0
+        self.vocabulary: VocabularyIndex | None = None
+        self.vocabulary_models = {field: QStringListModel() for field in VOCABULARY_FIELDS}
+        self.thumbnail_loader = ThumbnailLoader(packed_thumbnails)
+        self.thumbnail_loader.thumbnail_ready.connect(self.on_thumbnail_ready)
+        self.thumbnail_scroll_timer = QTimer()
+        self.thumbnail_scroll_timer.setSingleShot(True)
+        self.thumbnail_scroll_timer.setInterval(100)
+        self.thumbnail_scroll_timer.timeout.connect(self.cancel_invisible_thumbnails)
+        self.thumbnail_batch = ThumbnailBatch()
+        self.thumbnail_batch.progress.connect(self.on_thumbnail_batch_progress)
+        self.thumbnail_batch.finished.connect(self.on_thumbnail_batch_finished)
+        self.thumbnail_batch.grouped.connect(self.on_images_grouped)
+        self.burst_distance = burst_distance
+        self.image_groups: dict[str, str] = {}
+        self.image_group_members: dict[str, list[str]] = {}
+        # Added or modified by the watcher, they join the groups once their thumbnails exist
+        self.unhashed_file_paths: set[str] = set()
+        self.regroup_timer = QTimer()
+        self.regroup_timer.setSingleShot(True)
+        self.regroup_timer.setInterval(1000)
+        self.regroup_timer.timeout.connect(self.regroup_images)
+        self.icon_provider = RawIconProvider(self.thumbnail_loader, self.pixmap_cache, packed_thumbnails)
+        self.image_model = RawImageListModel(self.icon_provider, image_sort_key)
+        self.image_snapshot: DirectorySnapshot | None = None
+        self.metadata_snapshot: DirectorySnapshot | None = None
+        self.changed_directories: set[Path] = set()
+        self.file_system_watcher = QFileSystemWatcher()
+        self.file_system_watcher.directoryChanged.connect(self.on_directory_changed)
+        self.directory_change_timer = QTimer()
+        self.directory_change_timer.setSingleShot(True)
+        self.directory_change_timer.setInterval(300)
+        self.directory_change_timer.timeout.connect(self.process_directory_changes)
+        self.filter_timer = QTimer()
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(150)
+        self.filter_timer.timeout.connect(self.apply_filter)
+
+        self.window = MainWindowForm()
+        self.window.first_painted.connect(self.on_first_painted)
 
         self.type_completer = QCompleter()
         self.type_completer.setCompletionMode(QCompleter.CompletionMode.PopupCompletion)
@@ -204,29 +794,170 @@ class MainWindow:
         self.color_completer.setWidget(self.window.color_combo_box)
         self.window.color_combo_box.editTextChanged.connect(self.on_color_changed)
 
+        self.vocabulary_combo_boxes = {
+            'type': self.window.type_combo_box,
+            'make': self.window.make_combo_box,
+            'model': self.window.model_combo_box,
+            'body': self.window.body_combo_box,
+            'color': self.window.color_combo_box,
+        }
+        vocabulary_completers = {
+            'type': self.type_completer,
+            'make': self.make_completer,
+            'model': self.model_completer,
+            'body': self.body_completer,
+            'color': self.color_completer,
+        }
+
+        # Each combo box shares its items with its completer
+        for field, completer in vocabulary_completers.items():
+            completer.setModel(self.vocabulary_models[field])
+            self.vocabulary_combo_boxes[field].setModel(self.vocabulary_models[field])
+            self.vocabulary_combo_boxes[field].setCompleter(completer)
+
+        self.window.filter_edit.textChanged.connect(self.filter_timer.start)
+        self.window.collapse_check_box.toggled.connect(self.apply_filter)
+        self.window.collapse_check_box.setEnabled(burst_distance > 0)
         self.window.path_browser_button.clicked.connect(self.browse_directory)
         self.window.path_edit.textChanged.connect(self.on_data_root_path_changed)
 
-        if data_root_path:
-            self.window.path_edit.setText(str(data_root_path))
+        self.window.thumbnail_list_view.setViewMode(QListView.ViewMode.IconMode)
+        self.window.thumbnail_list_view.setLayoutMode(QListView.LayoutMode.Batched)
+        self.window.thumbnail_list_view.setBatchSize(20)
+        self.window.thumbnail_list_view.setUniformItemSizes(True)
+        self.window.thumbnail_list_view.setModel(self.image_model)
+        self.window.thumbnail_list_view.selectionModel().currentChanged.connect(self.on_file_selected)
+        self.window.thumbnail_list_view.selectionModel().selectionChanged.connect(self.on_selection_changed)
+        self.window.apply_button.clicked.connect(self.apply_to_selection)
+
+        self.cache_stats_label = QLabel()
+        self.window.statusbar.addPermanentWidget(self.cache_stats_label)
+        self.metadata_stats_label = QLabel()
+        self.window.statusbar.addPermanentWidget(self.metadata_stats_label)
+        QApplication.instance().aboutToQuit.connect(self.close_data_root)
+
+        self.next_image_shortcuts = tuple(
+            QShortcut(QKeySequence(key), self.window, lambda: self.select_relative_image(1))
+            for key in ('PgDown', 'Alt+Right')
+        )
+        self.previous_image_shortcuts = tuple(
+            QShortcut(QKeySequence(key), self.window, lambda: self.select_relative_image(-1))
+            for key in ('PgUp', 'Alt+Left')
+        )
+        self.apply_shortcuts = tuple(
+            QShortcut(QKeySequence(key), self.window, self.apply_to_selection)
+            for key in ('Ctrl+Return', 'Ctrl+Enter')
+        )
+        self.zoom_shortcuts = (
+            QShortcut(QKeySequence.StandardKey.ZoomIn, self.window, lambda: self.zoom_preview(1.25)),
+            QShortcut(QKeySequence.StandardKey.ZoomOut, self.window, lambda: self.zoom_preview(0.8)),
+            QShortcut(QKeySequence('Ctrl+0'), self.window, self.fit_preview),
+        )
+        self.window.photo_view.setTransformationAnchor(QGraphicsView.ViewportAnchor.AnchorUnderMouse)
+        self.window.thumbnail_list_view.verticalScrollBar().valueChanged.connect(self.thumbnail_scroll_timer.start)
+        self.startup_timer.mark('main window constructed')
+        self.window.showMaximized()
 
-        if not self.window:
-            print(loader.errorString())
-            sys.exit(-1)
+    def on_first_painted(self):
+        self.startup_timer.mark('first paint')
 
-        self.window.thumbnail_list_view.clicked.connect(self.on_file_selected)
-        self.window.showMaximized()
+        # The initial scan, metadata and vocabulary loading only start once the empty window is visible
+        if self.initial_data_root_path:
+            self.window.path_edit.setText(str(self.initial_data_root_path))
+            self.startup_timer.mark('data root loaded')
+
+        self.startup_timer.report()
 
     def browse_directory(self):
         path = QFileDialog.getExistingDirectory(self.window, 'Select dataset directory', str(self.data_root_path),
                                                 options=QFileDialog.Option.ShowDirsOnly)
         self.window.path_edit.setText(path)
 
+    def get_group_file_names(self, file_names: Iterable[str]) -> set[str]:
+        """
+        With bursts collapsed an image stands for its whole group, hidden near-duplicates included.
+        """
+        if not self.window.collapse_check_box.isChecked():
+            return set(file_names)
+
+        group_file_names = set()
+
+        for file_name in file_names:
+            if (group := self.image_groups.get(file_name.lower())) is not None:
+                group_file_names.update(self.image_group_members[group])
+            else:
+                group_file_names.add(file_name)
+
+        return group_file_names
+
     def on_metadata_property_changed(self, key: str, value: str):
+        # Only remembered per keystroke, flush_metadata() writes the edits once typing pauses
         if self.selected_file_name:
-            current_metadata = self.metadata[self.selected_file_name.lower()]
-            current_metadata[key] = value.lower()
-            save_metadata(self.data_root_path, self.selected_file_name, current_metadata)
+            self.pending_edits[key] = value.lower()
+            self.metadata_flush_timer.start()
+
+    def mark_metadata_dirty(self, file_names: Iterable[str], values: Mapping[str, str]):
+        for file_name in file_names:
+            current_metadata = self.get_metadata(file_name)
+            current_metadata.update(values)
+            self.metadata_writer.mark_dirty(file_name, current_metadata)
+
+    def get_selected_file_names(self) -> list[str]:
+        return [index.data() for index in self.window.thumbnail_list_view.selectionModel().selectedIndexes()]
+
+    def on_selection_changed(self):
+        self.window.apply_button.setEnabled(self.window.thumbnail_list_view.selectionModel().hasSelection())
+
+    def apply_to_selection(self):
+        """
+        Writes the filled in fields to all selected images at once, empty fields are left as they are.
+        """
+        if self.metadata_writer is None:
+            return
+
+        values = {
+            field: text.lower()
+            for field, combo_box in self.vocabulary_combo_boxes.items()
+            if (text := combo_box.currentText())
+        }
+        file_names = self.get_group_file_names(self.get_selected_file_names())
+
+        if not values or not file_names:
+            return
+
+        self.mark_metadata_dirty(file_names, values)
+
+        # A single save_many() call: one transaction with the SQLite backend
+        started_at = time.perf_counter()
+        self.flush_metadata()
+        self.window.statusbar.showMessage(
+            f'{", ".join(values)} applied to {len(file_names)} images '
+            f'in {(time.perf_counter() - started_at) * 1000:.0f} ms', 5000
+        )
+
+    def flush_metadata(self):
+        self.metadata_flush_timer.stop()
+
+        pending_edits, self.pending_edits = self.pending_edits, {}
+
+        if self.metadata_writer is None:
+            return
+
+        if pending_edits and self.selected_file_name:
+            self.mark_metadata_dirty(self.get_group_file_names((self.selected_file_name,)), pending_edits)
+
+        dirty = dict(self.metadata_writer.dirty)
+        errors = self.metadata_writer.flush()
+
+        for file_name, error in errors.items():
+            print(f'Cannot save metadata of {file_name}: {error}')
+
+        changed_fields = self.vocabulary.update_records(
+            (file_name, metadata) for file_name, metadata in dirty.items() if file_name not in errors
+        )
+        self.update_vocabulary_widgets(changed_fields)
+
+        self.metadata_stats_label.setText(f'Metadata: {self.metadata_writer.get_stats()}')
 
     def on_type_changed(self, value: str):
         self.on_metadata_property_changed('type', value)
@@ -243,102 +974,484 @@ class MainWindow:
     def on_color_changed(self, value: str):
         self.on_metadata_property_changed('color', value)
 
-    def on_file_selected(self, index: QModelIndex):
-        self.selected_file_name = index.data()
-        file_path = Path(self.data_root_path, self.selected_file_name)
+    def select_relative_image(self, step: int):
+        view = self.window.thumbnail_list_view
+        model = view.model()
+
+        if model is None:
+            return
+
+        current_index = view.currentIndex()
+        row = current_index.row() + step if current_index.isValid() else 0
+
+        if row >= model.rowCount() and model.canFetchMore():
+            model.fetchMore()
 
-        thumb = get_raw_thumbnail(file_path)
-        thumb_pixmap = QPixmap()
-        thumb_pixmap.loadFromData(thumb.data)
+        if 0 <= row < model.rowCount():
+            index = model.index(row, 0)
+            view.setCurrentIndex(index)
+            view.scrollTo(index)
 
+    def show_preview(self, pixmap: QPixmap):
         scene = QGraphicsScene()
-        scene.addPixmap(thumb_pixmap)
+        scene.addPixmap(pixmap)
         self.window.photo_view.setScene(scene)
 
+    def show_tiles(self, tiles: list[tuple[int, int, QImage]], scale: int, keep_view: bool):
+        # Separate tile items let the view paint only the visible part of a huge frame when zoomed in
+        scene = QGraphicsScene()
+
+        for x, y, tile in tiles:
+            item = scene.addPixmap(QPixmap.fromImage(tile))
+            item.setTransformationMode(Qt.TransformationMode.SmoothTransformation)
+            item.setScale(scale)
+            item.setPos(x * scale, y * scale)
+
+        self.window.photo_view.setScene(scene)
+
+        if not keep_view:
+            self.fit_preview()
+
+    def fit_preview(self):
+        if (scene := self.window.photo_view.scene()) is not None:
+            self.window.photo_view.fitInView(scene.itemsBoundingRect(), Qt.AspectRatioMode.KeepAspectRatio)
+
+    def zoom_preview(self, factor: float):
+        self.window.photo_view.scale(factor, factor)
+
+    def on_file_selected(self, index: QModelIndex):
+        if not index.isValid():
+            return
+
+        self.flush_metadata()
+        self.selected_file_name = index.data()
+        file_path = self.image_model.get_file_path(index.row())
+        cache_key = get_preview_cache_key(file_path)
+        self.selected_preview_cache_key = cache_key
+        self.is_developed_shown = False
+
+        if (thumb_pixmap := self.pixmap_cache.get(cache_key)) is not None:
+            self.last_preview_size = get_pixmap_size(thumb_pixmap)
+            self.show_preview(thumb_pixmap)
+        else:
+            # Upscaled grid thumbnail first, the embedded preview replaces it in on_preview_loaded
+            thumb_pixmap = self.icon_provider.get_thumbnail_pixmap(
+                file_path, self.image_model.get_mtime_ms(index.row()), self.image_model.sizes[index.row()]
+            )
+
+            if thumb_pixmap is not None:
+                self.show_preview(
+                    thumb_pixmap.scaled(self.window.photo_view.viewport().size(), Qt.AspectRatioMode.KeepAspectRatio)
+                )
+            else:
+                self.window.photo_view.setScene(QGraphicsScene())
+
+            self.preview_loader.request(cache_key, file_path, 1)
+
+        if self.develop and is_raw_file(file_path):
+            self.develop_loader.request(cache_key, file_path)
+
+        self.prefetch_neighbours(index, self.last_preview_size)
+        cache_stats = f'Cache: {self.pixmap_cache.get_stats()}'
+
+        if self.preview_loader.preview_cache is not None:
+            cache_stats = f'{cache_stats}; disk: {self.preview_loader.preview_cache.get_stats()}'
+
+        self.cache_stats_label.setText(cache_stats)
+
         self.window.type_combo_box.setEnabled(True)
         self.window.make_combo_box.setEnabled(True)
         self.window.model_combo_box.setEnabled(True)
         self.window.body_combo_box.setEnabled(True)
         self.window.color_combo_box.setEnabled(True)
 
+    def prefetch_neighbours(self, index: QModelIndex, preview_size: int):
+        if self.prefetch_count <= 0:
+            return
+
+        model = self.image_model
+        row_count = len(model.names)
+        # Neighbours are assumed to be about as large as the current preview
+        count = min(self.prefetch_count, self.prefetch_size // max(preview_size, 1) // 2)
+        cache_keys = {self.selected_preview_cache_key}
+
+        for distance in range(1, count + 1):
+            for row in (index.row() + distance, index.row() - distance):
+                if 0 <= row < row_count:
+                    file_path = model.get_file_path(row)
+                    cache_key = get_preview_cache_key(file_path)
+                    cache_keys.add(cache_key)
+
+                    if cache_key not in self.pixmap_cache:
+                        self.preview_loader.request(cache_key, file_path, -distance)
+
+        self.preview_loader.cancel_pending(cache_keys)
+
+    def on_preview_loaded(self, cache_key: tuple, image: QImage):
+        if image.isNull():
+            return
+
+        thumb_pixmap = QPixmap.fromImage(image)
+        self.pixmap_cache.put(cache_key, thumb_pixmap)
+
+        if cache_key == self.selected_preview_cache_key:
+            self.last_preview_size = get_pixmap_size(thumb_pixmap)
+
+            if not self.is_developed_shown:
+                self.show_preview(thumb_pixmap)
+
+    def on_developed(self, cache_key: tuple, tiles: list[tuple[int, int, QImage]], scale: int, is_final: bool):
+        if cache_key != self.selected_preview_cache_key:
+            return
+
+        # The full size pass covers the same scene area as the half size one, so the zoom is kept
+        self.show_tiles(tiles, scale, keep_view=is_final and self.is_developed_shown)
+        self.is_developed_shown = True
+
+    def on_thumbnail_ready(self, file_path: str):
+        index = self.image_model.index_of_path(file_path)
+
+        if index.isValid():
+            self.image_model.dataChanged.emit(index, index, [Qt.ItemDataRole.DecorationRole])
+
+        if file_path in self.unhashed_file_paths:
+            self.unhashed_file_paths.discard(file_path)
+            # A burst from a tethered camera arrives frame by frame, it is regrouped once it pauses
+            self.regroup_timer.start()
+
+    def regroup_images(self):
+        if self.burst_distance > 0 and self.data_root_path is not None:
+            self.thumbnail_batch.regroup(self.data_root_path, self.packed_thumbnails, self.image_snapshot.entries,
+                                         self.burst_distance)
+
+    def on_thumbnail_batch_progress(self, data_root_path: str, done: int, total: int, file_path: str, error: str):
+        if Path(data_root_path) != self.data_root_path:
+            return
+
+        if error:
+            print(f'Cannot generate thumbnail for {file_path}: {error}')
+        else:
+            self.on_thumbnail_ready(file_path)
+
+        self.window.statusbar.showMessage(f'Generating thumbnails: {done}/{total}')
+
+    def on_images_grouped(self, data_root_path: str, groups: dict[str, str]):
+        if Path(data_root_path) != self.data_root_path:
+            return
+
+        self.image_groups = groups
+        self.image_group_members = get_group_members(groups)
+        self.window.statusbar.showMessage(
+            f'{len(self.image_group_members)} bursts of {len(groups)} near-duplicate images found', 5000
+        )
+
+        if self.window.collapse_check_box.isChecked():
+            self.apply_filter()
+
+    def on_thumbnail_batch_finished(self, data_root_path: str, error_count: int):
+        if Path(data_root_path) != self.data_root_path:
+            return
+
+        if error_count:
+            self.window.statusbar.showMessage(f'Thumbnails generated, {error_count} failed')
+        else:
+            self.window.statusbar.clearMessage()
+
+    def cancel_invisible_thumbnails(self):
+        view = self.window.thumbnail_list_view
+        viewport_rect = view.viewport().rect()
+        visible_file_paths = {
+            file_path
+            for file_path in self.thumbnail_loader.pending
+            if view.visualRect(self.image_model.index_of_path(file_path)).intersects(viewport_rect)
+        }
+        self.thumbnail_loader.cancel_pending(visible_file_paths)
+
     def on_data_root_path_changed(self):
+        self.close_data_root()
+        self.selected_file_name = None
         self.data_root_path = Path(self.window.path_edit.text())
-        generate_thumbnails(self.data_root_path)
+        self.metadata_writer = MetadataWriter(open_metadata_backend(self.data_root_path, self.metadata_backend_name))
+        # Each directory is scanned once, the snapshots feed the list, the thumbnail batch, metadata and the watcher
         self.load_images(self.data_root_path)
-        self.metadata = load_metadata(self.data_root_path)
+        self.removed_file_names.clear()
+        self.image_groups = {}
+        self.image_group_members = {}
+        self.unhashed_file_paths.clear()
+        self.regroup_timer.stop()
+        self.thumbnail_batch.start(self.data_root_path, self.packed_thumbnails, self.image_snapshot.entries,
+                                   self.burst_distance)
+        self.metadata_snapshot = DirectorySnapshot(get_metadata_dir_path(self.data_root_path), ('.json',))
+        self.load_metadata()
+        self.update_vocabulary_widgets(VOCABULARY_FIELDS, keep_edit_text=False)
+        self.watch_data_root()
+
+        if self.window.filter_edit.text():
+            self.apply_filter()
+
+    def load_metadata(self):
+        """
+        With the JSON backend, the vocabulary saved when the data root was last closed is brought up to date from
+        the records changed since, other records are only read once edited. The SQLite backend reads all of them
+        in a single query.
+        """
+        backend = self.metadata_writer.backend
+        entries = self.metadata_snapshot.entries
+
+        if isinstance(backend, JSONMetadataBackend) and (saved := load_vocabulary(self.data_root_path)) is not None:
+            self.vocabulary, saved_entries = saved
+            self.metadata = {}
+            updated_records = []
+
+            for metadata_file_name in entries.keys() | saved_entries.keys():
+                if entries.get(metadata_file_name) != saved_entries.get(metadata_file_name):
+                    file_name = Path(metadata_file_name).stem.lower()
+
+                    if (record := backend.load_record(file_name)) is not None:
+                        self.metadata[file_name] = record
+
+                    updated_records.append((file_name, record))
+
+            self.vocabulary.update_records(updated_records)
+        else:
+            self.metadata = backend.load(entries)
+            self.vocabulary = VocabularyIndex.from_metadata(self.metadata)
+
+    def get_metadata(self, file_name: str) -> dict:
+        # Records not read by load_metadata() are read once they are needed
+        file_name = file_name.lower()
+
+        if (record := self.metadata.get(file_name)) is None:
+            record = self.metadata[file_name] = self.metadata_writer.backend.load_record(file_name) or {}
+
+        return record
+
+    def close_data_root(self):
+        self.flush_metadata()
+
+        if self.metadata_writer is None:
+            return
+
+        backend = self.metadata_writer.backend
+
+        if isinstance(backend, JSONMetadataBackend):
+            # Also indexes the records just written, so the saved vocabulary matches the files as they are now
+            self.process_metadata_changes()
+
+            # Records left out of the vocabulary are indexed again when the data root is next opened
+            entries = {
+                metadata_file_name: entry
+                for metadata_file_name, entry in self.metadata_snapshot.entries.items()
+                if Path(metadata_file_name).stem.lower() not in self.removed_file_names
+            }
+
+            try:
+                save_vocabulary(self.data_root_path, self.vocabulary, entries)
+            except OSError as e:
+                print(f'Cannot save the vocabulary of {self.data_root_path}: {e}')
+
+        backend.close()
+        self.metadata_writer = None
+
+    def apply_filter(self):
+        # Not reapplied after every metadata flush: an image would vanish from under the annotator right after
+        # being annotated. The filter is a snapshot taken when its text or the data root changes.
+        self.filter_timer.stop()
+
+        if self.vocabulary is None:
+            return
+
+        filter_names = filter_file_names(self.window.filter_edit.text(), self.vocabulary, self.image_model.entries)
+
+        if self.window.collapse_check_box.isChecked() and self.image_groups:
+            if filter_names is None:
+                filter_names = {file_name.lower() for file_name in self.image_model.entries}
+
+            filter_names = collapse_file_names(filter_names, self.image_groups)
+
+        self.image_model.set_filter(filter_names)
+
+        if filter_names is not None:
+            self.window.statusbar.showMessage(
+                f'Showing {len(self.image_model.names)} of {len(self.image_model.entries)} images'
+            )
+        else:
+            self.window.statusbar.clearMessage()
+
+    def watch_data_root(self):
+        if watched_paths := self.file_system_watcher.directories():
+            self.file_system_watcher.removePaths(watched_paths)
+
+        self.changed_directories.clear()
 
-        self.types = set()
-        self.makes = set()
-        self.models = set()
-        self.bodies = set()
-        self.colors = set()
+        if self.data_root_path.is_dir():
+            self.file_system_watcher.addPath(str(self.data_root_path))
 
-        for item in self.metadata.values():
-            if _type := item.get('type'):
-                self.types.add(_type)
+        self.watch_metadata_dir()
 
-            if make := item.get('make'):
-                self.makes.add(make)
+    def watch_metadata_dir(self):
+        # Records edited elsewhere are only picked up from the per-file layout. The SQLite backend is not reloaded:
+        # its database is only written by the window that has it open.
+        if not isinstance(self.metadata_writer.backend, JSONMetadataBackend):
+            return
 
-            if model := item.get('model'):
-                self.models.add(model)
+        metadata_dir_path = str(get_metadata_dir_path(self.data_root_path))
 
-            if body := item.get('body'):
-                self.bodies.add(body)
+        if metadata_dir_path not in self.file_system_watcher.directories() and Path(metadata_dir_path).is_dir():
+            self.file_system_watcher.addPath(metadata_dir_path)
 
-            if color := item.get('color'):
-                self.colors.add(color)
+    def on_directory_changed(self, path: str):
+        # A copy or a batch of saves produces a burst of notifications, they are handled together once it settles
+        self.changed_directories.add(Path(path))
+        self.directory_change_timer.start()
 
-        self.window.type_combo_box.clear()
-        self.window.type_combo_box.addItems(sorted(self.types))
-        self.type_completer.setModel(QStringListModel(sorted(self.types)))
-        self.window.type_combo_box.setCompleter(self.type_completer)
+    def process_directory_changes(self):
+        changed_directories, self.changed_directories = self.changed_directories, set()
 
-        self.window.make_combo_box.clear()
-        self.window.make_combo_box.addItems(sorted(self.makes))
-        self.make_completer.setModel(QStringListModel(sorted(self.makes)))
-        self.window.make_combo_box.setCompleter(self.make_completer)
+        if self.data_root_path in changed_directories:
+            self.process_image_changes()
+            # .metadata may have just been created
+            self.watch_metadata_dir()
 
-        self.window.model_combo_box.clear()
-        self.window.model_combo_box.addItems(sorted(self.models))
-        self.model_completer.setModel(QStringListModel(sorted(self.models)))
-        self.window.model_combo_box.setCompleter(self.model_completer)
+        if self.metadata_snapshot.path in changed_directories:
+            self.process_metadata_changes()
 
-        self.window.body_combo_box.clear()
-        self.window.body_combo_box.addItems(sorted(self.bodies))
-        self.body_completer.setModel(QStringListModel(sorted(self.bodies)))
-        self.window.body_combo_box.setCompleter(self.body_completer)
+    def process_image_changes(self):
+        added, removed, modified = self.image_snapshot.refresh()
+        entries = self.image_snapshot.entries
 
-        self.window.color_combo_box.clear()
-        self.window.color_combo_box.addItems(sorted(self.colors))
-        self.color_completer.setModel(QStringListModel(sorted(self.colors)))
-        self.window.color_combo_box.setCompleter(self.color_completer)
+        self.image_model.remove_entries(removed)
+        self.image_model.add_entries({file_name: entries[file_name] for file_name in added})
+
+        if removed:
+            self.remove_metadata(removed)
+
+        if added:
+            self.restore_metadata(added)
+
+        for file_name in modified:
+            self.image_model.update_entry(file_name, *entries[file_name])
+
+        for file_name in (*added, *modified):
+            file_path = str(Path(self.data_root_path, file_name))
+
+            if self.burst_distance > 0:
+                self.unhashed_file_paths.add(file_path)
+
+            self.thumbnail_loader.refresh(file_path)
+
+        if removed and self.burst_distance > 0:
+            # Removed images must not stay in their groups, where they would still receive applied metadata
+            self.regroup_timer.start()
+
+        if added or removed or modified:
+            self.window.statusbar.showMessage(
+                f'{len(added)} images added, {len(removed)} removed, {len(modified)} modified', 5000
+            )
+
+    def remove_metadata(self, file_names: Iterable[str]):
+        """
+        Drops the records of removed images from memory, so they neither count in the completers nor match
+        filters. The records are kept on disk: the image may only be moved away for a while, or renamed.
+        """
+        # Edits typed for the selected image are written first, they would be lost with its in-memory record
+        self.flush_metadata()
+        file_names = {file_name.lower() for file_name in file_names}
+
+        if self.selected_file_name is not None and self.selected_file_name.lower() in file_names:
+            self.selected_file_name = None
+
+        for file_name in file_names:
+            self.metadata.pop(file_name, None)
+
+        self.removed_file_names |= file_names
+        self.update_vocabulary_widgets(self.vocabulary.update_records((file_name, None) for file_name in file_names))
+
+    def restore_metadata(self, file_names: Iterable[str]):
+        # Images that have come back bring the records they left on disk
+        file_names = {file_name.lower() for file_name in file_names} & self.removed_file_names
+        backend = self.metadata_writer.backend
+        updated_records = []
+
+        for file_name in file_names:
+            self.removed_file_names.discard(file_name)
+
+            if (record := backend.load_record(file_name)) is not None:
+                self.metadata[file_name] = record
+                updated_records.append((file_name, record))
+
+        self.update_vocabulary_widgets(self.vocabulary.update_records(updated_records))
+
+    def process_metadata_changes(self):
+        added, removed, modified = self.metadata_snapshot.refresh()
+        backend = self.metadata_writer.backend
+        updated_records = []
+
+        for metadata_file_name in (*added, *modified, *removed):
+            file_name = Path(metadata_file_name).stem.lower()
+
+            # Unsaved local edits win over whatever is on disk, they are written on the next flush anyway. Records
+            # of removed images are read again if the image comes back.
+            if file_name in self.metadata_writer.dirty or file_name in self.removed_file_names:
+                continue
+
+            if (record := backend.load_record(file_name)) is not None:
+                self.metadata[file_name] = record
+            else:
+                self.metadata.pop(file_name, None)
+
+            updated_records.append((file_name, record))
+
+        self.update_vocabulary_widgets(self.vocabulary.update_records(updated_records))
+
+    def update_vocabulary_widgets(self, fields: Iterable[str], keep_edit_text: bool = True):
+        """
+        While editing, only the values that appeared or disappeared are inserted or removed, so neither an open
+        popup nor the text being typed is reset. The order by frequency is refreshed when a data root is opened.
+        """
+        for field in fields:
+            values = self.vocabulary.get_values(field)
+            combo_box = self.vocabulary_combo_boxes[field]
+            edit_text = combo_box.currentText() if keep_edit_text else ''
+
+            # Refreshing the items must not be mistaken for an edit of the selected image's metadata
+            combo_box.blockSignals(True)
+
+            if keep_edit_text:
+                update_string_list(self.vocabulary_models[field], values)
+            else:
+                self.vocabulary_models[field].setStringList(values)
+
+            if combo_box.currentText() != edit_text:
+                combo_box.setEditText(edit_text)
+
+            combo_box.blockSignals(False)
 
     def load_images(self, data_root_path: Path):
-        image_file_paths = list_dir_images(data_root_path)
-
-        if image_file_paths:
-            model = QFileSystemModel()
-            model.setFilter(QDir.Filter.Files)
-            model.setNameFilters(('*.arw',))
-            model.setNameFilterDisables(False)
-            model.setRootPath(QDir.rootPath())
-            model.setIconProvider(RawIconProvider())
-            self.window.thumbnail_list_view.setViewMode(QListView.ViewMode.IconMode)
-            self.window.thumbnail_list_view.setLayoutMode(QListView.LayoutMode.Batched)
-            self.window.thumbnail_list_view.setBatchSize(20)
-            self.window.thumbnail_list_view.setModel(model)
-            self.window.thumbnail_list_view.setRootIndex(model.index(str(data_root_path)))
+        self.thumbnail_loader.clear()
+        self.image_snapshot = DirectorySnapshot(data_root_path, self.image_extensions)
+        self.image_model.set_entries(data_root_path, self.image_snapshot.entries)
 
 
 def main():
     args = get_parsed_args()
-    data_root_path = Path(args.data_root).expanduser()
+    startup_timer = StartupTimer(args.startup_timing)
+    data_root_path = Path(args.data_root).expanduser() if args.data_root else None
+
+    if args.preview_cache_mb > 0:
+        preview_cache_dir_path = Path(args.preview_cache_dir or get_default_preview_cache_dir()).expanduser()
+    else:
+        preview_cache_dir_path = None
 
     app = QApplication(sys.argv)
-    mainwindow = MainWindow(data_root_path)
+    startup_timer.mark('QApplication created')
+    mainwindow = MainWindow(data_root_path, args.packed_thumbnails, args.pixmap_cache_mb << 20,
+                            args.prefetch_count, args.prefetch_mb << 20, args.metadata_flush_delay_ms,
+                            args.metadata_backend, args.sort_by, parse_extensions(args.extensions), args.develop,
+                            preview_cache_dir_path, args.preview_cache_mb << 20, startup_timer, args.burst_distance)
 
     sys.exit(app.exec())
 
 
-main()
+if __name__ == '__main__':
+    main()
@@ -9,7 +9,7 @@ LOGGING_CONFIG = {
     'disable_existing_loggers': False,
     'formatters': {
         'default': {
-            '()': 'python3_commons.logging.formatter.JSONFormatter',
+            '()': 'python3_commons.logging.formatters.JSONFormatter',
         },
     },
     'filters': {
@@ -1,5 +1,6 @@
+import asyncio
 import logging
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -7,6 +8,9 @@ from fastapi_pagination import add_pagination
 from starlette.applications import Starlette
 
 from dataset_image_annotator.api.v1.endpoints import router, auth_router, users_router
+from dataset_image_annotator.conf import settings
+from dataset_image_annotator.core.ingest import start_ingest_processor, stop_ingest_processor
+from dataset_image_annotator.core.upload_sessions import remove_stale_upload_sessions
 
 
 logger = logging.getLogger(__name__)
@@ -18,10 +22,38 @@ origins = [
 ]
 
 
+UPLOAD_SESSION_GC_INTERVAL = 3600
+
+
+async def collect_stale_upload_sessions():
+    max_age = settings.upload_session_max_age_hours * 3600
+
+    while True:
+        try:
+            await asyncio.to_thread(remove_stale_upload_sessions, max_age)
+        except OSError:
+            logger.exception('Cannot remove stale upload sessions')
+
+        await asyncio.sleep(UPLOAD_SESSION_GC_INTERVAL)
+
+
 @asynccontextmanager
 async def lifespan(app: Starlette):
+    upload_session_gc_task = asyncio.create_task(collect_stale_upload_sessions())
+    ingest_processor = start_ingest_processor()
+    # Waits for free slots as it goes, so it runs alongside new uploads
+    ingest_backlog_task = asyncio.create_task(ingest_processor.submit_unprocessed())
+
     yield
 
+    for task in (upload_session_gc_task, ingest_backlog_task):
+        task.cancel()
+
+        with suppress(asyncio.CancelledError):
+            await task
+
+    await stop_ingest_processor()
+
 
 app = FastAPI(docs_url='/api/docs', openapi_url='/api/v1/openapi.json', lifespan=lifespan)
 app.add_middleware(
@@ -1,32 +1,34 @@
 import logging
+import os
 import uuid
 from functools import wraps
 from inspect import signature
 from typing import Sequence
 
-from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File
-from fastapi.responses import ORJSONResponse
+from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File, Request
+from fastapi.responses import ORJSONResponse, FileResponse, Response
 from fastapi_pagination import Page
 from fastapi_users import FastAPIUsers
 from fastapi_users.authentication import AuthenticationBackend, JWTStrategy, CookieTransport
 from pydantic import Json
-from python3_commons.db import connect_to_db
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from dataset_image_annotator import core
 from dataset_image_annotator.api import users
 from dataset_image_annotator.api.users import get_user_manager
 from dataset_image_annotator.api.v1.schemas import (
-    UserCreate, UserUpdate, UserItem, UserGroup, UserRead, ImageSampleItem
+    UserCreate, UserUpdate, UserItem, UserGroup, UserRead, ImageSampleItem, ChecksumQuery, ChecksumQueryResult,
+    UploadSessionCreate, UploadSessionItem, UploadSessionFinalize
 )
 from dataset_image_annotator.conf import settings
-from dataset_image_annotator.core import upload_handler
+from dataset_image_annotator.core import image_samples, previews, upload_handler, upload_sessions, users as core_users
 from dataset_image_annotator.db.models import User
 from dataset_image_annotator.db.user_db_helpers import get_async_session
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 cookie_transport = CookieTransport(cookie_max_age=3600)
+# Derivatives are addressed by content: once fetched, a browser never needs to revalidate them
+IMMUTABLE_CACHE_CONTROL = 'private, max-age=31536000, immutable'
 
 
 def get_jwt_strategy() -> JWTStrategy:
@@ -74,7 +76,7 @@ def handle_exceptions(func):
 async def get_users(search: Json | None = None, order_by: str | None = None,
                     user=Depends(get_current_superuser),
                     session: AsyncSession = Depends(get_async_session)) -> Page[UserItem]:
-    return await core.get_users(session, search, order_by)
+    return await core_users.get_users(session, search, order_by)
 
 
 @router.post('/users', response_class=ORJSONResponse, tags=['Admin'])
@@ -88,7 +90,7 @@ async def create_user(new_user: UserCreate, user=Depends(get_current_superuser))
 async def get_user_groups(search: Json | None = None, order_by: str | None = None,
                           user=Depends(get_current_user),
                           session: AsyncSession = Depends(get_async_session)) -> Sequence[UserGroup]:
-    return await core.get_user_groups(session, search, order_by)
+    return await core_users.get_user_groups(session, search, order_by)
 
 
 @router.post('/raw-file', response_class=ORJSONResponse, tags=['Admin'])
@@ -106,8 +108,115 @@ async def upload_raw_file(image_file: UploadFile = File(...), user=Depends(get_c
     return response
 
 
+@router.post('/raw-file/stream', response_class=ORJSONResponse, tags=['Admin'])
+@handle_exceptions
+async def stream_raw_file(request: Request, filename: str, user=Depends(get_current_superuser),
+                          session: AsyncSession = Depends(get_async_session)) -> bool:
+    """
+    The raw file as the request body (application/octet-stream), streamed to storage without a multipart spool.
+    """
+    return await upload_handler.handle_raw_stream(session, filename, request.stream())
+
+
+@router.post('/raw-file/uploads', response_class=ORJSONResponse, tags=['Admin'])
+@handle_exceptions
+async def create_upload_session(new_upload_session: UploadSessionCreate,
+                                user=Depends(get_current_superuser)) -> UploadSessionItem:
+    """
+    Starts a resumable upload: the file is then sent in chunks with PUT /raw-file/uploads/{id}?offset=...,
+    and stored with POST /raw-file/uploads/{id}/finalize once all of it has arrived.
+    """
+    return await upload_sessions.create_upload_session(new_upload_session.filename, new_upload_session.size,
+                                                       new_upload_session.checksum)
+
+
+@router.get('/raw-file/uploads/{session_id}', response_class=ORJSONResponse, tags=['Admin'])
+@handle_exceptions
+async def get_upload_session(session_id: uuid.UUID, user=Depends(get_current_superuser)) -> UploadSessionItem:
+    """
+    The offset tells where to continue after an interrupted chunk.
+    """
+    return await upload_sessions.get_upload_session(session_id)
+
+
+@router.put('/raw-file/uploads/{session_id}', response_class=ORJSONResponse, tags=['Admin'])
+@handle_exceptions
+async def write_upload_chunk(request: Request, session_id: uuid.UUID, offset: int,
+                             user=Depends(get_current_superuser)) -> UploadSessionItem:
+    return await upload_sessions.write_upload_chunk(session_id, offset, request.stream())
+
+
+@router.post('/raw-file/uploads/{session_id}/finalize', response_class=ORJSONResponse, tags=['Admin'])
+@handle_exceptions
+async def finalize_upload_session(session_id: uuid.UUID, upload_session_finalize: UploadSessionFinalize,
+                                  user=Depends(get_current_superuser),
+                                  session: AsyncSession = Depends(get_async_session)) -> bool:
+    await upload_sessions.finalize_upload_session(session, session_id, upload_session_finalize.checksum)
+
+    return True
+
+
+@router.delete('/raw-file/uploads/{session_id}', response_class=ORJSONResponse, tags=['Admin'])
+@handle_exceptions
+async def delete_upload_session(session_id: uuid.UUID, user=Depends(get_current_superuser)) -> bool:
+    await upload_sessions.delete_upload_session(session_id)
+
+    return True
+
+
+@router.post('/image-samples/checksums', response_class=ORJSONResponse, tags=['Images'])
+@handle_exceptions
+async def find_image_sample_checksums(query: ChecksumQuery, user=Depends(get_current_user),
+                                      session: AsyncSession = Depends(get_async_session)) -> ChecksumQueryResult:
+    """
+    Which of the given SHA-256 checksums are already stored, so an uploader can skip those files.
+    """
+    existing = await upload_handler.get_existing_checksums(session, query.checksums)
+
+    return ChecksumQueryResult(existing=sorted(existing))
+
+
 @router.get('/image-samples', response_class=ORJSONResponse, tags=['Images'])
 @handle_exceptions
 async def get_image_samples(session: AsyncSession = Depends(get_async_session), search: Json | None = None,
                             order_by: str | None = None) -> Page[ImageSampleItem]:
-    return await core.get_image_samples(session, search, order_by)
+    return await image_samples.get_image_samples(session, search, order_by)
+
+
+async def get_image_sample_derivative_response(request: Request, session: AsyncSession, image_sample_id: int,
+                                               name: str) -> Response:
+    image_sample = await previews.get_image_sample(session, image_sample_id)
+    location = image_sample.thumbnail_location if name == 'thumbnail' else image_sample.preview_location
+
+    # Only a derivative that exists has the ETag: "If-None-Match: *" must not turn a missing one into a 304
+    if location and os.path.isfile(location):
+        etag = previews.get_derivative_etag(image_sample.checksum, name)
+        headers = {'ETag': etag, 'Cache-Control': IMMUTABLE_CACHE_CONTROL}
+
+        if previews.is_etag_matched(request.headers.get('if-none-match'), etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        # Served from disk in chunks, with Range and If-Range handled against the ETag
+        return FileResponse(location, media_type='image/jpeg', headers=headers)
+
+    if name == 'preview':
+        # Not processed yet: rendered on the fly, and not cached by the browser as it differs from the final one
+        data = await previews.get_image_sample_preview(image_sample.location, image_sample.checksum)
+
+        return Response(data, media_type='image/jpeg', headers={'Cache-Control': 'no-cache'})
+
+    raise LookupError(f'No {name} of image sample {image_sample_id} yet')
+
+
+@router.get('/image-samples/{image_sample_id}/thumbnail', response_class=FileResponse, tags=['Images'])
+@handle_exceptions
+async def get_image_sample_thumbnail(request: Request, image_sample_id: int, user=Depends(get_current_user),
+                                     session: AsyncSession = Depends(get_async_session)) -> Response:
+    return await get_image_sample_derivative_response(request, session, image_sample_id, 'thumbnail')
+
+
+@router.get('/image-samples/{image_sample_id}/preview', response_class=FileResponse, tags=['Images'])
+@handle_exceptions
+async def get_image_sample_preview(request: Request, image_sample_id: int, user=Depends(get_current_user),
+                                   session: AsyncSession = Depends(get_async_session)) -> Response:
+    return await get_image_sample_derivative_response(request, session, image_sample_id, 'preview')
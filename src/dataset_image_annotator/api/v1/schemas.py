@@ -1,7 +1,8 @@
 import uuid
+from datetime import datetime
 
 from fastapi_users import schemas
-from pydantic import BaseModel, UUID4
+from pydantic import BaseModel, Field, UUID4
 
 
 class UserRead(schemas.BaseUser[uuid.UUID]):
@@ -37,3 +38,34 @@ class UserItem(BaseModel):
 class ImageSampleItem(BaseModel):
     id: int
     location: str
+    width: int | None = None
+    height: int | None = None
+    captured_at: datetime | None = None
+    camera_make: str | None = None
+    camera_model: str | None = None
+    lens: str | None = None
+
+
+class ChecksumQuery(BaseModel):
+    checksums: list[str] = Field(max_length=1000)
+
+
+class ChecksumQueryResult(BaseModel):
+    existing: list[str]
+
+
+class UploadSessionCreate(BaseModel):
+    filename: str
+    size: int = Field(ge=0)
+    checksum: str | None = None
+
+
+class UploadSessionItem(BaseModel):
+    id: uuid.UUID
+    filename: str
+    size: int
+    offset: int
+
+
+class UploadSessionFinalize(BaseModel):
+    checksum: str | None = None
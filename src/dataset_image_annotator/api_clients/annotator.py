@@ -1,4 +1,143 @@
+import asyncio
+import itertools
+import logging
+from contextlib import suppress
+from pathlib import Path
+from typing import Iterable
 
+import aiohttp
 
-async def upload_raw_file(address: str, raw_file):
-    pass
+from dataset_image_annotator.scanner import get_file_checksum
+
+logger = logging.getLogger(__name__)
+API_PREFIX = '/api/v1'
+CHECKSUM_QUERY_BATCH_SIZE = 1000
+RESUMABLE_UPLOAD_THRESHOLD = 32 << 20
+UPLOAD_CHUNK_SIZE = 8 << 20
+UPLOAD_CHUNK_ATTEMPTS = 5
+
+
+class AnnotatorClient:
+    """
+    Client of the annotation API. All requests go through one session, i.e. one pool of keep-alive connections
+    with at most max_connections of them open at a time.
+    Files of at least resumable_threshold bytes are uploaded in chunks of chunk_size through an upload session,
+    so a dropped connection only costs the chunk in flight.
+    """
+
+    def __init__(self, address: str, max_connections: int = 4, read_timeout: float = 300,
+                 resumable_threshold: int = RESUMABLE_UPLOAD_THRESHOLD, chunk_size: int = UPLOAD_CHUNK_SIZE):
+        self.address = address.rstrip('/')
+        self.resumable_threshold = resumable_threshold
+        self.chunk_size = chunk_size
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=max_connections),
+            # No total timeout: a large file on a slow link may legitimately take long, a stalled one may not
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=read_timeout),
+            cookie_jar=aiohttp.CookieJar(unsafe=True),
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self):
+        await self.session.close()
+
+    def get_url(self, path: str) -> str:
+        return f'{self.address}{API_PREFIX}{path}'
+
+    async def login(self, email: str, password: str):
+        async with self.session.post(self.get_url('/auth/login'),
+                                     data={'username': email, 'password': password}) as response:
+            if response.status >= 400:
+                raise PermissionError(f'Cannot log in as {email}: HTTP {response.status}')
+
+    async def get_existing_checksums(self, checksums: Iterable[str]) -> set[str]:
+        existing = set()
+
+        for batch in itertools.batched(checksums, CHECKSUM_QUERY_BATCH_SIZE):
+            async with self.session.post(self.get_url('/image-samples/checksums'),
+                                         json={'checksums': list(batch)}) as response:
+                response.raise_for_status()
+                existing.update((await response.json())['existing'])
+
+        return existing
+
+    async def upload_raw_file(self, raw_file_path: Path, checksum: str | None = None) -> bool:
+        if raw_file_path.stat().st_size >= self.resumable_threshold:
+            return await self.upload_raw_file_resumable(raw_file_path, checksum)
+
+        # The file object is streamed by aiohttp in chunks as the plain request body, it is never read into memory
+        # as a whole and the server does not have to spool and parse a multipart form
+        with open(raw_file_path, 'rb') as f:
+            async with self.session.post(self.get_url('/raw-file/stream'), params={'filename': raw_file_path.name},
+                                         data=f, headers={'Content-Type': 'application/octet-stream'}) as response:
+                response.raise_for_status()
+
+                return await response.json()
+
+    async def get_upload_offset(self, session_url: str, offset: int) -> int:
+        with suppress(aiohttp.ClientError, asyncio.TimeoutError):
+            async with self.session.get(session_url) as response:
+                response.raise_for_status()
+
+                return (await response.json())['offset']
+
+        return offset
+
+    async def upload_raw_file_resumable(self, raw_file_path: Path, checksum: str | None = None) -> bool:
+        """
+        Creates an upload session, or continues the one left by an earlier run for the same file, sends the file
+        in chunks, retrying a failed chunk from the offset the server has, and finalizes it against the checksum.
+        """
+        size = raw_file_path.stat().st_size
+
+        if checksum is None:
+            checksum = await asyncio.to_thread(get_file_checksum, raw_file_path)
+
+        async with self.session.post(self.get_url('/raw-file/uploads'),
+                                     json={'filename': raw_file_path.name, 'size': size,
+                                           'checksum': checksum}) as response:
+            response.raise_for_status()
+            upload_session = await response.json()
+
+        session_url = self.get_url(f'/raw-file/uploads/{upload_session["id"]}')
+        offset = upload_session['offset']
+        attempt = 0
+
+        with open(raw_file_path, 'rb') as f:
+            while offset < size:
+                f.seek(offset)
+                chunk = await asyncio.to_thread(f.read, self.chunk_size)
+
+                try:
+                    async with self.session.put(session_url, params={'offset': offset}, data=chunk,
+                                                headers={'Content-Type': 'application/octet-stream'}) as response:
+                        response.raise_for_status()
+                        offset = (await response.json())['offset']
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    attempt += 1
+
+                    # Retrying does not help with a session that is gone or a missing login
+                    if attempt >= UPLOAD_CHUNK_ATTEMPTS or (isinstance(e, aiohttp.ClientResponseError)
+                                                            and e.status in (401, 403, 404)):
+                        raise
+
+                    logger.warning(f'Chunk at {offset} of {raw_file_path} failed, retrying: {e}')
+                    await asyncio.sleep(2 ** attempt)
+                    offset = await self.get_upload_offset(session_url, offset)
+                else:
+                    attempt = 0
+
+        async with self.session.post(f'{session_url}/finalize', json={'checksum': checksum}) as response:
+            response.raise_for_status()
+
+            return await response.json()
+
+
+async def upload_raw_file(address: str, raw_file: Path) -> bool:
+    async with AnnotatorClient(address) as client:
+        return await client.upload_raw_file(raw_file)
@@ -0,0 +1,81 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+class LRUCache:
+    """
+    Least recently used cache bounded by the total size of its items as reported by get_item_size
+    (bytes for decoded images), with hit/miss counters.
+    """
+
+    def __init__(self, max_size: int, get_item_size: Callable[[Any], int]):
+        self.max_size = max_size
+        self.get_item_size = get_item_size
+        self.items: OrderedDict[Hashable, tuple[Any, int]] = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.items
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self.lock:
+            try:
+                value, _ = self.items[key]
+            except KeyError:
+                self.misses += 1
+
+                return default
+
+            self.items.move_to_end(key)
+            self.hits += 1
+
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        item_size = self.get_item_size(value)
+
+        with self.lock:
+            self._discard(key)
+
+            if item_size > self.max_size:
+                return
+
+            self.items[key] = (value, item_size)
+            self.size += item_size
+
+            while self.size > self.max_size:
+                _, (_, evicted_size) = self.items.popitem(last=False)
+                self.size -= evicted_size
+
+    def _discard(self, key: Hashable):
+        try:
+            _, item_size = self.items.pop(key)
+        except KeyError:
+            pass
+        else:
+            self.size -= item_size
+
+    def discard(self, key: Hashable):
+        with self.lock:
+            self._discard(key)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.size = 0
+
+    def get_stats(self) -> str:
+        total = self.hits + self.misses
+        hit_rate = self.hits / total * 100 if total else 0.0
+
+        return (
+            f'{len(self.items)} items, {self.size / 1024 / 1024:.1f}/{self.max_size / 1024 / 1024:.0f} MB, '
+            f'{self.hits} hits, {self.misses} misses ({hit_rate:.0f}% hit rate)'
+        )
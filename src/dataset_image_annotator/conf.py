@@ -1,4 +1,6 @@
-from pydantic import PostgresDsn, SecretStr
+from pathlib import Path
+
+from pydantic import PostgresDsn, SecretStr, field_validator
 from python3_commons.conf import CommonSettings
 
 
@@ -10,6 +12,18 @@ class Settings(CommonSettings):
     bootstrap_user_password: SecretStr | None = None
     auth_secret: SecretStr = 'TODO-REPLACE'
     timezone: str = 'UTC'
+    storage_dir: str = 'storage'
+    preview_cache_dir: str | None = None
+    preview_cache_max_mb: int = 4096
+    upload_session_max_age_hours: float = 24
+    ingest_workers: int | None = None
+    ingest_max_pending: int = 32
+
+    @field_validator('storage_dir')
+    @classmethod
+    def resolve_storage_dir(cls, value: str) -> str:
+        # Locations stored in the database are built from it: a relative one would depend on the working directory
+        return str(Path(value).expanduser().resolve())
 
 
 settings = Settings()
@@ -0,0 +1,145 @@
+import io
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from dataset_image_annotator import thumbs
+from dataset_image_annotator.scanner import is_raw_file
+
+# Runs in ingest worker processes: no settings, database or server imports here, and rawpy and Pillow are imported
+# where they are used, like in thumbs
+if TYPE_CHECKING:
+    from PIL import Image
+
+THUMBNAIL_MAX_SIZE = 320
+PREVIEW_MAX_SIZE = thumbs.PREVIEW_MAX_SIZE
+EXIF_DATETIME_FORMAT = '%Y:%m:%d %H:%M:%S'
+
+
+def get_exif_text(value, max_length: int) -> str | None:
+    if isinstance(value, bytes):
+        value = value.decode('utf-8', 'replace')
+
+    if not isinstance(value, str) or not (value := value.strip('\x00 ')):
+        return None
+
+    return value[:max_length]
+
+
+def get_exif_datetime(value) -> datetime | None:
+    try:
+        return datetime.strptime(get_exif_text(value, 19), EXIF_DATETIME_FORMAT)
+    except (TypeError, ValueError):
+        # Missing, or the all-blank placeholder some cameras write
+        return None
+
+
+def read_exif(image: 'Image.Image') -> dict:
+    """
+    Capture time (camera local time, as recorded), camera and lens of an image, None where they are not recorded.
+    """
+    from PIL import ExifTags
+
+    exif = image.getexif()
+    exif_ifd = exif.get_ifd(ExifTags.IFD.Exif)
+
+    return {
+        'captured_at': get_exif_datetime(
+            exif_ifd.get(ExifTags.Base.DateTimeOriginal) or exif.get(ExifTags.Base.DateTime)
+        ),
+        'camera_make': get_exif_text(exif.get(ExifTags.Base.Make), 64),
+        'camera_model': get_exif_text(exif.get(ExifTags.Base.Model), 64),
+        'lens': get_exif_text(exif_ifd.get(ExifTags.Base.LensModel), 128),
+    }
+
+
+def read_raw_exif(path: Path) -> dict:
+    """
+    EXIF of a TIFF based raw file (NEF, CR2, ARW, DNG...), read by Pillow from its first IFD without decoding
+    any pixels.
+    """
+    from PIL import Image
+
+    try:
+        with Image.open(path) as image:
+            return read_exif(image)
+    except OSError:
+        return {}
+
+
+def open_raw(path: Path) -> tuple['Image.Image', int, int]:
+    """
+    The embedded preview of a raw file, or a quick half size develop if it has none, and the full image size
+    in display orientation. The file is opened once for both.
+    """
+    import rawpy
+    from PIL import Image
+
+    with rawpy.imread(str(path)) as raw:
+        width, height = raw.sizes.width, raw.sizes.height
+
+        # Rotated by 90 degrees
+        if raw.sizes.flip in (5, 6):
+            width, height = height, width
+
+        try:
+            thumb = raw.extract_thumb()
+        except (rawpy.LibRawNoThumbnailError, rawpy.LibRawUnsupportedThumbnailError):
+            image = Image.fromarray(raw.postprocess(half_size=True, use_camera_wb=True, output_bps=8))
+        else:
+            if thumb.format == rawpy.ThumbFormat.JPEG:
+                image = Image.open(io.BytesIO(thumb.data))
+            else:
+                image = Image.fromarray(thumb.data)
+
+    return image, width, height
+
+
+def save_jpeg(image: 'Image.Image', path: Path, max_size: int):
+    """
+    Scales the image down in place to at most max_size pixels along the longer side and writes it atomically.
+    """
+    from PIL import Image
+
+    image.thumbnail((max_size, max_size), Image.Resampling.BILINEAR, reducing_gap=2.0)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f'{path.name}.tmp')
+    image.save(tmp_path, 'JPEG', quality=thumbs.THUMBNAIL_QUALITY)
+    os.replace(tmp_path, path)
+
+
+def process_image(path: str, thumbnail_path: str, preview_path: str) -> dict:
+    """
+    Writes the preview and the thumbnail JPEG of a stored raw or bitmap image and returns its metadata:
+    width, height, captured_at, camera_make, camera_model and lens. Runs in an ingest worker process.
+    """
+    from PIL import ExifTags, Image, ImageOps
+
+    path = Path(path)
+
+    if is_raw_file(path):
+        image, width, height = open_raw(path)
+    else:
+        image = Image.open(path)
+        width, height = image.size
+
+        # Stored sideways, displayed rotated by 90 degrees
+        if image.getexif().get(ExifTags.Base.Orientation) in (5, 6, 7, 8):
+            width, height = height, width
+
+    with image:
+        metadata = {'width': width, 'height': height, **read_exif(image)}
+
+        # Embedded previews of some bodies carry no EXIF, the raw file itself does
+        if is_raw_file(path) and not all(metadata.values()):
+            raw_metadata = read_raw_exif(path)
+            metadata.update({key: value or raw_metadata.get(key) for key, value in metadata.items()})
+
+        preview = ImageOps.exif_transpose(image).convert('RGB')
+
+    # The preview is scaled down first, the thumbnail from it
+    save_jpeg(preview, Path(preview_path), PREVIEW_MAX_SIZE)
+    save_jpeg(preview, Path(thumbnail_path), THUMBNAIL_MAX_SIZE)
+
+    return metadata
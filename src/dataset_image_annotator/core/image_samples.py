@@ -0,0 +1,34 @@
+from datetime import datetime
+from typing import Mapping
+
+import sqlalchemy as sa
+from fastapi_pagination import Page
+from fastapi_pagination.ext.sqlalchemy import paginate
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from dataset_image_annotator.api.v1.schemas import ImageSampleItem
+from dataset_image_annotator.db.helpers import get_query
+from dataset_image_annotator.db.models import ImageSample
+
+
+async def get_image_samples(session: AsyncSession, search: Mapping[str, str] | None = None,
+                            order_by: str | None = None) -> Page[ImageSampleItem]:
+    columns = {
+        'id': (ImageSample.id, False, int, True),
+        'filename': (ImageSample.filename, True, str, False),
+        'checksum': (ImageSample.checksum, True, str, False),
+        'location': (ImageSample.location, True, str, False),
+        'captured_at': (ImageSample.captured_at, False, datetime.fromisoformat, True),
+        'camera_model': (ImageSample.camera_model, True, str, False),
+    }
+    where_clause, order_by_clause = get_query(search, order_by, columns)
+    # Metadata extracted on ingest, the raw files are not touched
+    query = sa.select(
+        ImageSample.id, ImageSample.location, ImageSample.width, ImageSample.height, ImageSample.captured_at,
+        ImageSample.camera_make, ImageSample.camera_model, ImageSample.lens
+    ).order_by(order_by_clause)
+
+    if where_clause is not None:
+        query = query.where(where_clause)
+
+    return await paginate(session, query)
@@ -0,0 +1,144 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, UTC
+
+import sqlalchemy as sa
+
+from dataset_image_annotator.conf import settings
+from dataset_image_annotator.core.derivatives import process_image
+from dataset_image_annotator.core.storage import get_derivative_location
+from dataset_image_annotator.db.models import ImageSample
+from dataset_image_annotator.db.user_db_helpers import get_async_session_context
+
+logger = logging.getLogger(__name__)
+# A sample that breaks the pool again after it has been replaced is left for the next server start
+POOL_ATTEMPTS = 2
+_ingest_processor: 'IngestProcessor | None' = None
+
+
+class IngestProcessor:
+    """
+    Extracts the preview, thumbnail and EXIF of stored image samples in a pool of worker processes, so decoding
+    never blocks the event loop, and saves the results to their rows.
+    At most max_pending samples are queued or in progress at a time: submit() waits for a free slot, which slows
+    uploads down rather than piling up work when they arrive faster than the workers decode.
+    """
+
+    def __init__(self, max_workers: int | None = None, max_pending: int = 32):
+        self.max_workers = max_workers
+        self.executor = self.create_executor()
+        self.slots = asyncio.Semaphore(max_pending)
+        self.tasks: set[asyncio.Task] = set()
+
+    def create_executor(self) -> ProcessPoolExecutor:
+        # spawn: forking a process that runs an event loop and holds database connections is not safe
+        return ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def replace_executor(self, broken_executor: ProcessPoolExecutor):
+        # Every sample in flight sees the same broken pool, only the first one replaces it
+        if self.executor is broken_executor:
+            self.executor = self.create_executor()
+            broken_executor.shutdown(wait=False, cancel_futures=True)
+
+    async def submit(self, image_sample_id: int, location: str, checksum: str):
+        await self.slots.acquire()
+        task = asyncio.create_task(self.process(image_sample_id, location, checksum))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def process(self, image_sample_id: int, location: str, checksum: str):
+        try:
+            thumbnail_location = str(get_derivative_location(checksum, 'thumbnail'))
+            preview_location = str(get_derivative_location(checksum, 'preview'))
+
+            for _ in range(POOL_ATTEMPTS):
+                executor = self.executor
+
+                try:
+                    metadata = await asyncio.get_running_loop().run_in_executor(
+                        executor, process_image, location, thumbnail_location, preview_location
+                    )
+                except BrokenProcessPool:
+                    # A worker died, e.g. LibRaw crashed or the OOM killer struck, taking down whatever else was
+                    # in flight: not a verdict on this sample
+                    logger.warning(f'Worker pool broke while processing image sample {image_sample_id}')
+                    self.replace_executor(executor)
+                    continue
+                except Exception as e:
+                    # Whatever LibRaw or Pillow raise for a corrupt or unsupported file: recorded, not retried
+                    logger.warning(f'Cannot process image sample {image_sample_id} at {location}: {e!r}')
+                    values = {'processing_error': repr(e)}
+                else:
+                    values = {
+                        **metadata,
+                        'thumbnail_location': thumbnail_location,
+                        'preview_location': preview_location,
+                        'processing_error': None,
+                    }
+
+                break
+            else:
+                # processed_at stays NULL, so submit_unprocessed() picks it up again
+                logger.error(f'Image sample {image_sample_id} at {location} left unprocessed: the worker pool broke '
+                             f'{POOL_ATTEMPTS} times')
+                return
+
+            values['processed_at'] = datetime.now(UTC).replace(tzinfo=None)
+            await self.save(image_sample_id, values)
+        except Exception:
+            logger.exception(f'Cannot save processing results of image sample {image_sample_id}')
+        finally:
+            self.slots.release()
+
+    async def save(self, image_sample_id: int, values: dict):
+        async with get_async_session_context() as session:
+            await session.execute(sa.update(ImageSample).where(ImageSample.id == image_sample_id).values(values))
+            await session.commit()
+
+    async def submit_unprocessed(self):
+        """
+        Samples stored while the server was down or before post-processing existed.
+        """
+        async with get_async_session_context() as session:
+            query = sa.select(ImageSample.id, ImageSample.location, ImageSample.checksum).where(
+                ImageSample.processed_at.is_(None)
+            ).order_by(ImageSample.id)
+            rows = (await session.execute(query)).all()
+
+        if rows:
+            logger.info(f'Processing {len(rows)} image samples stored earlier')
+
+        for image_sample_id, location, checksum in rows:
+            await self.submit(image_sample_id, location, checksum)
+
+    async def close(self):
+        for task in list(self.tasks):
+            task.cancel()
+
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        await asyncio.to_thread(self.executor.shutdown, cancel_futures=True)
+
+
+def start_ingest_processor() -> IngestProcessor:
+    global _ingest_processor
+
+    _ingest_processor = IngestProcessor(settings.ingest_workers, settings.ingest_max_pending)
+
+    return _ingest_processor
+
+
+async def stop_ingest_processor():
+    global _ingest_processor
+
+    if _ingest_processor is not None:
+        await _ingest_processor.close()
+        _ingest_processor = None
+
+
+async def submit_image_sample(image_sample: ImageSample):
+    # Outside the API server, e.g. in a job, nothing is started: the server picks the sample up when it starts
+    if _ingest_processor is not None:
+        await _ingest_processor.submit(image_sample.id, image_sample.location, image_sample.checksum)
@@ -0,0 +1,52 @@
+import asyncio
+from pathlib import Path
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from dataset_image_annotator import thumbs
+from dataset_image_annotator.conf import settings
+from dataset_image_annotator.db.models import ImageSample
+from dataset_image_annotator.preview_cache import PreviewDiskCache, get_default_preview_cache_dir, open_preview_cache
+
+
+def get_preview_cache() -> PreviewDiskCache:
+    if settings.preview_cache_dir:
+        cache_dir_path = Path(settings.preview_cache_dir).expanduser()
+    else:
+        cache_dir_path = get_default_preview_cache_dir()
+
+    return open_preview_cache(cache_dir_path, settings.preview_cache_max_mb << 20)
+
+
+def get_cached_preview(location: str, checksum: str) -> bytes:
+    # Keyed by content, so a re-uploaded copy of the same image at another location shares the entry
+    return thumbs.get_cached_preview(Path(location), get_preview_cache(), f'checksum:{checksum}')
+
+
+async def get_image_sample_preview(location: str, checksum: str) -> bytes:
+    # Rendering and the first cache directory scan are blocking
+    return await asyncio.to_thread(get_cached_preview, location, checksum)
+
+
+async def get_image_sample(session: AsyncSession, image_sample_id: int) -> ImageSample:
+    if (image_sample := await session.get(ImageSample, image_sample_id)) is None:
+        raise LookupError(f'Image sample {image_sample_id} not found')
+
+    return image_sample
+
+
+def get_derivative_etag(checksum: str, name: str) -> str:
+    # Strong: derivatives of stored content never change, and the checksum identifies the content
+    return f'"{checksum}.{name}"'
+
+
+def is_etag_matched(if_none_match: str | None, etag: str) -> bool:
+    """
+    If-None-Match holds * or a comma separated list of entity tags, compared weakly as RFC 9110 requires.
+    """
+    if not if_none_match:
+        return False
+
+    tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+
+    return '*' in tags or etag.removeprefix('W/') in tags
@@ -0,0 +1,101 @@
+import asyncio
+import contextlib
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import AsyncIterable, BinaryIO
+
+from dataset_image_annotator.conf import settings
+
+CHUNK_SIZE = 1 << 20
+IMAGES_DIR_NAME = 'images'
+DERIVATIVES_DIR_NAME = 'derivatives'
+TMP_DIR_NAME = 'tmp'
+
+
+def get_storage_path(*parts: str) -> Path:
+    return Path(settings.storage_dir, *parts)
+
+
+def get_image_location(checksum: str, suffix: str) -> Path:
+    """
+    Content addressed: images/ab/cd/abcd...<suffix>, fanned out so no directory grows huge.
+    """
+    return get_storage_path(IMAGES_DIR_NAME, checksum[:2], checksum[2:4], f'{checksum}{suffix.lower()}')
+
+
+def get_derivative_location(checksum: str, name: str) -> Path:
+    """
+    Image derived from a stored one, e.g. its thumbnail: derivatives/ab/cd/abcd....<name>.jpg
+    """
+    return get_storage_path(DERIVATIVES_DIR_NAME, checksum[:2], checksum[2:4], f'{checksum}.{name}.jpg')
+
+
+async def iter_chunks(chunks: AsyncIterable[bytes], chunk_size: int = CHUNK_SIZE) -> AsyncIterable[bytes]:
+    """
+    Coalesces the small chunks a request body arrives in, so the file is written in fewer, larger writes.
+    """
+    buffer = bytearray()
+
+    async for chunk in chunks:
+        buffer += chunk
+
+        if len(buffer) >= chunk_size:
+            yield bytes(buffer)
+            buffer.clear()
+
+    if buffer:
+        yield bytes(buffer)
+
+
+def store_file(path: Path, checksum: str, suffix: str) -> Path:
+    """
+    Moves a fully written file with the given checksum to its content addressed location, which must be on the
+    same file system. Returns the location.
+    """
+    location = get_image_location(checksum, suffix)
+    location.parent.mkdir(parents=True, exist_ok=True)
+
+    if location.exists():
+        # Same content already stored
+        os.unlink(path)
+    else:
+        os.replace(path, location)
+
+    return location
+
+
+def _write_chunk(f: BinaryIO, digest, chunk: bytes):
+    # hashlib releases the GIL for large buffers, so both run off the event loop
+    digest.update(chunk)
+    f.write(chunk)
+
+
+async def store_stream(chunks: AsyncIterable[bytes], suffix: str) -> tuple[str, Path, int]:
+    """
+    Streams chunks to a temporary file while computing their SHA-256, then moves the file to its content
+    addressed location. Only one chunk is held in memory at a time.
+    Returns (checksum, location, size).
+    """
+    tmp_dir_path = get_storage_path(TMP_DIR_NAME)
+    tmp_dir_path.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_file_name = tempfile.mkstemp(suffix='.part', dir=tmp_dir_path)
+
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            async for chunk in iter_chunks(chunks):
+                await asyncio.to_thread(_write_chunk, f, digest, chunk)
+                size += len(chunk)
+
+        checksum = digest.hexdigest()
+        location = store_file(Path(tmp_file_name), checksum, suffix)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp_file_name)
+
+        raise
+
+    return checksum, location, size
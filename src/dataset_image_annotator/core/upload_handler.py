@@ -1,15 +1,85 @@
 import logging
+from pathlib import Path
+from typing import AsyncIterable, Iterable
 from zoneinfo import ZoneInfo
 
+import sqlalchemy as sa
+from fastapi import UploadFile
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from dataset_image_annotator.conf import settings
+from dataset_image_annotator.core import ingest
+from dataset_image_annotator.core.storage import CHUNK_SIZE, store_stream
+from dataset_image_annotator.db.models import ImageSample
 
 logger = logging.getLogger(__name__)
 timezone = ZoneInfo(settings.timezone)
 
 
-async def handle_raw_file(session: AsyncSession, image_file):
-    image_file_body = await image_file.read()
+async def iter_upload_file(image_file: UploadFile) -> AsyncIterable[bytes]:
+    while chunk := await image_file.read(CHUNK_SIZE):
+        yield chunk
+
+
+async def get_existing_checksums(session: AsyncSession, checksums: Iterable[str]) -> set[str]:
+    query = sa.select(ImageSample.checksum).where(ImageSample.checksum.in_(set(checksums)))
+    cursor = await session.execute(query)
+
+    return set(cursor.scalars())
+
+
+async def get_image_sample_by_checksum(session: AsyncSession, checksum: str) -> ImageSample | None:
+    query = sa.select(ImageSample).where(ImageSample.checksum == checksum)
+    cursor = await session.execute(query)
+
+    return cursor.scalar_one_or_none()
+
+
+async def ingest_raw_stream(session: AsyncSession, filename: str, chunks: AsyncIterable[bytes]) -> ImageSample:
+    # Only the name: the client must not pick a path on the server
+    filename = Path(filename).name
+
+    if not filename:
+        raise ValueError('Missing file name')
+
+    checksum, location, size = await store_stream(chunks, Path(filename).suffix)
+
+    return await add_image_sample(session, filename, checksum, location, size)
+
+
+async def add_image_sample(session: AsyncSession, filename: str, checksum: str, location: Path,
+                           size: int) -> ImageSample:
+    # The same content uploaded again, under any name, maps to the sample that is already stored
+    if (image_sample := await get_image_sample_by_checksum(session, checksum)) is not None:
+        logger.info(f'{filename} is already stored as {image_sample.location}')
+
+        return image_sample
+
+    image_sample = ImageSample(filename=filename, checksum=checksum, location=str(location))
+    session.add(image_sample)
+
+    try:
+        await session.commit()
+    except IntegrityError:
+        # Inserted by a concurrent upload of the same content meanwhile
+        await session.rollback()
+
+        return await get_image_sample_by_checksum(session, checksum)
+
+    logger.info(f'Stored {filename} ({size} bytes) as {location}')
+    await ingest.submit_image_sample(image_sample)
+
+    return image_sample
+
+
+async def handle_raw_file(session: AsyncSession, image_file: UploadFile) -> bool:
+    await ingest_raw_stream(session, image_file.filename, iter_upload_file(image_file))
+
+    return True
+
+
+async def handle_raw_stream(session: AsyncSession, filename: str, chunks: AsyncIterable[bytes]) -> bool:
+    await ingest_raw_stream(session, filename, chunks)
 
     return True
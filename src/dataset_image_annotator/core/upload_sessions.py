@@ -0,0 +1,218 @@
+import asyncio
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import AsyncIterable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from dataset_image_annotator.core import upload_handler
+from dataset_image_annotator.core.storage import get_storage_path, iter_chunks, store_file
+from dataset_image_annotator.db.models import ImageSample
+from dataset_image_annotator.scanner import get_file_checksum
+
+logger = logging.getLogger(__name__)
+UPLOADS_DIR_NAME = 'uploads'
+SESSION_FILE_NAME = 'session.json'
+DATA_FILE_NAME = 'data.part'
+# PUTs to one session are serialized, so a retried chunk cannot interleave with the one it retries
+_session_locks: dict[str, asyncio.Lock] = {}
+
+
+def get_session_dir_path(session_id: uuid.UUID) -> Path:
+    return get_storage_path(UPLOADS_DIR_NAME, session_id.hex)
+
+
+def _read_session(session_id: uuid.UUID) -> dict:
+    session_dir_path = get_session_dir_path(session_id)
+
+    try:
+        with open(session_dir_path / SESSION_FILE_NAME, 'r') as f:
+            upload_session = json.load(f)
+
+        upload_session['offset'] = (session_dir_path / DATA_FILE_NAME).stat().st_size
+    except (FileNotFoundError, ValueError):
+        raise LookupError(f'Upload session {session_id} not found')
+
+    return upload_session
+
+
+def _find_session(filename: str, size: int, checksum: str) -> dict | None:
+    uploads_dir_path = get_storage_path(UPLOADS_DIR_NAME)
+
+    try:
+        session_dir_names = os.listdir(uploads_dir_path)
+    except FileNotFoundError:
+        return None
+
+    for session_dir_name in session_dir_names:
+        try:
+            upload_session = _read_session(uuid.UUID(session_dir_name))
+        except (ValueError, LookupError):
+            continue
+
+        if (upload_session['filename'], upload_session['size'], upload_session['checksum']) == (filename, size,
+                                                                                                 checksum):
+            return upload_session
+
+    return None
+
+
+def _create_session(filename: str, size: int, checksum: str | None) -> dict:
+    # A client that restarts with the same file picks up the session it left behind
+    if checksum and (upload_session := _find_session(filename, size, checksum)) is not None:
+        return upload_session
+
+    session_id = uuid.uuid4()
+    session_dir_path = get_session_dir_path(session_id)
+    session_dir_path.mkdir(parents=True)
+    (session_dir_path / DATA_FILE_NAME).touch()
+    upload_session = {'id': str(session_id), 'filename': filename, 'size': size, 'checksum': checksum}
+
+    with open(session_dir_path / SESSION_FILE_NAME, 'w') as f:
+        json.dump(upload_session, f)
+
+    return {**upload_session, 'offset': 0}
+
+
+async def create_upload_session(filename: str, size: int, checksum: str | None = None) -> dict:
+    """
+    Starts a resumable upload of a file of the given size, written chunk by chunk into
+    storage/uploads/<id>/data.part. An unfinished session for the same name, size and checksum is returned instead
+    of a new one, with the offset to continue from.
+    """
+    # Only the name: the client must not pick a path on the server
+    filename = Path(filename).name
+
+    if not filename:
+        raise ValueError('Missing file name')
+
+    if size < 0:
+        raise ValueError('Negative file size')
+
+    return await asyncio.to_thread(_create_session, filename, size, checksum and checksum.lower())
+
+
+async def get_upload_session(session_id: uuid.UUID) -> dict:
+    return await asyncio.to_thread(_read_session, session_id)
+
+
+async def get_session_lock(session_id: uuid.UUID) -> asyncio.Lock:
+    # The session is looked up first, a lock made for an unknown id would never be removed
+    await get_upload_session(session_id)
+
+    return _session_locks.setdefault(session_id.hex, asyncio.Lock())
+
+
+def _open_data_file(path: Path, offset: int):
+    f = open(path, 'r+b')
+    f.seek(offset)
+    f.truncate()
+
+    return f
+
+
+async def write_upload_chunk(session_id: uuid.UUID, offset: int, chunks: AsyncIterable[bytes]) -> dict:
+    """
+    Writes a chunk at offset. The offset may be anywhere up to what has been received so far: anything after it
+    is discarded first, so a chunk whose response got lost can simply be sent again.
+    """
+    async with await get_session_lock(session_id):
+        upload_session = await get_upload_session(session_id)
+
+        if not 0 <= offset <= upload_session['offset']:
+            raise ValueError(f'Offset {offset} is past the {upload_session["offset"]} bytes received')
+
+        f = await asyncio.to_thread(_open_data_file, get_session_dir_path(session_id) / DATA_FILE_NAME, offset)
+
+        try:
+            async for chunk in iter_chunks(chunks):
+                offset += len(chunk)
+
+                if offset > upload_session['size']:
+                    raise ValueError(f'More than the declared {upload_session["size"]} bytes')
+
+                await asyncio.to_thread(f.write, chunk)
+        finally:
+            await asyncio.to_thread(f.close)
+
+    return {**upload_session, 'offset': offset}
+
+
+async def finalize_upload_session(session: AsyncSession, session_id: uuid.UUID,
+                                  checksum: str | None = None) -> ImageSample:
+    """
+    Verifies the received file against the declared size and the SHA-256 checksum, given here or when the
+    session was created, and stores it like a single request upload. A file that does not match is discarded.
+    """
+    async with await get_session_lock(session_id):
+        upload_session = await get_upload_session(session_id)
+        expected_checksum = (checksum or upload_session['checksum'] or '').lower()
+
+        if not expected_checksum:
+            raise ValueError('Missing checksum')
+
+        if upload_session['offset'] != upload_session['size']:
+            raise ValueError(f'Only {upload_session["offset"]} of {upload_session["size"]} bytes received')
+
+        session_dir_path = get_session_dir_path(session_id)
+        data_file_path = session_dir_path / DATA_FILE_NAME
+        actual_checksum = await asyncio.to_thread(get_file_checksum, data_file_path)
+
+        if actual_checksum != expected_checksum:
+            await delete_upload_session(session_id)
+
+            raise ValueError(f'Checksum mismatch: received {actual_checksum}, expected {expected_checksum}')
+
+        location = await asyncio.to_thread(store_file, data_file_path, actual_checksum,
+                                           Path(upload_session['filename']).suffix)
+        await delete_upload_session(session_id)
+
+    return await upload_handler.add_image_sample(session, upload_session['filename'], actual_checksum, location,
+                                                 upload_session['size'])
+
+
+async def delete_upload_session(session_id: uuid.UUID):
+    _session_locks.pop(session_id.hex, None)
+    await asyncio.to_thread(shutil.rmtree, get_session_dir_path(session_id), True)
+
+
+def remove_stale_upload_sessions(max_age: float) -> int:
+    """
+    Removes sessions that have not received a chunk for max_age seconds. Returns how many were removed.
+    """
+    uploads_dir_path = get_storage_path(UPLOADS_DIR_NAME)
+    min_mtime = time.time() - max_age
+    removed_count = 0
+
+    try:
+        session_dir_names = os.listdir(uploads_dir_path)
+    except FileNotFoundError:
+        return 0
+
+    for session_dir_name in session_dir_names:
+        session_dir_path = uploads_dir_path / session_dir_name
+
+        try:
+            # The data file is touched by every chunk written, the directory is created with the session
+            mtime = max(path.stat().st_mtime for path in (session_dir_path, session_dir_path / DATA_FILE_NAME))
+        except FileNotFoundError:
+            # Finalized meanwhile, or a session that failed to be created
+            if not session_dir_path.exists():
+                continue
+
+            mtime = 0
+
+        if mtime < min_mtime:
+            shutil.rmtree(session_dir_path, ignore_errors=True)
+            _session_locks.pop(session_dir_name, None)
+            removed_count += 1
+
+    if removed_count:
+        logger.info(f'Removed {removed_count} stale upload sessions')
+
+    return removed_count
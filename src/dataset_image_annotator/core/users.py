@@ -0,0 +1,34 @@
+from typing import Mapping, Sequence
+
+import sqlalchemy as sa
+from fastapi_pagination import Page
+from fastapi_pagination.ext.sqlalchemy import paginate
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from dataset_image_annotator.api.v1.schemas import UserItem
+from dataset_image_annotator.db.models import UserGroup, User
+
+
+async def get_users(session: AsyncSession, search: Mapping[str, str] | None = None,
+                    order_by: str | None = None) -> Page[UserItem]:
+    query = sa.select(User)
+    result = await paginate(session, query)
+
+    return result
+
+
+async def get_user(session: AsyncSession, user_id: str) -> UserItem:
+    query = sa.select(User).where(User.id == user_id)
+    cursor = await session.execute(query)
+    result = cursor.scalar_one()
+
+    return result
+
+
+async def get_user_groups(session: AsyncSession, search: Mapping[str, str] | None = None,
+                          order_by: str | None = None) -> Sequence[UserGroup]:
+    query = sa.select(UserGroup).order_by(UserGroup.name)
+    cursor = await session.execute(query)
+    result = cursor.scalars()
+
+    return result
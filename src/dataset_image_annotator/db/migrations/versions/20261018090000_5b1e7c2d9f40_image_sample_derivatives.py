@@ -0,0 +1,63 @@
+"""image sample derivatives
+
+Revision ID: 5b1e7c2d9f40
+Revises: 339054a81cc6
+Create Date: 2026-10-18 09:00:00.000000+00:00
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '5b1e7c2d9f40'
+down_revision = '339054a81cc6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    schema_upgrades()
+    data_upgrades()
+
+
+def downgrade():
+    data_downgrades()
+    schema_downgrades()
+
+
+def schema_upgrades():
+    """schema upgrade migrations go here."""
+    op.add_column('image_samples', sa.Column('processed_at', sa.DateTime(), nullable=True))
+    op.add_column('image_samples', sa.Column('processing_error', sa.String(), nullable=True))
+    op.add_column('image_samples', sa.Column('thumbnail_location', sa.String(), nullable=True))
+    op.add_column('image_samples', sa.Column('preview_location', sa.String(), nullable=True))
+    op.add_column('image_samples', sa.Column('width', sa.Integer(), nullable=True))
+    op.add_column('image_samples', sa.Column('height', sa.Integer(), nullable=True))
+    op.add_column('image_samples', sa.Column('captured_at', sa.DateTime(), nullable=True))
+    op.add_column('image_samples', sa.Column('camera_make', sa.String(length=64), nullable=True))
+    op.add_column('image_samples', sa.Column('camera_model', sa.String(length=64), nullable=True))
+    op.add_column('image_samples', sa.Column('lens', sa.String(length=128), nullable=True))
+
+
+def schema_downgrades():
+    """schema downgrade migrations go here."""
+    op.drop_column('image_samples', 'lens')
+    op.drop_column('image_samples', 'camera_model')
+    op.drop_column('image_samples', 'camera_make')
+    op.drop_column('image_samples', 'captured_at')
+    op.drop_column('image_samples', 'height')
+    op.drop_column('image_samples', 'width')
+    op.drop_column('image_samples', 'preview_location')
+    op.drop_column('image_samples', 'thumbnail_location')
+    op.drop_column('image_samples', 'processing_error')
+    op.drop_column('image_samples', 'processed_at')
+
+
+def data_upgrades():
+    """Add any optional data upgrade migrations here!"""
+    pass
+
+
+def data_downgrades():
+    """Add any optional data downgrade migrations here!"""
+    pass
@@ -16,6 +16,12 @@ def pg_utcnow(element, compiler, **kw):
     return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
 
 
+@compiles(UTCNow)
+def utcnow(element, compiler, **kw):
+    # SQLite, used by the tests: CURRENT_TIMESTAMP is in UTC there
+    return 'CURRENT_TIMESTAMP'
+
+
 @compiles(CreateColumn, 'postgresql')
 def use_identity(element, compiler, **kw):
     result = compiler.visit_create_column(element, **kw).replace('SERIAL', 'INT GENERATED BY DEFAULT AS IDENTITY')
@@ -47,6 +53,17 @@ class ImageSample(BaseDBModel, Base):
     filename = Column(String, nullable=False)
     checksum = Column(String, nullable=False, unique=True)
     location = Column(String, nullable=False, unique=True)
+    # Filled in by ingest post-processing, see core.ingest
+    processed_at = Column(DateTime)
+    processing_error = Column(String)
+    thumbnail_location = Column(String)
+    preview_location = Column(String)
+    width = Column(Integer)
+    height = Column(Integer)
+    captured_at = Column(DateTime)
+    camera_make = Column(String(64))
+    camera_model = Column(String(64))
+    lens = Column(String(128))
 
 
 class ImageSampleAnnotation(BaseDBModel, Base):
@@ -0,0 +1,71 @@
+from typing import Iterable, Sequence
+
+from dataset_image_annotator.vocabulary import VocabularyIndex
+
+
+def parse_filter_query(query: str, fields: Sequence[str]) -> list[tuple[str, str | None, str]]:
+    """
+    Whitespace separated terms, all of which must match:
+        field:value   field equals value
+        field~text    field contains text
+        +field        field is set
+        -field        field is missing (same as "field:")
+        text          file name or any field contains text
+    A term whose field is not one of fields is text, e.g. "-2ev" or "12:30".
+    Returns (operator, field, value) tuples with operator being one of '=', '~', '+', '-', '*'.
+    """
+    terms = []
+
+    for term in query.lower().split():
+        if term[0] in '+-' and len(term) > 1:
+            operator, field, value = term[0], term[1:], ''
+        elif ':' in term:
+            field, value = term.split(':', 1)
+            operator = '=' if value else '-'
+        elif '~' in term:
+            field, value = term.split('~', 1)
+            operator = '~'
+        else:
+            operator, field, value = '*', None, term
+
+        if field is not None and field not in fields:
+            operator, field, value = '*', None, term
+
+        terms.append((operator, field, value))
+
+    return terms
+
+
+def filter_file_names(query: str, index: VocabularyIndex, file_names: Iterable[str]) -> set[str] | None:
+    """
+    Returns lowercased names of the matching files, or None if the query is empty and everything should be shown.
+    """
+    terms = parse_filter_query(query, index.fields)
+
+    if not terms:
+        return None
+
+    matched = set(file_name.lower() for file_name in file_names)
+
+    # Cheap, selective terms first, so that the rest works on an already small set
+    for operator, field, value in sorted(terms, key=lambda term: '=+~-*'.index(term[0])):
+        if not matched:
+            break
+
+        if operator == '=':
+            matched &= index.get_files(field, value)
+        elif operator == '+':
+            matched &= index.files_with_field[field]
+        elif operator == '-':
+            matched -= index.files_with_field[field]
+        elif operator == '~':
+            matched &= index.find_files(field, value)
+        else:
+            matched_by_value = set()
+
+            for field_name in index.fields:
+                matched_by_value |= index.find_files(field_name, value)
+
+            matched = {file_name for file_name in matched if value in file_name} | (matched & matched_by_value)
+
+    return matched
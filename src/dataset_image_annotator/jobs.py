@@ -14,7 +14,7 @@ logging.config.dictConfig({
     'disable_existing_loggers': False,
     'formatters': {
         'default': {
-            '()': 'python3_commons.logging.formatter.JSONFormatter',
+            '()': 'python3_commons.logging.formatters.JSONFormatter',
         },
     },
     'filters': {
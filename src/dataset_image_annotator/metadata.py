@@ -0,0 +1,255 @@
+import json
+import os
+import sqlite3
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Iterable, Mapping, Sequence
+
+from dataset_image_annotator.scanner import scan_dir_entries
+
+METADATA_DIR_NAME = '.metadata'
+METADATA_DB_FILE_NAME = '.metadata.sqlite3'
+
+
+def get_metadata_dir_path(data_root_path: Path) -> Path:
+    return Path(data_root_path, METADATA_DIR_NAME)
+
+
+def list_dir_metadata(path: Path) -> Sequence[Path] | None:
+    metadata_dir_path = get_metadata_dir_path(path)
+
+    if metadata_dir_path.exists():
+        return [Path(metadata_dir_path, name) for name in sorted(scan_dir_entries(metadata_dir_path, ('.json',)))]
+
+    return None
+
+
+def load_metadata_file(metadata_file_path: Path) -> dict | None:
+    try:
+        with open(metadata_file_path, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def load_metadata(data_root_path: Path, metadata_file_names: Iterable[str] | None = None):
+    """
+    metadata_file_names: names of the files in .metadata from a scan the caller has already done
+    """
+    metadata = defaultdict(dict)
+
+    if metadata_file_names is not None:
+        metadata_dir_path = get_metadata_dir_path(data_root_path)
+        metadata_files = [Path(metadata_dir_path, name) for name in metadata_file_names]
+    else:
+        metadata_files = list_dir_metadata(data_root_path)
+
+    if metadata_files:
+        for metadata_file in metadata_files:
+            if (record := load_metadata_file(metadata_file)) is not None:
+                # Keyed by image file name, the same way MainWindow looks records up
+                metadata[metadata_file.stem.lower()] = record
+
+    return metadata
+
+
+def fsync_dir(dir_path: Path):
+    # Makes renames within the directory durable. Directories cannot be opened on Windows, where there is no need.
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+
+    fd = os.open(dir_path, os.O_RDONLY | os.O_DIRECTORY)
+
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def save_metadata(data_root_path: Path, records: Mapping[str, Mapping]) -> Mapping[str, Exception]:
+    """
+    Writes each record to a temporary file, syncs it and renames it over the old one, so neither a reader nor a
+    power loss leaves a truncated record. The directory is synced once for the whole batch, after the renames:
+    a crash right after a batch may lose that batch, like the edits still waiting in MetadataWriter, but not older
+    records. Returns the errors by file name.
+    """
+    metadata_dir_path = get_metadata_dir_path(data_root_path)
+    errors = {}
+    written = []
+
+    try:
+        metadata_dir_path.mkdir(exist_ok=True)
+    except OSError as e:
+        return {file_name: e for file_name in records}
+
+    for file_name, metadata in records.items():
+        metadata_file_path = Path(metadata_dir_path, f'{file_name.lower()}.json')
+        tmp_metadata_file_path = metadata_file_path.with_name(f'{metadata_file_path.name}.tmp')
+
+        try:
+            with open(tmp_metadata_file_path, 'w') as f:
+                json.dump(metadata, f)
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError as e:
+            errors[file_name] = e
+        else:
+            written.append((file_name, tmp_metadata_file_path, metadata_file_path))
+
+    for file_name, tmp_metadata_file_path, metadata_file_path in written:
+        try:
+            os.replace(tmp_metadata_file_path, metadata_file_path)
+        except OSError as e:
+            errors[file_name] = e
+
+    if written:
+        try:
+            fsync_dir(metadata_dir_path)
+        except OSError as e:
+            print(f'Cannot sync {metadata_dir_path}: {e}')
+
+    return errors
+
+
+class JSONMetadataBackend:
+    """
+    One .metadata/<file name>.json file per image.
+    """
+
+    def __init__(self, data_root_path: Path):
+        self.data_root_path = data_root_path
+
+    def load(self, metadata_file_names: Iterable[str] | None = None):
+        return load_metadata(self.data_root_path, metadata_file_names)
+
+    def load_record(self, file_name: str) -> dict | None:
+        return load_metadata_file(Path(get_metadata_dir_path(self.data_root_path), f'{file_name.lower()}.json'))
+
+    def save_many(self, records: Mapping[str, Mapping]) -> Mapping[str, Exception]:
+        return save_metadata(self.data_root_path, records)
+
+    def close(self):
+        pass
+
+
+class SQLiteMetadataBackend:
+    """
+    All records of a data root in a single SQLite database, one row per image with the record stored as JSON,
+    so aggregates can be queried with json_extract(). Created from the per-file JSON layout on first use.
+    """
+
+    def __init__(self, data_root_path: Path):
+        self.data_root_path = data_root_path
+        self.db_path = Path(data_root_path, METADATA_DB_FILE_NAME)
+        is_new = not self.db_path.exists()
+        self.connection = sqlite3.connect(self.db_path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS image_metadata (file_name TEXT PRIMARY KEY, data TEXT NOT NULL)'
+        )
+
+        if is_new:
+            self.import_json()
+
+    def import_json(self) -> int:
+        records = load_metadata(self.data_root_path)
+
+        if records:
+            self.save_many(records)
+
+        return len(records)
+
+    def load(self, metadata_file_names: Iterable[str] | None = None):
+        # The JSON files are only read once, by import_json()
+        metadata = defaultdict(dict)
+        cursor = self.connection.execute('SELECT file_name, data FROM image_metadata')
+
+        for file_name, data in cursor:
+            metadata[file_name] = json.loads(data)
+
+        return metadata
+
+    def load_record(self, file_name: str) -> dict | None:
+        row = self.connection.execute(
+            'SELECT data FROM image_metadata WHERE file_name = ?', (file_name.lower(),)
+        ).fetchone()
+
+        return json.loads(row[0]) if row is not None else None
+
+    def save_many(self, records: Mapping[str, Mapping]) -> Mapping[str, Exception]:
+        try:
+            with self.connection:
+                self.connection.executemany(
+                    'INSERT INTO image_metadata (file_name, data) VALUES (?, ?) '
+                    'ON CONFLICT (file_name) DO UPDATE SET data = excluded.data',
+                    ((file_name.lower(), json.dumps(metadata)) for file_name, metadata in records.items())
+                )
+        except sqlite3.Error as e:
+            return {file_name: e for file_name in records}
+
+        return {}
+
+    def close(self):
+        self.connection.close()
+
+
+METADATA_BACKENDS = {
+    'json': JSONMetadataBackend,
+    'sqlite': SQLiteMetadataBackend,
+}
+
+
+def open_metadata_backend(data_root_path: Path, backend_name: str = 'json'):
+    try:
+        backend_class = METADATA_BACKENDS[backend_name]
+    except KeyError:
+        raise ValueError(f'Unknown metadata backend: "{backend_name}"')
+
+    return backend_class(data_root_path)
+
+
+class MetadataWriter:
+    """
+    Write-behind buffer for metadata records: changes are coalesced per file in memory and only written by flush().
+    """
+
+    def __init__(self, backend: JSONMetadataBackend | SQLiteMetadataBackend):
+        self.backend = backend
+        self.dirty: dict[str, Mapping] = {}
+        self.flush_count = 0
+        self.written_count = 0
+        self.last_flush_duration = 0.0
+        self.total_flush_duration = 0.0
+
+    def __len__(self) -> int:
+        return len(self.dirty)
+
+    def mark_dirty(self, file_name: str, metadata: Mapping):
+        self.dirty[file_name.lower()] = metadata
+
+    def flush(self) -> Mapping[str, Exception]:
+        if not self.dirty:
+            return {}
+
+        started_at = time.perf_counter()
+        dirty, self.dirty = self.dirty, {}
+        errors = self.backend.save_many(dirty)
+
+        for file_name in errors:
+            # Kept for the next flush unless it has been changed again meanwhile
+            self.dirty.setdefault(file_name, dirty[file_name])
+
+        self.written_count += len(dirty) - len(errors)
+        self.last_flush_duration = time.perf_counter() - started_at
+        self.total_flush_duration += self.last_flush_duration
+        self.flush_count += 1
+
+        return errors
+
+    def get_stats(self) -> str:
+        return (
+            f'{self.flush_count} flushes, {self.written_count} records written, '
+            f'last {self.last_flush_duration * 1000:.1f} ms, total {self.total_flush_duration * 1000:.0f} ms'
+        )
@@ -0,0 +1,234 @@
+import json
+import mmap
+import os
+import threading
+import time
+from pathlib import Path
+from typing import BinaryIO, Iterable
+
+PACK_FILE_NAME = 'thumbs.pack'
+PACK_INDEX_FILE_NAME = 'thumbs.idx.json'
+PACK_INDEX_SAVE_INTERVAL = 100
+# How often a reader looks for an index saved by another process, in seconds
+PACK_INDEX_CHECK_INTERVAL = 1.0
+# flush() compacts the pack once the data no entry refers to anymore outweighs both this and the live data
+PACK_COMPACT_MIN_GARBAGE_SIZE = 16 << 20
+
+_stores: dict[Path, 'PackedThumbnailStore'] = {}
+_stores_lock = threading.Lock()
+
+
+def get_mtime_ms(stat: os.stat_result) -> int:
+    return stat.st_mtime_ns // 1_000_000
+
+
+class PackedThumbnailStore:
+    """
+    Previews and thumbnails of one directory appended to a single pack file, with an offset index keyed by
+    lowercased file name and validated against the source file's mtime (ms) and size.
+
+    Index entry: [mtime_ms, size, preview_offset, preview_length, thumbnail_offset, thumbnail_length]
+
+    Only one process should write to a store at a time. Others pick its changes up when the index file changes.
+    Regenerated thumbnails are appended, the data they replace stays in the pack until compact() rewrites it.
+    """
+
+    def __init__(self, thumbnail_dir_path: Path):
+        self.pack_path = thumbnail_dir_path / PACK_FILE_NAME
+        self.index_path = thumbnail_dir_path / PACK_INDEX_FILE_NAME
+        self.lock = threading.Lock()
+        # Held for the whole rewrite of the pack, self.lock only while the new one is swapped in
+        self.compact_lock = threading.Lock()
+        self.pack_mmap: mmap.mmap | None = None
+        self.unsaved_count = 0
+        self.index: dict[str, list[int]] = {}
+        self.index_mtime_ns: int | None = None
+        self.index_checked_at = time.monotonic()
+        self._load_index()
+
+    def _load_index(self):
+        try:
+            self.index_mtime_ns = self.index_path.stat().st_mtime_ns
+
+            with open(self.index_path, 'r') as f:
+                self.index = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.index = {}
+
+    def _reload_index_if_changed(self):
+        # Entries of its own not saved yet win over another process' index
+        if self.unsaved_count or time.monotonic() - self.index_checked_at < PACK_INDEX_CHECK_INTERVAL:
+            return
+
+        self.index_checked_at = time.monotonic()
+
+        try:
+            mtime_ns = self.index_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+
+        if mtime_ns != self.index_mtime_ns:
+            self._load_index()
+            # Compaction may have rewritten the pack as well
+            self.pack_mmap = None
+
+    def _is_fresh(self, file_name: str, mtime_ms: int, size: int) -> bool:
+        self._reload_index_if_changed()
+        entry = self.index.get(file_name.lower())
+
+        return entry is not None and entry[0] == mtime_ms and entry[1] == size
+
+    def is_fresh(self, file_name: str, mtime_ms: int, size: int) -> bool:
+        with self.lock:
+            return self._is_fresh(file_name, mtime_ms, size)
+
+    def _remap(self):
+        # The previous map is not closed explicitly: memoryviews handed out earlier may still reference it
+        with open(self.pack_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size:
+                self.pack_mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def get(self, file_name: str, mtime_ms: int, size: int, preview: bool = False) -> memoryview | None:
+        with self.lock:
+            if not self._is_fresh(file_name, mtime_ms, size):
+                return None
+
+            entry = self.index[file_name.lower()]
+            offset, length = entry[2:4] if preview else entry[4:6]
+
+            try:
+                if self.pack_mmap is None or offset + length > len(self.pack_mmap):
+                    self._remap()
+            except FileNotFoundError:
+                return None
+
+            if self.pack_mmap is None or offset + length > len(self.pack_mmap):
+                return None
+
+            return memoryview(self.pack_mmap)[offset:offset + length]
+
+    def put(self, path: Path, preview_data: bytes, thumbnail_data: bytes):
+        stat = path.stat()
+
+        with self.lock:
+            with open(self.pack_path, 'ab') as f:
+                offset = f.tell()
+                f.write(preview_data)
+                f.write(thumbnail_data)
+
+            self.index[path.name.lower()] = [
+                get_mtime_ms(stat), stat.st_size,
+                offset, len(preview_data),
+                offset + len(preview_data), len(thumbnail_data),
+            ]
+            self.unsaved_count += 1
+
+            if self.unsaved_count >= PACK_INDEX_SAVE_INTERVAL:
+                self._save_index()
+
+    def _save_index(self):
+        tmp_index_path = self.index_path.with_name(f'{self.index_path.name}.tmp')
+
+        with open(tmp_index_path, 'w') as f:
+            json.dump(self.index, f)
+
+        os.replace(tmp_index_path, self.index_path)
+        self.index_mtime_ns = self.index_path.stat().st_mtime_ns
+        self.unsaved_count = 0
+
+    def get_sizes(self) -> tuple[int, int]:
+        """
+        Bytes of the pack the index refers to, and bytes left behind by replaced thumbnails.
+        """
+        live_size = sum(entry[3] + entry[5] for entry in self.index.values())
+
+        try:
+            pack_size = self.pack_path.stat().st_size
+        except FileNotFoundError:
+            pack_size = 0
+
+        return live_size, max(pack_size - live_size, 0)
+
+    def flush(self):
+        with self.lock:
+            if self.unsaved_count:
+                self._save_index()
+
+            live_size, garbage_size = self.get_sizes()
+
+        if garbage_size > max(PACK_COMPACT_MIN_GARBAGE_SIZE, live_size):
+            self.compact()
+
+    def compact(self, file_names: Iterable[str] | None = None):
+        """
+        Rewrites the pack with only the data the index refers to. With file_names, the entries of other files,
+        e.g. of images deleted since, are dropped as well.
+
+        The data is copied without holding the lock, so readers are only blocked while the new pack is swapped in.
+        Thumbnails put meanwhile are appended to the old pack and copied over at that point.
+        """
+        keep_names = {file_name.lower() for file_name in file_names} if file_names is not None else None
+        tmp_pack_path = self.pack_path.with_name(f'{self.pack_path.name}.tmp')
+
+        with self.compact_lock:
+            try:
+                src = open(self.pack_path, 'rb')
+            except FileNotFoundError:
+                return
+
+            with self.lock:
+                copied_index = dict(self.index)
+
+            with src, open(tmp_pack_path, 'wb') as dst:
+                index = self._copy_entries(src, dst, copied_index, keep_names)
+
+            with self.lock:
+                # put() replaces entries, it never changes one in place
+                put_index = {
+                    file_name: entry
+                    for file_name, entry in self.index.items()
+                    if copied_index.get(file_name) is not entry
+                }
+
+                if put_index:
+                    with open(self.pack_path, 'rb') as src, open(tmp_pack_path, 'ab') as dst:
+                        index.update(self._copy_entries(src, dst, put_index, keep_names))
+
+                # Memoryviews handed out earlier keep the old map, and with it the replaced file, alive
+                os.replace(tmp_pack_path, self.pack_path)
+                self.pack_mmap = None
+                self.index = index
+                self._save_index()
+
+    @staticmethod
+    def _copy_entries(src: BinaryIO, dst: BinaryIO, index: dict[str, list[int]],
+                      keep_names: set[str] | None) -> dict[str, list[int]]:
+        copied_index = {}
+
+        # In pack order, so the old pack is read sequentially. Previews and thumbnails are stored back to back.
+        for file_name, entry in sorted(index.items(), key=lambda item: item[1][2]):
+            if keep_names is not None and file_name not in keep_names:
+                continue
+
+            mtime_ms, size, preview_offset, preview_length, thumbnail_offset, thumbnail_length = entry
+            src.seek(preview_offset)
+            data = src.read(thumbnail_offset + thumbnail_length - preview_offset)
+            offset = dst.tell()
+            dst.write(data)
+            copied_index[file_name] = [
+                mtime_ms, size,
+                offset, preview_length,
+                offset + thumbnail_offset - preview_offset, thumbnail_length,
+            ]
+
+        return copied_index
+
+
+def open_packed_store(thumbnail_dir_path: Path) -> PackedThumbnailStore:
+    with _stores_lock:
+        try:
+            store = _stores[thumbnail_dir_path]
+        except KeyError:
+            store = _stores[thumbnail_dir_path] = PackedThumbnailStore(thumbnail_dir_path)
+
+    return store
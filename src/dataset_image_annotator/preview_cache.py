@@ -0,0 +1,142 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+PREVIEW_CACHE_DIR_NAME = 'dataset-image-annotator/previews'
+PREVIEW_CACHE_FILE_SUFFIX = '.jpg'
+
+_caches: dict[Path, 'PreviewDiskCache'] = {}
+_caches_lock = threading.Lock()
+
+
+def get_default_preview_cache_dir() -> Path:
+    cache_home = os.environ.get('XDG_CACHE_HOME') or Path('~/.cache').expanduser()
+
+    return Path(cache_home, PREVIEW_CACHE_DIR_NAME)
+
+
+def get_file_cache_key(path: Path, stat: os.stat_result | None = None) -> str:
+    """
+    Identifies a version of a local file, for callers that have no checksum of its content.
+    """
+    if stat is None:
+        stat = path.stat()
+
+    return f'{path.resolve()}:{stat.st_mtime_ns}:{stat.st_size}'
+
+
+class PreviewDiskCache:
+    """
+    Persistent cache of encoded previews, content addressed by the SHA-1 of a key: a file checksum on the server,
+    path, mtime and size in the GUI. Bounded by the total size of the files, least recently used ones are evicted.
+
+    Recency is the file mtime, which is bumped on every hit, so it survives restarts. Files are written atomically,
+    so several processes may share a directory; each one only evicts within its own view of the directory.
+    """
+
+    def __init__(self, cache_dir_path: Path, max_size: int):
+        self.cache_dir_path = cache_dir_path
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.files: OrderedDict[str, int] = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+        entries = []
+
+        for sub_dir_path in self.cache_dir_path.glob('??'):
+            with os.scandir(sub_dir_path) as it:
+                for entry in it:
+                    if entry.name.endswith(PREVIEW_CACHE_FILE_SUFFIX) and entry.is_file():
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime_ns, entry.name.removesuffix(PREVIEW_CACHE_FILE_SUFFIX),
+                                        stat.st_size))
+
+        for _, digest, size in sorted(entries):
+            self.files[digest] = size
+            self.size += size
+
+        with self.lock:
+            self._evict()
+
+    def get_file_path(self, digest: str) -> Path:
+        return Path(self.cache_dir_path, digest[:2], f'{digest}{PREVIEW_CACHE_FILE_SUFFIX}')
+
+    def get(self, key: str) -> bytes | None:
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        file_path = self.get_file_path(digest)
+
+        try:
+            data = file_path.read_bytes()
+            os.utime(file_path)
+        except FileNotFoundError:
+            with self.lock:
+                self.misses += 1
+
+                if (size := self.files.pop(digest, None)) is not None:
+                    self.size -= size
+
+            return None
+
+        with self.lock:
+            self.hits += 1
+
+            if digest not in self.files:
+                # Written by another process
+                self.files[digest] = len(data)
+                self.size += len(data)
+
+            self.files.move_to_end(digest)
+
+        return data
+
+    def put(self, key: str, data: bytes):
+        if len(data) > self.max_size:
+            return
+
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        file_path = self.get_file_path(digest)
+        tmp_file_path = file_path.with_name(f'{file_path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file_path.write_bytes(data)
+        os.replace(tmp_file_path, file_path)
+
+        with self.lock:
+            if (size := self.files.pop(digest, None)) is not None:
+                self.size -= size
+
+            self.files[digest] = len(data)
+            self.size += len(data)
+            self._evict()
+
+    def _evict(self):
+        while self.size > self.max_size:
+            digest, size = self.files.popitem(last=False)
+            self.size -= size
+
+            try:
+                self.get_file_path(digest).unlink()
+            except FileNotFoundError:
+                pass
+
+    def get_stats(self) -> str:
+        total = self.hits + self.misses
+        hit_rate = self.hits / total * 100 if total else 0.0
+
+        return (
+            f'{len(self.files)} files, {self.size / 1024 / 1024:.0f}/{self.max_size / 1024 / 1024:.0f} MB, '
+            f'{hit_rate:.0f}% hit rate'
+        )
+
+
+def open_preview_cache(cache_dir_path: Path, max_size: int) -> PreviewDiskCache:
+    with _caches_lock:
+        try:
+            cache = _caches[cache_dir_path]
+        except KeyError:
+            cache = _caches[cache_dir_path] = PreviewDiskCache(cache_dir_path, max_size)
+
+    return cache
@@ -0,0 +1,90 @@
+import hashlib
+import os
+from pathlib import Path
+from typing import Iterable, Iterator
+
+# Formats LibRaw (and so rawpy) can open
+RAW_EXTENSIONS = (
+    '.3fr', '.arw', '.cr2', '.cr3', '.crw', '.dcr', '.dng', '.erf', '.iiq', '.k25', '.kdc', '.mef', '.mos', '.mrw',
+    '.nef', '.nrw', '.orf', '.pef', '.raf', '.raw', '.rw2', '.rwl', '.sr2', '.srf', '.srw', '.x3f',
+)
+BITMAP_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+IMAGE_EXTENSIONS = RAW_EXTENSIONS + BITMAP_EXTENSIONS
+
+
+def parse_extensions(value: str | Iterable[str] | None) -> tuple[str, ...]:
+    """
+    Normalizes "arw,.CR2, nef" (or a sequence of such items) to ('.arw', '.cr2', '.nef').
+    Empty or None means all supported image formats.
+    """
+    if not value:
+        return IMAGE_EXTENSIONS
+
+    if isinstance(value, str):
+        value = value.split(',')
+
+    extensions = tuple(f'.{extension.strip().lstrip(".").lower()}' for extension in value if extension.strip())
+
+    return extensions or IMAGE_EXTENSIONS
+
+
+def is_raw_file(path: Path | str) -> bool:
+    return str(path).lower().endswith(RAW_EXTENSIONS)
+
+
+def get_file_checksum(path: Path) -> str:
+    """
+    SHA-256 of a file, the content address used by the server and the uploader.
+    """
+    digest = hashlib.sha256()
+
+    with open(path, 'rb') as f:
+        while chunk := f.read(1 << 20):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def has_extension(file_name: str, extensions: tuple[str, ...] = IMAGE_EXTENSIONS) -> bool:
+    return file_name.lower().endswith(extensions)
+
+
+def scan_dir_entries(path: Path, extensions: tuple[str, ...] = IMAGE_EXTENSIONS,
+                     sub_dirs: list[Path] | None = None) -> dict[str, tuple[int, int]]:
+    """
+    Names of the files with given (lowercase) extensions in a directory mapped to their (mtime_ns, size),
+    from a single os.scandir() pass. The extension check is case-insensitive.
+    Non-hidden subdirectories are appended to sub_dirs when it is given.
+    """
+    entries = {}
+
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.name.lower().endswith(extensions):
+                    if entry.is_file():
+                        stat = entry.stat()
+                        entries[entry.name] = (stat.st_mtime_ns, stat.st_size)
+                elif sub_dirs is not None and not entry.name.startswith('.') and entry.is_dir():
+                    sub_dirs.append(Path(entry.path))
+    except (FileNotFoundError, NotADirectoryError):
+        pass
+
+    return entries
+
+
+def scan_tree(path: Path, extensions: tuple[str, ...] = IMAGE_EXTENSIONS,
+              recursive: bool = False) -> Iterator[tuple[Path, dict[str, tuple[int, int]]]]:
+    """
+    Yields (directory path, scan_dir_entries() result) for a directory and, if recursive, its non-hidden
+    subdirectories, each directory being read once.
+    """
+    pending_dirs = [path]
+
+    while pending_dirs:
+        dir_path = pending_dirs.pop()
+        sub_dirs = [] if recursive else None
+        yield dir_path, scan_dir_entries(dir_path, extensions, sub_dirs)
+
+        if sub_dirs:
+            pending_dirs.extend(sorted(sub_dirs, reverse=True))
@@ -0,0 +1,208 @@
+import io
+import json
+import os
+from pathlib import Path
+from typing import Iterable, Mapping
+
+from dataset_image_annotator import thumbs
+
+HASHES_FILE_NAME = 'hashes.json'
+DHASH_SIZE = 8
+DEFAULT_MAX_DISTANCE = 6
+
+
+def compute_dhashes(images: Iterable) -> list[int]:
+    """
+    64 bit difference hashes of grayscale images already scaled to DHASH_SIZE + 1 by DHASH_SIZE pixels:
+    each bit tells whether a pixel is brighter than its left neighbour. All images are hashed at once.
+    """
+    import numpy as np
+
+    pixels = np.asarray(list(images), dtype=np.int16).reshape(-1, DHASH_SIZE, DHASH_SIZE + 1)
+
+    if not len(pixels):
+        return []
+
+    bits = (pixels[:, :, 1:] > pixels[:, :, :-1]).reshape(len(pixels), -1)
+
+    return [int(value) for value in np.packbits(bits, axis=1).view('>u8').ravel()]
+
+
+def load_dhash_image(thumbnail_data: bytes):
+    from PIL import Image
+
+    with Image.open(io.BytesIO(thumbnail_data)) as image:
+        return image.convert('L').resize((DHASH_SIZE + 1, DHASH_SIZE), Image.Resampling.BOX)
+
+
+def update_image_hashes(path: Path, entries: Mapping[str, tuple[int, int]], packed: bool = False) -> dict[str, int]:
+    """
+    Perceptual hashes of the images of a directory by lowercased file name, computed from their grid thumbnails
+    and kept next to them in .thumbs/hashes.json as [mtime_ns, size, hash]. Only images that changed since the
+    last call are hashed, images without an up-to-date thumbnail are skipped.
+    """
+    thumbnail_dir_path = thumbs.get_thumbnail_dir_path(path)
+    hashes_path = thumbnail_dir_path / HASHES_FILE_NAME
+
+    try:
+        with open(hashes_path, 'r') as f:
+            stored_hashes: dict[str, list[int]] = json.load(f)
+    except (FileNotFoundError, ValueError):
+        stored_hashes = {}
+
+    hashes = {}
+    stale_names = []
+    stale_images = []
+
+    for file_name, (mtime_ns, size) in entries.items():
+        stored_hash = stored_hashes.get(file_name.lower())
+
+        if stored_hash is not None and stored_hash[:2] == [mtime_ns, size]:
+            hashes[file_name.lower()] = stored_hash[2]
+            continue
+
+        thumbnail_data = thumbs.read_thumbnail_data(thumbnail_dir_path, Path(path, file_name), (mtime_ns, size),
+                                                    packed)
+
+        if thumbnail_data is None:
+            continue
+
+        try:
+            stale_images.append(load_dhash_image(thumbnail_data))
+        except OSError as e:
+            print(f'Cannot read thumbnail of {file_name}: {e}')
+            continue
+
+        stale_names.append(file_name)
+
+    for file_name, value in zip(stale_names, compute_dhashes(stale_images)):
+        hashes[file_name.lower()] = value
+
+    if stale_names or len(hashes) != len(stored_hashes):
+        new_stored_hashes = {
+            file_name.lower(): [*entries[file_name], hashes[file_name.lower()]]
+            for file_name in entries
+            if file_name.lower() in hashes
+        }
+        tmp_hashes_path = hashes_path.with_name(f'{hashes_path.name}.tmp')
+        thumbnail_dir_path.mkdir(exist_ok=True)
+
+        with open(tmp_hashes_path, 'w') as f:
+            json.dump(new_stored_hashes, f)
+
+        os.replace(tmp_hashes_path, hashes_path)
+
+    return hashes
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over 64 bit hashes with the Hamming distance, for finding all items within a distance
+    without comparing against every item.
+    Node: (hash, items with that exact hash, children by their distance to the node)
+    """
+
+    def __init__(self):
+        self.root: tuple[int, list, dict] | None = None
+
+    def add(self, value: int, item):
+        if self.root is None:
+            self.root = (value, [item], {})
+            return
+
+        node = self.root
+
+        while True:
+            distance = (node[0] ^ value).bit_count()
+
+            if distance == 0:
+                node[1].append(item)
+                return
+
+            if (child := node[2].get(distance)) is None:
+                node[2][distance] = (value, [item], {})
+                return
+
+            node = child
+
+    def search(self, value: int, max_distance: int) -> list:
+        results = []
+        nodes = [self.root] if self.root is not None else []
+
+        while nodes:
+            node_value, items, children = nodes.pop()
+            distance = (node_value ^ value).bit_count()
+
+            if distance <= max_distance:
+                results.extend(items)
+
+            # Triangle inequality: only subtrees within max_distance of the distance to this node can match
+            for child_distance, child in children.items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    nodes.append(child)
+
+        return results
+
+
+def group_similar(hashes: Mapping[str, int], max_distance: int = DEFAULT_MAX_DISTANCE) -> dict[str, str]:
+    """
+    Clusters images whose hashes are within max_distance of each other, transitively, so a whole burst ends up
+    in one group even if its first and last frames differ more. Returns the group of each image that has
+    near-duplicates, identified by the alphabetically first file name in it.
+    """
+    tree = BKTree()
+    parents = {file_name: file_name for file_name in hashes}
+
+    def find(file_name: str) -> str:
+        while parents[file_name] != file_name:
+            parents[file_name] = parents[parents[file_name]]
+            file_name = parents[file_name]
+
+        return file_name
+
+    for file_name, value in hashes.items():
+        tree.add(value, file_name)
+
+    for file_name, value in hashes.items():
+        for similar_file_name in tree.search(value, max_distance):
+            root, similar_root = find(file_name), find(similar_file_name)
+
+            if root != similar_root:
+                parents[max(root, similar_root)] = min(root, similar_root)
+
+    groups = {}
+    group_sizes = {}
+
+    for file_name in hashes:
+        groups[file_name] = root = find(file_name)
+        group_sizes[root] = group_sizes.get(root, 0) + 1
+
+    return {file_name: group for file_name, group in groups.items() if group_sizes[group] > 1}
+
+
+def get_group_members(groups: Mapping[str, str]) -> dict[str, list[str]]:
+    members = {}
+
+    for file_name, group in groups.items():
+        members.setdefault(group, []).append(file_name)
+
+    return members
+
+
+def collapse_file_names(file_names: Iterable[str], groups: Mapping[str, str]) -> set[str]:
+    """
+    Keeps the alphabetically first of the given (lowercased) file names of each group, and all ungrouped ones.
+    """
+    seen_groups = set()
+    collapsed = set()
+
+    for file_name in sorted(file_names):
+        if (group := groups.get(file_name)) is not None:
+            if group in seen_groups:
+                continue
+
+            seen_groups.add(group)
+
+        collapsed.add(file_name)
+
+    return collapsed
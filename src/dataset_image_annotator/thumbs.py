@@ -0,0 +1,354 @@
+import argparse
+import concurrent.futures
+import io
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Iterator, Mapping, Sequence
+
+from dataset_image_annotator.packed_thumbs import PACK_FILE_NAME, get_mtime_ms, open_packed_store
+from dataset_image_annotator.preview_cache import PreviewDiskCache, get_file_cache_key
+from dataset_image_annotator.scanner import IMAGE_EXTENSIONS, is_raw_file, parse_extensions, scan_tree
+
+# rawpy, Pillow and numpy are imported where they are used: the GUI imports this module for the path helpers and
+# should not pay for them before its window is up
+if TYPE_CHECKING:
+    import numpy as np
+    from PIL import Image
+
+THUMBNAIL_DIR_NAME = '.thumbs'
+THUMBNAIL_WIDTH = 80
+THUMBNAIL_QUALITY = 90
+PREVIEW_MAX_SIZE = 2560
+
+ProgressCallback = Callable[[int, int, Path, Exception | None], None]
+
+
+def get_raw_thumbnail(path: Path):
+    import rawpy
+
+    with rawpy.imread(str(path)) as raw:
+        try:
+            thumb = raw.extract_thumb()
+        except rawpy.LibRawNoThumbnailError:
+            print(f'No thumbnail found in {path}')
+        except rawpy.LibRawUnsupportedThumbnailError:
+            print(f'Unsupported thumbnail in {path}')
+        else:
+            return thumb
+
+
+def develop_raw(path: Path, half_size: bool = False) -> 'np.ndarray':
+    """
+    Demosaics the raw data into an 8-bit RGB array of shape (height, width, 3) using the camera white balance.
+    half_size skips interpolation and halves both dimensions, which is several times faster (a quick first pass).
+    """
+    import rawpy
+
+    with rawpy.imread(str(path)) as raw:
+        return raw.postprocess(half_size=half_size, use_camera_wb=True, output_bps=8)
+
+
+def get_thumbnail_dir_path(path: Path) -> Path:
+    return path / THUMBNAIL_DIR_NAME
+
+
+def get_preview_path(thumbnail_dir_path: Path, path: Path) -> Path:
+    return thumbnail_dir_path / f'anon_{path.name}.jpg'
+
+
+def get_thumbnail_path(thumbnail_dir_path: Path, path: Path) -> Path:
+    return thumbnail_dir_path / f'{path.name.lower()}.jpg'
+
+
+def is_thumbnail_fresh(thumbnail_dir_path: Path, path: Path, packed: bool = False,
+                       source_entry: tuple[int, int] | None = None) -> bool:
+    """
+    source_entry: (mtime_ns, size) of the source file if already known from a directory scan
+    """
+    if source_entry is None:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return False
+
+        source_entry = (stat.st_mtime_ns, stat.st_size)
+
+    source_mtime_ns, source_size = source_entry
+
+    if packed:
+        return open_packed_store(thumbnail_dir_path).is_fresh(path.name, source_mtime_ns // 1_000_000, source_size)
+
+    try:
+        preview_stat = get_preview_path(thumbnail_dir_path, path).stat()
+        thumbnail_stat = get_thumbnail_path(thumbnail_dir_path, path).stat()
+    except FileNotFoundError:
+        return False
+
+    return all(
+        _stat.st_size > 0 and _stat.st_mtime_ns >= source_mtime_ns
+        for _stat in (preview_stat, thumbnail_stat)
+    )
+
+
+def read_thumbnail_data(thumbnail_dir_path: Path, path: Path, source_entry: tuple[int, int],
+                        packed: bool = False) -> bytes | None:
+    """
+    JPEG data of the up-to-date grid thumbnail, packed or loose like generate_thumbnail() wrote it, or None if
+    there is none yet. Without packed no store is opened.
+    """
+    mtime_ns, size = source_entry
+
+    if packed:
+        data = open_packed_store(thumbnail_dir_path).get(path.name, mtime_ns // 1_000_000, size)
+
+        return bytes(data) if data is not None else None
+
+    if is_thumbnail_fresh(thumbnail_dir_path, path, source_entry=source_entry):
+        try:
+            return get_thumbnail_path(thumbnail_dir_path, path).read_bytes()
+        except FileNotFoundError:
+            pass
+
+    return None
+
+
+def open_preview(path: Path) -> 'Image.Image':
+    import rawpy
+    from PIL import Image
+
+    if not is_raw_file(path):
+        return Image.open(path)
+
+    if (thumb := get_raw_thumbnail(path)) is None:
+        # Some bodies embed no usable preview
+        return Image.fromarray(develop_raw(path, half_size=True))
+
+    if thumb.format == rawpy.ThumbFormat.JPEG:
+        return Image.open(io.BytesIO(thumb.data))
+
+    return Image.fromarray(thumb.data)
+
+
+def open_stored_preview(path: Path) -> 'Image.Image | None':
+    """
+    Up-to-date anonymized preview written by generate_thumbnail(), much cheaper to read than the raw file.
+    """
+    from PIL import Image
+
+    thumbnail_dir_path = get_thumbnail_dir_path(path.parent)
+    stat = path.stat()
+
+    if data := open_packed_store(thumbnail_dir_path).get(path.name, get_mtime_ms(stat), stat.st_size, preview=True):
+        return Image.open(io.BytesIO(data))
+
+    if is_thumbnail_fresh(thumbnail_dir_path, path, source_entry=(stat.st_mtime_ns, stat.st_size)):
+        return Image.open(get_preview_path(thumbnail_dir_path, path))
+
+    return None
+
+
+def render_preview(path: Path, max_size: int = PREVIEW_MAX_SIZE) -> bytes:
+    """
+    Returns JPEG data of a display resolution preview, at most max_size pixels along the longer side.
+    """
+    from PIL import Image
+
+    if (preview := open_stored_preview(path)) is None:
+        preview = open_preview(path)
+
+    preview = preview.convert('RGB')
+    preview.thumbnail((max_size, max_size), Image.Resampling.BILINEAR, reducing_gap=2.0)
+    preview_buffer = io.BytesIO()
+    preview.save(preview_buffer, 'JPEG', quality=THUMBNAIL_QUALITY)
+
+    return preview_buffer.getvalue()
+
+
+def get_cached_preview(path: Path, preview_cache: PreviewDiskCache, cache_key: str | None = None) -> bytes:
+    """
+    render_preview() through the disk cache. cache_key defaults to the path, mtime and size of the file.
+    """
+    cache_key = cache_key or get_file_cache_key(path)
+
+    if (data := preview_cache.get(cache_key)) is None:
+        data = render_preview(path)
+        preview_cache.put(cache_key, data)
+
+    return data
+
+
+def render_thumbnail(path: Path) -> tuple[bytes, bytes]:
+    """
+    Returns JPEG data of the full-size anonymized preview and of the grid thumbnail for a raw or bitmap image.
+    Uses Pillow only, so it is safe to call from worker processes and threads that have no QApplication.
+    """
+    from PIL import Image
+
+    preview = open_preview(path).convert('RGB')
+    preview_buffer = io.BytesIO()
+    preview.save(preview_buffer, 'JPEG', quality=THUMBNAIL_QUALITY)
+
+    height = max(1, round(preview.height * THUMBNAIL_WIDTH / preview.width))
+    thumbnail = preview.resize((THUMBNAIL_WIDTH, height), Image.Resampling.BILINEAR, reducing_gap=2.0)
+    thumbnail_buffer = io.BytesIO()
+    thumbnail.save(thumbnail_buffer, 'JPEG', quality=THUMBNAIL_QUALITY)
+
+    return preview_buffer.getvalue(), thumbnail_buffer.getvalue()
+
+
+def write_file(path: Path, data: bytes):
+    """
+    Writes to a temporary file and renames it over path, so a reader never sees a torn file. The batch processes
+    and the GUI's thumbnail threads may write the same file at once, each one uses a temporary file of its own.
+    """
+    tmp_path = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+
+    try:
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def generate_thumbnail(thumbnail_dir_path: Path, path: Path, packed: bool = False):
+    preview_data, thumbnail_data = render_thumbnail(path)
+
+    if packed:
+        open_packed_store(thumbnail_dir_path).put(path, preview_data, thumbnail_data)
+    else:
+        write_file(get_preview_path(thumbnail_dir_path, path), preview_data)
+        write_file(get_thumbnail_path(thumbnail_dir_path, path), thumbnail_data)
+
+
+def get_parsed_args():
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--data-root', type=str)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--packed', action='store_true')
+    parser.add_argument('--compact', action='store_true',
+                        help='rewrite packs without the thumbnails of deleted or regenerated images')
+    parser.add_argument('--extensions', type=str, help='comma separated, all supported image formats by default')
+
+    args, args_other = parser.parse_known_args()
+
+    return args
+
+
+def iter_image_files(path: Path, recursive: bool = False,
+                     extensions: tuple[str, ...] = IMAGE_EXTENSIONS) -> Iterator[tuple[Path, tuple[int, int]]]:
+    for dir_path, entries in scan_tree(path, extensions, recursive):
+        for name in sorted(entries):
+            yield Path(dir_path, name), entries[name]
+
+
+def list_stale_image_files(path: Path, recursive: bool = False, packed: bool = False,
+                           extensions: tuple[str, ...] = IMAGE_EXTENSIONS,
+                           entries: Mapping[str, tuple[int, int]] | None = None) -> Sequence[Path]:
+    """
+    entries: scan_dir_entries() result for path to reuse instead of scanning again (non-recursive only)
+    """
+    if entries is not None:
+        image_files = ((Path(path, name), entries[name]) for name in sorted(entries))
+    else:
+        image_files = iter_image_files(path, recursive, extensions)
+
+    return tuple(
+        f
+        for f, source_entry in image_files
+        if not is_thumbnail_fresh(get_thumbnail_dir_path(f.parent), f, packed, source_entry)
+    )
+
+
+def generate_thumbnails(path: Path, max_workers: int | None = None,
+                        progress_callback: ProgressCallback | None = None,
+                        recursive: bool = False, packed: bool = False,
+                        extensions: tuple[str, ...] = IMAGE_EXTENSIONS,
+                        entries: Mapping[str, tuple[int, int]] | None = None) -> Mapping[Path, Exception]:
+    """
+    Generates thumbnails for all images in a directory that have no up-to-date thumbnail yet.
+    progress_callback is called in the calling process with (done, total, file path, error or None)
+    as each file finishes. Returns errors by file path.
+    With packed=True workers only render and this process appends the results to the directory's pack.
+    """
+    image_files = list_stale_image_files(path, recursive, packed, extensions, entries)
+    errors = {}
+
+    if not image_files:
+        return errors
+
+    for thumbnail_dir_path in {get_thumbnail_dir_path(f.parent) for f in image_files}:
+        thumbnail_dir_path.mkdir(exist_ok=True)
+
+    max_workers = min(max_workers or os.cpu_count() or 1, len(image_files))
+
+    # spawn: workers must not inherit the GUI process' Qt state
+    mp_context = multiprocessing.get_context('spawn')
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers, mp_context=mp_context) as executor:
+        if packed:
+            futures = {executor.submit(render_thumbnail, f): f for f in image_files}
+        else:
+            futures = {executor.submit(generate_thumbnail, get_thumbnail_dir_path(f.parent), f): f for f in image_files}
+
+        for done, future in enumerate(concurrent.futures.as_completed(futures), start=1):
+            image_file = futures[future]
+
+            if error := future.exception():
+                errors[image_file] = error
+            elif packed:
+                open_packed_store(get_thumbnail_dir_path(image_file.parent)).put(image_file, *future.result())
+
+            if progress_callback:
+                progress_callback(done, len(image_files), image_file, error)
+
+    if packed:
+        for thumbnail_dir_path in {get_thumbnail_dir_path(f.parent) for f in image_files}:
+            open_packed_store(thumbnail_dir_path).flush()
+
+    return errors
+
+
+def main():
+    args = get_parsed_args()
+
+    if not args.data_root:
+        print('--data-root is required', file=sys.stderr)
+        sys.exit(2)
+
+    data_root_path = Path(args.data_root).expanduser()
+    processed_files = []
+
+    def on_progress(done: int, total: int, file_path: Path, error: Exception | None):
+        processed_files.append(file_path)
+
+        if error:
+            print(f'Cannot generate thumbnail for {file_path}: {error}', file=sys.stderr)
+
+    started_at = time.perf_counter()
+    errors = generate_thumbnails(data_root_path, args.workers, on_progress, recursive=True, packed=args.packed,
+                                 extensions=parse_extensions(args.extensions))
+
+    if args.compact:
+        for dir_path, entries in scan_tree(data_root_path, parse_extensions(args.extensions), recursive=True):
+            if Path(get_thumbnail_dir_path(dir_path), PACK_FILE_NAME).exists():
+                open_packed_store(get_thumbnail_dir_path(dir_path)).compact(entries)
+
+    elapsed = max(time.perf_counter() - started_at, 1e-9)
+    total_mb = sum(f.stat().st_size for f in processed_files) / 1024 / 1024
+
+    print(
+        f'{len(processed_files)} files ({len(errors)} failed), {total_mb:.1f} MB in {elapsed:.1f} s: '
+        f'{len(processed_files) / elapsed:.1f} files/s, {total_mb / elapsed:.1f} MB/s'
+    )
+
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+
+################################################################################
+## Form generated from reading UI file 'main_window.ui'
+##
+## Created by: Qt User Interface Compiler version 6.8.3
+##
+## WARNING! All changes made in this file will be lost when recompiling UI file!
+################################################################################
+
+from PySide6.QtCore import (QCoreApplication, QMetaObject, QRect, QSize, Qt)
+from PySide6.QtWidgets import (QAbstractItemView, QCheckBox, QComboBox, QGraphicsView,
+    QHBoxLayout, QLabel, QLineEdit, QListView,
+    QMenuBar, QPushButton, QSizePolicy, QStatusBar,
+    QToolButton, QVBoxLayout, QWidget)
+
+class Ui_MainWindow(object):
+    def setupUi(self, MainWindow):
+        if not MainWindow.objectName():
+            MainWindow.setObjectName(u"MainWindow")
+        MainWindow.resize(906, 769)
+        sizePolicy = QSizePolicy(QSizePolicy.Policy.Preferred, QSizePolicy.Policy.Preferred)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(0)
+        sizePolicy.setHeightForWidth(MainWindow.sizePolicy().hasHeightForWidth())
+        MainWindow.setSizePolicy(sizePolicy)
+        self.centralwidget = QWidget(MainWindow)
+        self.centralwidget.setObjectName(u"centralwidget")
+        sizePolicy.setHeightForWidth(self.centralwidget.sizePolicy().hasHeightForWidth())
+        self.centralwidget.setSizePolicy(sizePolicy)
+        self.centralwidget.setAutoFillBackground(False)
+        self.verticalLayout = QVBoxLayout(self.centralwidget)
+        self.verticalLayout.setObjectName(u"verticalLayout")
+        self.typeHLayout = QHBoxLayout()
+        self.typeHLayout.setObjectName(u"typeHLayout")
+        self.type_label = QLabel(self.centralwidget)
+        self.type_label.setObjectName(u"type_label")
+
+        self.typeHLayout.addWidget(self.type_label)
+
+        self.type_combo_box = QComboBox(self.centralwidget)
+        self.type_combo_box.setObjectName(u"type_combo_box")
+        self.type_combo_box.setEnabled(False)
+        self.type_combo_box.setEditable(True)
+
+        self.typeHLayout.addWidget(self.type_combo_box)
+
+
+        self.verticalLayout.addLayout(self.typeHLayout)
+
+        self.makeHLayout = QHBoxLayout()
+        self.makeHLayout.setObjectName(u"makeHLayout")
+        self.make_label = QLabel(self.centralwidget)
+        self.make_label.setObjectName(u"make_label")
+
+        self.makeHLayout.addWidget(self.make_label)
+
+        self.make_combo_box = QComboBox(self.centralwidget)
+        self.make_combo_box.setObjectName(u"make_combo_box")
+        self.make_combo_box.setEnabled(False)
+        self.make_combo_box.setEditable(True)
+
+        self.makeHLayout.addWidget(self.make_combo_box)
+
+
+        self.verticalLayout.addLayout(self.makeHLayout)
+
+        self.modelHLayout = QHBoxLayout()
+        self.modelHLayout.setObjectName(u"modelHLayout")
+        self.model_label = QLabel(self.centralwidget)
+        self.model_label.setObjectName(u"model_label")
+
+        self.modelHLayout.addWidget(self.model_label)
+
+        self.model_combo_box = QComboBox(self.centralwidget)
+        self.model_combo_box.setObjectName(u"model_combo_box")
+        self.model_combo_box.setEnabled(False)
+        self.model_combo_box.setEditable(True)
+
+        self.modelHLayout.addWidget(self.model_combo_box)
+
+
+        self.verticalLayout.addLayout(self.modelHLayout)
+
+        self.bodyHLayout = QHBoxLayout()
+        self.bodyHLayout.setObjectName(u"bodyHLayout")
+        self.body_label = QLabel(self.centralwidget)
+        self.body_label.setObjectName(u"body_label")
+
+        self.bodyHLayout.addWidget(self.body_label)
+
+        self.body_combo_box = QComboBox(self.centralwidget)
+        self.body_combo_box.setObjectName(u"body_combo_box")
+        self.body_combo_box.setEnabled(False)
+        self.body_combo_box.setEditable(True)
+
+        self.bodyHLayout.addWidget(self.body_combo_box)
+
+
+        self.verticalLayout.addLayout(self.bodyHLayout)
+
+        self.colorHLayout = QHBoxLayout()
+        self.colorHLayout.setObjectName(u"colorHLayout")
+        self.color_label = QLabel(self.centralwidget)
+        self.color_label.setObjectName(u"color_label")
+
+        self.colorHLayout.addWidget(self.color_label)
+
+        self.color_combo_box = QComboBox(self.centralwidget)
+        self.color_combo_box.setObjectName(u"color_combo_box")
+        self.color_combo_box.setEnabled(False)
+        self.color_combo_box.setEditable(True)
+
+        self.colorHLayout.addWidget(self.color_combo_box)
+
+
+        self.verticalLayout.addLayout(self.colorHLayout)
+
+        self.apply_button = QPushButton(self.centralwidget)
+        self.apply_button.setObjectName(u"apply_button")
+        self.apply_button.setEnabled(False)
+
+        self.verticalLayout.addWidget(self.apply_button)
+
+        self.horizontalLayout = QHBoxLayout()
+        self.horizontalLayout.setObjectName(u"horizontalLayout")
+        self.photo_view = QGraphicsView(self.centralwidget)
+        self.photo_view.setObjectName(u"photo_view")
+        sizePolicy1 = QSizePolicy(QSizePolicy.Policy.MinimumExpanding, QSizePolicy.Policy.MinimumExpanding)
+        sizePolicy1.setHorizontalStretch(0)
+        sizePolicy1.setVerticalStretch(0)
+        sizePolicy1.setHeightForWidth(self.photo_view.sizePolicy().hasHeightForWidth())
+        self.photo_view.setSizePolicy(sizePolicy1)
+
+        self.horizontalLayout.addWidget(self.photo_view)
+
+        self.thumbnail_list_view = QListView(self.centralwidget)
+        self.thumbnail_list_view.setObjectName(u"thumbnail_list_view")
+        sizePolicy2 = QSizePolicy(QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Expanding)
+        sizePolicy2.setHorizontalStretch(0)
+        sizePolicy2.setVerticalStretch(0)
+        sizePolicy2.setHeightForWidth(self.thumbnail_list_view.sizePolicy().hasHeightForWidth())
+        self.thumbnail_list_view.setSizePolicy(sizePolicy2)
+        self.thumbnail_list_view.setMinimumSize(QSize(110, 0))
+        self.thumbnail_list_view.setMaximumSize(QSize(110, 16777215))
+        self.thumbnail_list_view.setIconSize(QSize(80, 80))
+        self.thumbnail_list_view.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.thumbnail_list_view.setItemAlignment(Qt.AlignCenter)
+
+        self.horizontalLayout.addWidget(self.thumbnail_list_view)
+
+
+        self.verticalLayout.addLayout(self.horizontalLayout)
+
+        self.filterHLayout = QHBoxLayout()
+        self.filterHLayout.setObjectName(u"filterHLayout")
+        self.filter_label = QLabel(self.centralwidget)
+        self.filter_label.setObjectName(u"filter_label")
+
+        self.filterHLayout.addWidget(self.filter_label)
+
+        self.filter_edit = QLineEdit(self.centralwidget)
+        self.filter_edit.setObjectName(u"filter_edit")
+        self.filter_edit.setClearButtonEnabled(True)
+
+        self.filterHLayout.addWidget(self.filter_edit)
+
+        self.collapse_check_box = QCheckBox(self.centralwidget)
+        self.collapse_check_box.setObjectName(u"collapse_check_box")
+
+        self.filterHLayout.addWidget(self.collapse_check_box)
+
+
+        self.verticalLayout.addLayout(self.filterHLayout)
+
+        self.pathHLayout = QHBoxLayout()
+        self.pathHLayout.setObjectName(u"pathHLayout")
+        self.path_label = QLabel(self.centralwidget)
+        self.path_label.setObjectName(u"path_label")
+
+        self.pathHLayout.addWidget(self.path_label)
+
+        self.path_edit = QLineEdit(self.centralwidget)
+        self.path_edit.setObjectName(u"path_edit")
+
+        self.pathHLayout.addWidget(self.path_edit)
+
+        self.path_browser_button = QToolButton(self.centralwidget)
+        self.path_browser_button.setObjectName(u"path_browser_button")
+
+        self.pathHLayout.addWidget(self.path_browser_button)
+
+
+        self.verticalLayout.addLayout(self.pathHLayout)
+
+        MainWindow.setCentralWidget(self.centralwidget)
+        self.menubar = QMenuBar(MainWindow)
+        self.menubar.setObjectName(u"menubar")
+        self.menubar.setGeometry(QRect(0, 0, 906, 21))
+        MainWindow.setMenuBar(self.menubar)
+        self.statusbar = QStatusBar(MainWindow)
+        self.statusbar.setObjectName(u"statusbar")
+        MainWindow.setStatusBar(self.statusbar)
+#if QT_CONFIG(shortcut)
+        self.type_label.setBuddy(self.type_combo_box)
+        self.make_label.setBuddy(self.make_combo_box)
+        self.model_label.setBuddy(self.model_combo_box)
+        self.body_label.setBuddy(self.body_combo_box)
+        self.color_label.setBuddy(self.color_combo_box)
+        self.filter_label.setBuddy(self.filter_edit)
+        self.path_label.setBuddy(self.path_edit)
+#endif // QT_CONFIG(shortcut)
+
+        self.retranslateUi(MainWindow)
+
+        QMetaObject.connectSlotsByName(MainWindow)
+    # setupUi
+
+    def retranslateUi(self, MainWindow):
+        MainWindow.setWindowTitle(QCoreApplication.translate("MainWindow", u"Annotator", None))
+        self.type_label.setText(QCoreApplication.translate("MainWindow", u"Type:", None))
+        self.make_label.setText(QCoreApplication.translate("MainWindow", u"Make:", None))
+        self.model_label.setText(QCoreApplication.translate("MainWindow", u"Model:", None))
+        self.body_label.setText(QCoreApplication.translate("MainWindow", u"Body:", None))
+        self.color_label.setText(QCoreApplication.translate("MainWindow", u"Color:", None))
+#if QT_CONFIG(tooltip)
+        self.apply_button.setToolTip(QCoreApplication.translate("MainWindow", u"Write the filled in fields to all selected images (Ctrl+Return)", None))
+#endif // QT_CONFIG(tooltip)
+        self.apply_button.setText(QCoreApplication.translate("MainWindow", u"Apply to selected", None))
+        self.filter_label.setText(QCoreApplication.translate("MainWindow", u"Filter:", None))
+        self.filter_edit.setPlaceholderText(QCoreApplication.translate("MainWindow", u"make:audi -model color~red", None))
+#if QT_CONFIG(tooltip)
+        self.collapse_check_box.setToolTip(QCoreApplication.translate("MainWindow", u"Show one image per group of near-duplicates, annotations apply to the whole group", None))
+#endif // QT_CONFIG(tooltip)
+        self.collapse_check_box.setText(QCoreApplication.translate("MainWindow", u"Collapse bursts", None))
+        self.path_label.setText(QCoreApplication.translate("MainWindow", u"Path:", None))
+        self.path_browser_button.setText(QCoreApplication.translate("MainWindow", u"...", None))
+    # retranslateUi
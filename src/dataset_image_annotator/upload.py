@@ -1,27 +1,237 @@
 import argparse
 import asyncio
+import json
+import os
+import sys
+import time
 from pathlib import Path
+from typing import Iterator, Sequence
 
-from dataset_image_annotator.api_clients import annotator
+from dataset_image_annotator.api_clients.annotator import AnnotatorClient
+from dataset_image_annotator.scanner import RAW_EXTENSIONS, get_file_checksum, parse_extensions, scan_tree
+
+UPLOAD_JOURNAL_FILE_NAME = '.uploaded.jsonl'
+CHECKSUM_BATCH_SIZE = 256
+# Uploads start once the first, small batch is checked, the following ones double up to CHECKSUM_BATCH_SIZE
+FIRST_CHECKSUM_BATCH_SIZE = 8
 
 
 def get_parsed_args():
     parser = argparse.ArgumentParser(add_help=False)
     parser.add_argument('-a', '--annotator-server-address', type=str)
     parser.add_argument('-d', '--data-root', type=str)
+    parser.add_argument('-u', '--email', type=str)
+    parser.add_argument('-p', '--password', type=str, default=os.environ.get('ANNOTATOR_PASSWORD'))
+    parser.add_argument('-c', '--concurrency', type=int, default=4)
+    parser.add_argument('--extensions', type=str, help='comma separated, all raw formats by default')
+    parser.add_argument('--no-server-check', action='store_true',
+                        help='do not ask the server which files it already has (saves hashing them locally)')
 
     args, args_other = parser.parse_known_args()
 
     return args
 
 
+class UploadJournal:
+    """
+    Files uploaded from a data root so far, appended to as each upload finishes, so an interrupted run resumes
+    where it stopped. One JSON object per line: {"path": relative path, "mtime_ns": ..., "size": ...}
+    A file is uploaded again if it has changed since.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.entries: dict[str, tuple[int, int]] = {}
+        line = '\n'
+
+        try:
+            with open(path, 'r') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Torn last line of a killed run
+                        continue
+
+                    self.entries[record['path']] = (record['mtime_ns'], record['size'])
+        except FileNotFoundError:
+            pass
+
+        self.file = open(path, 'a')
+
+        if not line.endswith('\n'):
+            # Otherwise the next record would be appended to the torn line and lost with it
+            self.file.write('\n')
+
+    def is_uploaded(self, relative_path: str, entry: tuple[int, int]) -> bool:
+        return self.entries.get(relative_path) == tuple(entry)
+
+    def add(self, relative_path: str, entry: tuple[int, int]):
+        self.entries[relative_path] = tuple(entry)
+        self.file.write(json.dumps({'path': relative_path, 'mtime_ns': entry[0], 'size': entry[1]}) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class UploadStats:
+    def __init__(self):
+        self.uploaded_count = 0
+        self.uploaded_size = 0
+        self.skipped_count = 0
+        self.existing_count = 0
+        self.failed_count = 0
+        self.started_at = time.perf_counter()
+
+    def get_summary(self) -> str:
+        elapsed = max(time.perf_counter() - self.started_at, 1e-9)
+        uploaded_mb = self.uploaded_size / 1024 / 1024
+
+        return (
+            f'{self.uploaded_count} files uploaded, {self.skipped_count} skipped, '
+            f'{self.existing_count} already on the server, {self.failed_count} failed: '
+            f'{uploaded_mb:.1f} MB in {elapsed:.1f} s, '
+            f'{self.uploaded_count / elapsed:.1f} files/s, {uploaded_mb / elapsed:.1f} MB/s'
+        )
+
+
+def iter_checksum_batches(items: Sequence, first_size: int = FIRST_CHECKSUM_BATCH_SIZE,
+                          max_size: int = CHECKSUM_BATCH_SIZE) -> Iterator[Sequence]:
+    start = 0
+    size = max(1, first_size)
+
+    while start < len(items):
+        yield items[start:start + size]
+        start += size
+        size = min(size * 2, max_size)
+
+
+def list_upload_files(data_root_path: Path,
+                      extensions: tuple[str, ...] = RAW_EXTENSIONS) -> list[tuple[Path, tuple[int, int]]]:
+    return [
+        (Path(dir_path, file_name), entry)
+        for dir_path, entries in scan_tree(data_root_path, extensions, recursive=True)
+        for file_name, entry in sorted(entries.items())
+    ]
+
+
+async def upload_files(client: AnnotatorClient, data_root_path: Path, files: Sequence[tuple[Path, tuple[int, int]]],
+                       journal: UploadJournal, concurrency: int = 4, check_server: bool = True) -> UploadStats:
+    """
+    Uploads files not in the journal yet with at most concurrency uploads in flight.
+    With check_server, files are hashed locally in batches and the server is asked which of the checksums it
+    already has, so only new files are transferred. The next batch is hashed and checked while the files of the
+    current one are uploaded.
+    """
+    stats = UploadStats()
+    concurrency = max(1, concurrency)
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    pending_files = []
+
+    for file_path, entry in files:
+        relative_path = file_path.relative_to(data_root_path).as_posix()
+
+        if journal.is_uploaded(relative_path, entry):
+            stats.skipped_count += 1
+        else:
+            pending_files.append((file_path, relative_path, entry))
+
+    async def check_batch(batch: Sequence) -> tuple[Sequence, set[str]]:
+        existing = set()
+        checksums = [None] * len(batch)
+
+        if check_server:
+            try:
+                checksums = await asyncio.gather(
+                    *(asyncio.to_thread(get_file_checksum, file_path) for file_path, _, _ in batch)
+                )
+                existing_checksums = await client.get_existing_checksums(checksums)
+            except Exception as e:
+                # Network errors, but also an unexpected response, e.g. an error page from a proxy
+                print(f'Cannot check which files the server has, uploading all of them: {e!r}', file=sys.stderr)
+            else:
+                existing = {
+                    relative_path
+                    for (_, relative_path, _), checksum in zip(batch, checksums)
+                    if checksum in existing_checksums
+                }
+
+        return checksums, existing
+
+    async def produce():
+        batches = iter_checksum_batches(pending_files)
+        next_batch = next(batches, None)
+        next_check = asyncio.create_task(check_batch(next_batch)) if next_batch is not None else None
+
+        while next_check is not None:
+            batch = next_batch
+            checksums, existing = await next_check
+
+            # Started before this batch is queued: queuing waits for the workers
+            if (next_batch := next(batches, None)) is not None:
+                next_check = asyncio.create_task(check_batch(next_batch))
+            else:
+                next_check = None
+
+            for (file_path, relative_path, entry), checksum in zip(batch, checksums):
+                if relative_path in existing:
+                    journal.add(relative_path, entry)
+                    stats.existing_count += 1
+                else:
+                    # Passed on so a resumable upload does not hash the file again
+                    await queue.put((file_path, relative_path, entry, checksum))
+
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def worker():
+        while (item := await queue.get()) is not None:
+            file_path, relative_path, entry, checksum = item
+
+            try:
+                await client.upload_raw_file(file_path, checksum)
+            except Exception as e:
+                # One bad file or response must not abort the others, the next run retries it
+                print(f'Cannot upload {file_path}: {e!r}', file=sys.stderr)
+                stats.failed_count += 1
+            else:
+                journal.add(relative_path, entry)
+                stats.uploaded_count += 1
+                stats.uploaded_size += entry[1]
+
+    await asyncio.gather(produce(), *(worker() for _ in range(concurrency)))
+
+    return stats
+
+
 async def main():
     args = get_parsed_args()
+
+    if not args.annotator_server_address or not args.data_root:
+        print('--annotator-server-address and --data-root are required', file=sys.stderr)
+        sys.exit(2)
+
     annotator_server_address = args.annotator_server_address
     data_root_path = Path(args.data_root).expanduser()
+    extensions = parse_extensions(args.extensions) if args.extensions else RAW_EXTENSIONS
+    files = list_upload_files(data_root_path, extensions)
+    journal = UploadJournal(Path(data_root_path, UPLOAD_JOURNAL_FILE_NAME))
+
+    try:
+        async with AnnotatorClient(annotator_server_address, args.concurrency) as client:
+            if args.email:
+                await client.login(args.email, args.password or '')
+
+            stats = await upload_files(client, data_root_path, files, journal, args.concurrency,
+                                       not args.no_server_check)
+    finally:
+        journal.close()
+
+    print(stats.get_summary())
 
-    for raw_image in data_root_path:
-        await annotator.upload_raw_file(annotator_server_address, raw_image)
+    if stats.failed_count:
+        sys.exit(1)
 
     return True
 
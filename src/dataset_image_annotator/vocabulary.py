@@ -0,0 +1,140 @@
+import json
+import os
+from pathlib import Path
+from typing import Iterable, Mapping, Sequence
+
+VOCABULARY_FIELDS = ('type', 'make', 'model', 'body', 'color')
+VOCABULARY_FILE_NAME = '.metadata.vocabulary.json'
+
+
+class VocabularyIndex:
+    """
+    Inverted index of metadata field values (value -> file names per field), kept up to date one record at a time.
+    Serves both the completers (values by frequency) and grid filtering (file names by value).
+    Remembers the indexed values of each record so an update only touches the fields that changed.
+    """
+
+    def __init__(self, fields: Sequence[str] = VOCABULARY_FIELDS):
+        self.fields = fields
+        self.postings: dict[str, dict[str, set[str]]] = {field: {} for field in fields}
+        self.files_with_field: dict[str, set[str]] = {field: set() for field in fields}
+        self.values: dict[str, dict[str, str]] = {}
+
+    @classmethod
+    def from_metadata(cls, metadata: Mapping[str, Mapping], fields: Sequence[str] = VOCABULARY_FIELDS):
+        index = cls(fields)
+
+        for file_name, record in metadata.items():
+            index.update_record(file_name, record)
+
+        return index
+
+    def update_record(self, file_name: str, record: Mapping | None) -> set[str]:
+        """
+        Returns the fields whose vocabulary changed. A None record removes the file from the index.
+        """
+        old_values = self.values.get(file_name, {})
+        new_values = {field: value for field in self.fields if record and (value := record.get(field))}
+        changed_fields = set()
+
+        for field in self.fields:
+            old_value = old_values.get(field)
+            new_value = new_values.get(field)
+
+            if old_value == new_value:
+                continue
+
+            postings = self.postings[field]
+
+            if old_value:
+                postings[old_value].discard(file_name)
+
+                if not postings[old_value]:
+                    del postings[old_value]
+
+                self.files_with_field[field].discard(file_name)
+
+            if new_value:
+                postings.setdefault(new_value, set()).add(file_name)
+                self.files_with_field[field].add(file_name)
+
+            changed_fields.add(field)
+
+        if new_values:
+            self.values[file_name] = new_values
+        else:
+            self.values.pop(file_name, None)
+
+        return changed_fields
+
+    def update_records(self, records: Iterable[tuple[str, Mapping | None]]) -> set[str]:
+        changed_fields = set()
+
+        for file_name, record in records:
+            changed_fields |= self.update_record(file_name, record)
+
+        return changed_fields
+
+    def get_values(self, field: str) -> list[str]:
+        """
+        Most frequent values first, alphabetically within the same frequency.
+        """
+        return [
+            value
+            for value, _ in sorted(self.postings[field].items(), key=lambda item: (-len(item[1]), item[0]))
+        ]
+
+    def get_files(self, field: str, value: str) -> set[str]:
+        return self.postings[field].get(value, set())
+
+    def find_files(self, field: str, text: str) -> set[str]:
+        """
+        Files whose field value contains text. Scans distinct values only, not records.
+        """
+        files = set()
+
+        for value, file_names in self.postings[field].items():
+            if text in value:
+                files |= file_names
+
+        return files
+
+
+def get_vocabulary_path(data_root_path: Path) -> Path:
+    return Path(data_root_path, VOCABULARY_FILE_NAME)
+
+
+def load_vocabulary(
+    data_root_path: Path, fields: Sequence[str] = VOCABULARY_FIELDS
+) -> tuple[VocabularyIndex, dict[str, tuple[int, int]]] | None:
+    """
+    The index saved by save_vocabulary() and the (mtime_ns, size) of the metadata files it was built from, so the
+    caller only needs to read the records changed since. None if there is no usable saved index.
+    """
+    try:
+        with open(get_vocabulary_path(data_root_path), 'r') as f:
+            saved = json.load(f)
+
+        if saved['fields'] != list(fields):
+            return None
+
+        index = VocabularyIndex.from_metadata(saved['values'], fields)
+        entries = {file_name: (mtime_ns, size) for file_name, (mtime_ns, size) in saved['entries'].items()}
+    except (FileNotFoundError, ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+    return index, entries
+
+
+def save_vocabulary(data_root_path: Path, index: VocabularyIndex, entries: Mapping[str, tuple[int, int]]):
+    """
+    entries: (mtime_ns, size) of the metadata files the index is up to date with
+    """
+    vocabulary_path = get_vocabulary_path(data_root_path)
+    tmp_vocabulary_path = vocabulary_path.with_name(f'{vocabulary_path.name}.tmp')
+
+    # Only a cache of the records: renamed into place, but not synced
+    with open(tmp_vocabulary_path, 'w') as f:
+        json.dump({'fields': list(index.fields), 'entries': entries, 'values': index.values}, f)
+
+    os.replace(tmp_vocabulary_path, vocabulary_path)
@@ -0,0 +1,30 @@
+from pathlib import Path
+from typing import Sequence
+
+from dataset_image_annotator.scanner import scan_dir_entries
+
+
+class DirectorySnapshot:
+    """
+    Names, mtimes and sizes of the files with given extensions in a directory, used to turn a bare
+    "directory changed" notification into the individual added, removed and modified files.
+    """
+
+    def __init__(self, path: Path, extensions: tuple[str, ...]):
+        self.path = path
+        self.extensions = extensions
+        self.entries = scan_dir_entries(path, extensions)
+
+    def refresh(self) -> tuple[Sequence[str], Sequence[str], Sequence[str]]:
+        old_entries = self.entries
+        self.entries = new_entries = scan_dir_entries(self.path, self.extensions)
+
+        added = tuple(name for name in new_entries if name not in old_entries)
+        removed = tuple(name for name in old_entries if name not in new_entries)
+        modified = tuple(
+            name
+            for name, key in new_entries.items()
+            if name in old_entries and old_entries[name] != key
+        )
+
+        return added, removed, modified
@@ -0,0 +1,124 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from dataset_image_annotator.api.http import app
+from dataset_image_annotator.api.v1.endpoints import get_current_user
+from dataset_image_annotator.core.previews import get_derivative_etag, is_etag_matched
+from dataset_image_annotator.db import Base
+from dataset_image_annotator.db.models import ImageSample
+from dataset_image_annotator.db.user_db_helpers import get_async_session
+
+
+@pytest.fixture
+def client(tmp_path):
+    thumbnail_path = tmp_path / 'a.thumbnail.jpg'
+    thumbnail_path.write_bytes(b'0123456789')
+    engine = create_async_engine(f'sqlite+aiosqlite:///{tmp_path / "test.db"}')
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def set_up():
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+
+        async with session_maker() as session:
+            session.add_all([
+                ImageSample(filename='a.nef', checksum='a' * 64, location='images/a.nef', width=6048, height=4024,
+                            captured_at=datetime(2024, 5, 1, 12, 30), camera_make='NIKON CORPORATION',
+                            camera_model='NIKON Z 6', lens='NIKKOR Z 24-70mm f/4 S',
+                            thumbnail_location=str(thumbnail_path)),
+                ImageSample(filename='b.cr2', checksum='b' * 64, location='images/b.cr2'),
+            ])
+            await session.commit()
+
+    async def get_test_session():
+        async with session_maker() as session:
+            yield session
+
+    asyncio.run(set_up())
+    app.dependency_overrides[get_async_session] = get_test_session
+    app.dependency_overrides[get_current_user] = lambda: None
+
+    try:
+        # Not entered as a context manager: the lifespan, with its process pool, is not started
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.clear()
+        asyncio.run(engine.dispose())
+
+
+def test_get_image_samples_returns_ingest_metadata(client):
+    response = client.get('/api/v1/image-samples', params={'order_by': 'id'})
+
+    assert response.status_code == 200
+    items = response.json()['items']
+    assert [item['id'] for item in items] == [1, 2]
+    assert items[0] == {
+        'id': 1,
+        'location': 'images/a.nef',
+        'width': 6048,
+        'height': 4024,
+        'captured_at': '2024-05-01T12:30:00',
+        'camera_make': 'NIKON CORPORATION',
+        'camera_model': 'NIKON Z 6',
+        'lens': 'NIKKOR Z 24-70mm f/4 S',
+    }
+    assert items[1]['camera_model'] is None
+
+
+def test_get_image_samples_filters_by_camera_model(client):
+    response = client.get('/api/v1/image-samples', params={'search': '{"camera_model": "z 6"}'})
+
+    assert response.status_code == 200
+    assert [item['id'] for item in response.json()['items']] == [1]
+
+
+@pytest.mark.parametrize('if_none_match, expected', [
+    (None, False),
+    ('', False),
+    ('*', True),
+    ('"a.thumbnail"', True),
+    ('W/"a.thumbnail"', True),
+    ('"b.thumbnail", "a.thumbnail"', True),
+    ('"a.preview"', False),
+])
+def test_is_etag_matched(if_none_match, expected):
+    assert is_etag_matched(if_none_match, '"a.thumbnail"') is expected
+
+
+def test_get_thumbnail_is_cacheable(client):
+    response = client.get('/api/v1/image-samples/1/thumbnail')
+
+    assert response.status_code == 200
+    assert response.content == b'0123456789'
+    assert response.headers['etag'] == get_derivative_etag('a' * 64, 'thumbnail')
+    assert 'immutable' in response.headers['cache-control']
+
+    response = client.get('/api/v1/image-samples/1/thumbnail', headers={'If-None-Match': response.headers['etag']})
+
+    assert response.status_code == 304
+    assert response.content == b''
+
+
+def test_get_thumbnail_range(client):
+    etag = get_derivative_etag('a' * 64, 'thumbnail')
+    response = client.get('/api/v1/image-samples/1/thumbnail', headers={'Range': 'bytes=2-5', 'If-Range': etag})
+
+    assert response.status_code == 206
+    assert response.content == b'2345'
+
+    # Another version: the whole file
+    response = client.get('/api/v1/image-samples/1/thumbnail', headers={'Range': 'bytes=2-5', 'If-Range': '"x"'})
+
+    assert response.status_code == 200
+    assert response.content == b'0123456789'
+
+
+def test_get_missing_thumbnail(client):
+    assert client.get('/api/v1/image-samples/2/thumbnail').status_code == 404
+    # Not processed yet: there is nothing the wildcard could match
+    assert client.get('/api/v1/image-samples/2/thumbnail', headers={'If-None-Match': '*'}).status_code == 404
+    assert client.get('/api/v1/image-samples/3/thumbnail').status_code == 404
@@ -0,0 +1,52 @@
+from dataset_image_annotator.cache import LRUCache
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(10, len)
+    cache.put('a', 'xxxx')
+    cache.put('b', 'xxxx')
+
+    assert cache.get('a') == 'xxxx'
+
+    cache.put('c', 'xxxx')
+
+    assert 'b' not in cache
+    assert 'a' in cache and 'c' in cache
+    assert cache.size == 8
+
+
+def test_replacing_an_item_updates_the_size():
+    cache = LRUCache(10, len)
+    cache.put('a', 'xxxx')
+    cache.put('a', 'xx')
+
+    assert (len(cache), cache.size) == (1, 2)
+
+    cache.discard('a')
+    cache.discard('missing')
+
+    assert (len(cache), cache.size) == (0, 0)
+
+
+def test_oversized_items_are_not_cached():
+    cache = LRUCache(10, len)
+    cache.put('a', 'xxxx')
+    cache.put('a', 'x' * 11)
+
+    # Nor is the old value kept
+    assert 'a' not in cache
+    assert cache.size == 0
+
+
+def test_counts_hits_and_misses():
+    cache = LRUCache(10, len)
+    cache.put('a', 'x')
+
+    assert cache.get('a') == 'x'
+    assert cache.get('b', 'default') == 'default'
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert '50% hit rate' in cache.get_stats()
+
+    cache.clear()
+
+    assert (len(cache), cache.size) == (0, 0)
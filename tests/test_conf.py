@@ -0,0 +1,11 @@
+from pathlib import Path
+
+from dataset_image_annotator.conf import Settings
+
+
+def test_storage_dir_is_absolute(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('HOME', str(tmp_path / 'home'))
+
+    assert Settings(storage_dir='storage').storage_dir == str(tmp_path.resolve() / 'storage')
+    assert Settings(storage_dir='~/storage').storage_dir == str(Path(tmp_path, 'home', 'storage').resolve())
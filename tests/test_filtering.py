@@ -0,0 +1,44 @@
+from dataset_image_annotator.filtering import filter_file_names, parse_filter_query
+from dataset_image_annotator.vocabulary import VOCABULARY_FIELDS, VocabularyIndex
+
+
+def test_parse_filter_query():
+    assert parse_filter_query('Type:Car make~ford +color -body model: dsc_01', VOCABULARY_FIELDS) == [
+        ('=', 'type', 'car'),
+        ('~', 'make', 'ford'),
+        ('+', 'color', ''),
+        ('-', 'body', ''),
+        ('-', 'model', ''),
+        ('*', None, 'dsc_01'),
+    ]
+    assert parse_filter_query('  ', VOCABULARY_FIELDS) == []
+
+
+def test_parse_filter_query_unknown_fields_are_text():
+    assert parse_filter_query('-2ev +1 12:30 a~b - +', VOCABULARY_FIELDS) == [
+        ('*', None, '-2ev'),
+        ('*', None, '+1'),
+        ('*', None, '12:30'),
+        ('*', None, 'a~b'),
+        ('*', None, '-'),
+        ('*', None, '+'),
+    ]
+
+
+def test_filter_file_names():
+    index = VocabularyIndex.from_metadata({
+        'a.nef': {'type': 'car', 'make': 'ford'},
+        'b.nef': {'type': 'car'},
+        'c_-2ev.nef': {'type': 'bus', 'color': 'red'},
+    })
+    file_names = ['A.NEF', 'b.nef', 'c_-2ev.nef', 'd.nef']
+
+    assert filter_file_names('', index, file_names) is None
+    assert filter_file_names('type:car', index, file_names) == {'a.nef', 'b.nef'}
+    assert filter_file_names('type:car -make', index, file_names) == {'b.nef'}
+    assert filter_file_names('+color', index, file_names) == {'c_-2ev.nef'}
+    assert filter_file_names('make~or', index, file_names) == {'a.nef'}
+    assert filter_file_names('-2ev', index, file_names) == {'c_-2ev.nef'}
+    # Text matches file names and field values
+    assert filter_file_names('d.nef', index, file_names) == {'d.nef'}
+    assert filter_file_names('red', index, file_names) == {'c_-2ev.nef'}
@@ -0,0 +1,115 @@
+import asyncio
+import subprocess
+import sys
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from dataset_image_annotator.core import ingest
+
+
+class FakeExecutor:
+    """
+    Stands in for a process pool: each submit() returns the next of the given outcomes, a result or an exception.
+    """
+
+    def __init__(self, outcomes: list):
+        self.outcomes = outcomes
+        self.is_shut_down = False
+
+    def submit(self, func, *args):
+        future = Future()
+        outcome = self.outcomes.pop(0)
+
+        if isinstance(outcome, BaseException):
+            future.set_exception(outcome)
+        else:
+            future.set_result(outcome)
+
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.is_shut_down = True
+
+
+@pytest.fixture
+def processor(monkeypatch, storage_dir):
+    executors = []
+    saved = []
+
+    def create_executor(self):
+        return executors.pop(0)
+
+    async def save(self, image_sample_id, values):
+        saved.append((image_sample_id, values))
+
+    monkeypatch.setattr(ingest.IngestProcessor, 'create_executor', create_executor)
+    monkeypatch.setattr(ingest.IngestProcessor, 'save', save)
+
+    def make(*outcome_lists):
+        executors.extend(FakeExecutor(outcomes) for outcomes in outcome_lists)
+
+        async def run():
+            processor = ingest.IngestProcessor(max_pending=1)
+            first_executor = processor.executor
+            await processor.submit(1, '/data/a.nef', 'ab' * 32)
+            await asyncio.gather(*processor.tasks)
+            # The slot is free again whatever happened
+            assert not processor.slots.locked()
+
+            return processor, first_executor
+
+        processor, first_executor = asyncio.run(run())
+
+        return processor, first_executor, saved
+
+    return make
+
+
+def test_process_saves_metadata(processor):
+    processor, _, saved = processor([{'width': 6000, 'height': 4000}])
+
+    [(image_sample_id, values)] = saved
+    assert image_sample_id == 1
+    assert values['width'] == 6000
+    assert values['processing_error'] is None
+    assert values['processed_at'] is not None
+    assert values['thumbnail_location'].endswith('.thumbnail.jpg')
+
+
+def test_process_records_decoding_error(processor):
+    processor, _, saved = processor([ValueError('corrupt')])
+
+    [(_, values)] = saved
+    assert values['processing_error'] == "ValueError('corrupt')"
+    assert values['processed_at'] is not None
+
+
+def test_broken_pool_is_replaced_and_sample_retried(processor):
+    processor, first_executor, saved = processor([BrokenProcessPool()], [{'width': 10, 'height': 20}])
+
+    assert first_executor.is_shut_down
+    assert processor.executor is not first_executor
+    [(_, values)] = saved
+    assert values['width'] == 10
+    assert values['processing_error'] is None
+
+
+def test_sample_left_unprocessed_if_pool_keeps_breaking(processor):
+    processor, _, saved = processor([BrokenProcessPool()], [BrokenProcessPool()], [])
+
+    # Neither an error nor processed_at is recorded: submit_unprocessed() retries it on the next start
+    assert saved == []
+
+
+def test_worker_module_does_not_import_the_server():
+    # Spawned workers import process_image from a fresh interpreter
+    modules = subprocess.run(
+        [sys.executable, '-c', 'import sys, dataset_image_annotator.core.derivatives; print(*sys.modules)'],
+        capture_output=True, check=True, text=True
+    ).stdout.split()
+
+    assert 'dataset_image_annotator.api' not in modules
+    assert 'dataset_image_annotator.conf' not in modules
+    assert 'sqlalchemy' not in modules
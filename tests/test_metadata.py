@@ -0,0 +1,125 @@
+import json
+import os
+
+import pytest
+
+from dataset_image_annotator.metadata import (
+    METADATA_DB_FILE_NAME, MetadataWriter, SQLiteMetadataBackend, get_metadata_dir_path, load_metadata,
+    open_metadata_backend, save_metadata,
+)
+
+
+class FakeBackend:
+    def __init__(self):
+        self.saved = []
+        self.failing = set()
+
+    def save_many(self, records):
+        self.saved.append(dict(records))
+
+        return {file_name: OSError('Disk full') for file_name in records if file_name in self.failing}
+
+
+def test_writer_coalesces_changes_per_file():
+    backend = FakeBackend()
+    writer = MetadataWriter(backend)
+    writer.mark_dirty('A.NEF', {'type': 'car'})
+    writer.mark_dirty('a.nef', {'type': 'bus'})
+    writer.mark_dirty('b.nef', {})
+
+    assert len(writer) == 2
+    assert writer.flush() == {}
+    assert backend.saved == [{'a.nef': {'type': 'bus'}, 'b.nef': {}}]
+    assert (len(writer), writer.written_count, writer.flush_count) == (0, 2, 1)
+
+    # Nothing to write
+    assert writer.flush() == {}
+    assert writer.flush_count == 1
+
+
+def test_writer_keeps_failed_records_dirty():
+    backend = FakeBackend()
+    backend.failing.add('a.nef')
+    writer = MetadataWriter(backend)
+    writer.mark_dirty('a.nef', {'type': 'car'})
+    writer.mark_dirty('b.nef', {'type': 'car'})
+
+    assert set(writer.flush()) == {'a.nef'}
+    assert writer.dirty == {'a.nef': {'type': 'car'}}
+    assert writer.written_count == 1
+
+    backend.failing.clear()
+
+    assert writer.flush() == {}
+    assert backend.saved[-1] == {'a.nef': {'type': 'car'}}
+    assert len(writer) == 0
+
+
+def test_save_metadata_writes_one_file_per_image(tmp_path):
+    assert save_metadata(tmp_path, {'A.NEF': {'type': 'car'}, 'b.nef': {}}) == {}
+    metadata_dir_path = get_metadata_dir_path(tmp_path)
+
+    # No temporary files left behind
+    assert sorted(path.name for path in metadata_dir_path.iterdir()) == ['a.nef.json', 'b.nef.json']
+    assert json.loads((metadata_dir_path / 'a.nef.json').read_text()) == {'type': 'car'}
+    assert load_metadata(tmp_path) == {'a.nef': {'type': 'car'}, 'b.nef': {}}
+
+
+
+def test_save_metadata_syncs_files_before_renaming_them(tmp_path, monkeypatch):
+    calls = []
+    fsync = os.fsync
+    replace = os.replace
+
+    def record_fsync(fd):
+        calls.append('fsync')
+        fsync(fd)
+
+    def record_replace(src, dst):
+        calls.append('replace')
+        replace(src, dst)
+
+    monkeypatch.setattr(os, 'fsync', record_fsync)
+    monkeypatch.setattr(os, 'replace', record_replace)
+
+    assert save_metadata(tmp_path, {'a.nef': {}, 'b.nef': {}}) == {}
+    # Each file, then the directory once the files are in place
+    assert calls == ['fsync', 'fsync', 'replace', 'replace', 'fsync']
+
+@pytest.mark.parametrize('backend_name', ['json', 'sqlite'])
+def test_backend_round_trip(tmp_path, backend_name):
+    backend = open_metadata_backend(tmp_path, backend_name)
+
+    try:
+        assert backend.save_many({'A.NEF': {'type': 'car'}, 'b.nef': {'type': 'bus'}}) == {}
+        assert backend.save_many({'b.nef': {'type': 'van'}}) == {}
+        assert backend.load() == {'a.nef': {'type': 'car'}, 'b.nef': {'type': 'van'}}
+        assert backend.load_record('A.NEF') == {'type': 'car'}
+        assert backend.load_record('missing.nef') is None
+    finally:
+        backend.close()
+
+
+def test_sqlite_backend_imports_json_once(tmp_path):
+    save_metadata(tmp_path, {'a.nef': {'type': 'car'}})
+    backend = SQLiteMetadataBackend(tmp_path)
+
+    try:
+        assert (tmp_path / METADATA_DB_FILE_NAME).exists()
+        assert backend.load() == {'a.nef': {'type': 'car'}}
+    finally:
+        backend.close()
+
+    # Records saved as JSON later are not imported again
+    save_metadata(tmp_path, {'b.nef': {'type': 'bus'}})
+    backend = SQLiteMetadataBackend(tmp_path)
+
+    try:
+        assert backend.load() == {'a.nef': {'type': 'car'}}
+    finally:
+        backend.close()
+
+
+def test_open_unknown_backend(tmp_path):
+    with pytest.raises(ValueError, match='Unknown metadata backend'):
+        open_metadata_backend(tmp_path, 'xml')
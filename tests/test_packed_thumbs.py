@@ -0,0 +1,131 @@
+import os
+
+import pytest
+
+from dataset_image_annotator import packed_thumbs
+from dataset_image_annotator.packed_thumbs import PackedThumbnailStore, get_mtime_ms
+
+
+@pytest.fixture
+def image_path(tmp_path):
+    path = tmp_path / 'A.NEF'
+    path.write_bytes(b'raw')
+
+    return path
+
+
+def get_thumbnail(store: PackedThumbnailStore, path, preview: bool = False) -> bytes | None:
+    stat = path.stat()
+    data = store.get(path.name, get_mtime_ms(stat), stat.st_size, preview)
+
+    return bytes(data) if data is not None else None
+
+
+def test_put_and_get(tmp_path, image_path):
+    store = PackedThumbnailStore(tmp_path)
+    store.put(image_path, b'preview', b'thumb')
+
+    assert get_thumbnail(store, image_path) == b'thumb'
+    assert get_thumbnail(store, image_path, preview=True) == b'preview'
+    assert store.get('a.nef', 0, 3) is None
+
+    # Stale once the image changes
+    image_path.write_bytes(b'raw2')
+    assert get_thumbnail(store, image_path) is None
+
+
+def test_flush_saves_index(tmp_path, image_path):
+    store = PackedThumbnailStore(tmp_path)
+    store.put(image_path, b'preview', b'thumb')
+    store.flush()
+
+    assert get_thumbnail(PackedThumbnailStore(tmp_path), image_path) == b'thumb'
+
+
+def test_compact_drops_replaced_and_deleted_thumbnails(tmp_path, image_path):
+    other_path = tmp_path / 'b.nef'
+    other_path.write_bytes(b'raw')
+    store = PackedThumbnailStore(tmp_path)
+
+    for i in range(3):
+        store.put(image_path, b'preview%d' % i, b'thumb%d' % i)
+
+    store.put(other_path, b'other preview', b'other thumb')
+
+    assert store.get_sizes() == (len(b'preview2thumb2other previewother thumb'), 2 * len(b'preview0thumb0'))
+
+    store.compact()
+
+    assert store.get_sizes() == (len(b'preview2thumb2other previewother thumb'), 0)
+    assert get_thumbnail(store, image_path) == b'thumb2'
+    assert get_thumbnail(store, other_path, preview=True) == b'other preview'
+    assert get_thumbnail(PackedThumbnailStore(tmp_path), other_path) == b'other thumb'
+
+    store.compact(['b.nef'])
+
+    assert get_thumbnail(store, image_path) is None
+    assert get_thumbnail(store, other_path) == b'other thumb'
+    assert (tmp_path / packed_thumbs.PACK_FILE_NAME).stat().st_size == len(b'other previewother thumb')
+
+
+def test_flush_compacts_mostly_garbage_packs(tmp_path, image_path, monkeypatch):
+    monkeypatch.setattr(packed_thumbs, 'PACK_COMPACT_MIN_GARBAGE_SIZE', 10)
+    store = PackedThumbnailStore(tmp_path)
+    store.put(image_path, b'preview0', b'thumb0')
+    store.put(image_path, b'preview1', b'thumb1')
+    store.flush()
+
+    # Garbage as large as the live data is kept
+    assert store.get_sizes() == (14, 14)
+
+    store.put(image_path, b'preview2', b'thumb2')
+    store.flush()
+
+    assert store.get_sizes() == (14, 0)
+    assert get_thumbnail(store, image_path) == b'thumb2'
+
+
+def test_compact_keeps_thumbnails_put_while_copying(tmp_path, image_path, monkeypatch):
+    other_image_path = tmp_path / 'b.nef'
+    other_image_path.write_bytes(b'raw')
+    store = PackedThumbnailStore(tmp_path)
+    store.put(image_path, b'preview0', b'thumb0')
+    store.put(image_path, b'preview1', b'thumb1')
+    copy_entries = PackedThumbnailStore._copy_entries
+
+    def put_while_copying(src, dst, index, keep_names):
+        if 'b.nef' not in index:
+            # The lock is not held while the pack is copied: neither readers nor writers wait for it
+            assert get_thumbnail(store, image_path) == b'thumb1'
+            store.put(other_image_path, b'preview2', b'thumb2')
+
+        return copy_entries(src, dst, index, keep_names)
+
+    monkeypatch.setattr(PackedThumbnailStore, '_copy_entries', staticmethod(put_while_copying))
+    store.compact()
+
+    assert store.get_sizes() == (28, 0)
+    assert get_thumbnail(store, image_path) == b'thumb1'
+    assert get_thumbnail(store, other_image_path) == b'thumb2'
+    assert get_thumbnail(PackedThumbnailStore(tmp_path), other_image_path, preview=True) == b'preview2'
+
+
+def test_reader_reloads_index_saved_by_another_process(tmp_path, image_path, monkeypatch):
+    monkeypatch.setattr(packed_thumbs, 'PACK_INDEX_CHECK_INTERVAL', 0)
+    reader = PackedThumbnailStore(tmp_path)
+
+    assert get_thumbnail(reader, image_path) is None
+
+    writer = PackedThumbnailStore(tmp_path)
+    writer.put(image_path, b'preview', b'thumb')
+    writer.flush()
+    # Index mtimes of quick successive saves may be equal on coarse file systems
+    os.utime(writer.index_path, ns=(1, 1))
+
+    assert get_thumbnail(reader, image_path) == b'thumb'
+
+    writer.put(image_path, b'new preview', b'new thumb')
+    writer.compact()
+    os.utime(writer.index_path, ns=(2, 2))
+
+    assert get_thumbnail(reader, image_path) == b'new thumb'
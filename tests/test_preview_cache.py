@@ -0,0 +1,68 @@
+import hashlib
+import os
+
+from dataset_image_annotator.preview_cache import PreviewDiskCache, get_file_cache_key
+
+
+def list_cache_files(cache_dir_path):
+    return sorted(path.name for path in cache_dir_path.glob('??/*'))
+
+
+def test_put_and_get(tmp_path):
+    cache = PreviewDiskCache(tmp_path, 100)
+    cache.put('a', b'x' * 10)
+
+    assert cache.get('a') == b'x' * 10
+    assert cache.get('b') is None
+    assert (len(cache.files), cache.size, cache.hits, cache.misses) == (1, 10, 1, 1)
+    assert len(list_cache_files(tmp_path)) == 1
+    assert cache.get_stats().endswith('50% hit rate')
+
+
+def test_evicts_least_recently_used_files(tmp_path):
+    cache = PreviewDiskCache(tmp_path, 25)
+    cache.put('a', b'x' * 10)
+    cache.put('b', b'x' * 10)
+    cache.get('a')
+    cache.put('c', b'x' * 10)
+
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+    assert (len(list_cache_files(tmp_path)), cache.size) == (2, 20)
+
+
+def test_oversized_data_is_not_cached(tmp_path):
+    cache = PreviewDiskCache(tmp_path, 25)
+    cache.put('a', b'x' * 10)
+    cache.put('b', b'x' * 26)
+
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+
+
+def test_reopened_cache_evicts_oldest_files(tmp_path):
+    cache = PreviewDiskCache(tmp_path, 100)
+
+    # Recency is the file mtime, bumped on every hit
+    for mtime, key in enumerate(('old', 'newer', 'newest'), 1):
+        cache.put(key, b'x' * 10)
+        os.utime(cache.get_file_path(hashlib.sha1(key.encode()).hexdigest()), ns=(mtime, mtime))
+
+    reopened_cache = PreviewDiskCache(tmp_path, 25)
+
+    assert (len(reopened_cache.files), reopened_cache.size) == (2, 20)
+    assert len(list_cache_files(tmp_path)) == 2
+    assert reopened_cache.get('old') is None
+    assert reopened_cache.get('newer') is not None
+
+
+def test_file_cache_key_changes_with_the_file(tmp_path):
+    file_path = tmp_path / 'a.nef'
+    file_path.write_bytes(b'x')
+    key = get_file_cache_key(file_path)
+
+    assert get_file_cache_key(file_path, file_path.stat()) == key
+
+    file_path.write_bytes(b'xx')
+
+    assert get_file_cache_key(file_path) != key
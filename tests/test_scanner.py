@@ -0,0 +1,57 @@
+import hashlib
+
+from dataset_image_annotator.scanner import (
+    IMAGE_EXTENSIONS, get_file_checksum, has_extension, is_raw_file, parse_extensions, scan_dir_entries, scan_tree,
+)
+
+
+def test_parse_extensions():
+    assert parse_extensions('arw,.CR2, nef') == ('.arw', '.cr2', '.nef')
+    assert parse_extensions(['NEF', ' .dng ']) == ('.nef', '.dng')
+    assert parse_extensions(None) == IMAGE_EXTENSIONS
+    assert parse_extensions('') == IMAGE_EXTENSIONS
+    assert parse_extensions(' , ') == IMAGE_EXTENSIONS
+
+
+def test_extension_checks_ignore_case():
+    assert is_raw_file('DSC_0001.NEF')
+    assert not is_raw_file('DSC_0001.JPG')
+    assert has_extension('DSC_0001.JPG')
+    assert not has_extension('notes.txt')
+
+
+def test_scan_dir_entries(tmp_path):
+    (tmp_path / 'A.NEF').write_bytes(b'abc')
+    (tmp_path / 'b.jpg').write_bytes(b'')
+    (tmp_path / 'notes.txt').write_bytes(b'')
+    (tmp_path / 'sub.nef').mkdir()
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / '.thumbs').mkdir()
+    sub_dirs = []
+
+    entries = scan_dir_entries(tmp_path, ('.nef', '.jpg'), sub_dirs)
+
+    assert set(entries) == {'A.NEF', 'b.jpg'}
+    assert entries['A.NEF'] == ((tmp_path / 'A.NEF').stat().st_mtime_ns, 3)
+    assert sub_dirs == [tmp_path / 'sub']
+    assert scan_dir_entries(tmp_path / 'missing') == {}
+    assert scan_dir_entries(tmp_path / 'A.NEF') == {}
+
+
+def test_scan_tree(tmp_path):
+    for dir_name in ('b', 'a', 'a/c', '.hidden'):
+        (tmp_path / dir_name).mkdir()
+        (tmp_path / dir_name / 'x.nef').write_bytes(b'')
+
+    assert [dir_path for dir_path, _ in scan_tree(tmp_path, recursive=True)] == [
+        tmp_path, tmp_path / 'a', tmp_path / 'a' / 'c', tmp_path / 'b',
+    ]
+    assert all(set(entries) == {'x.nef'} for dir_path, entries in scan_tree(tmp_path / 'a', recursive=True))
+    assert [dir_path for dir_path, _ in scan_tree(tmp_path)] == [tmp_path]
+
+
+def test_get_file_checksum(tmp_path):
+    data = b'x' * ((1 << 20) + 1)
+    (tmp_path / 'a.nef').write_bytes(data)
+
+    assert get_file_checksum(tmp_path / 'a.nef') == hashlib.sha256(data).hexdigest()
@@ -0,0 +1,119 @@
+import pytest
+
+from dataset_image_annotator import thumbs
+from dataset_image_annotator.scanner import scan_dir_entries
+from dataset_image_annotator.similarity import (
+    BKTree, DHASH_SIZE, HASHES_FILE_NAME, collapse_file_names, compute_dhashes, get_group_members, group_similar,
+    update_image_hashes,
+)
+
+
+def flip_bits(value: int, count: int, start: int = 0) -> int:
+    return value ^ ((1 << count) - 1) << start
+
+
+def test_bk_tree_search_is_inclusive_of_max_distance():
+    tree = BKTree()
+
+    for distance in range(8):
+        tree.add(flip_bits(0, distance), f'd{distance}')
+
+    assert sorted(tree.search(0, 0)) == ['d0']
+    assert sorted(tree.search(0, 3)) == ['d0', 'd1', 'd2', 'd3']
+    assert sorted(tree.search(flip_bits(0, 7), 1)) == ['d6', 'd7']
+
+
+def test_bk_tree_keeps_items_with_equal_hashes():
+    tree = BKTree()
+    tree.add(0b1010, 'a')
+    tree.add(0b1010, 'b')
+
+    assert sorted(tree.search(0b1010, 0)) == ['a', 'b']
+    assert BKTree().search(0, 64) == []
+
+
+def test_group_similar_joins_transitively():
+    # a-b and b-c are within 4 bits, a-c is not: still one burst
+    hashes = {'c.nef': flip_bits(0, 8), 'a.nef': 0, 'b.nef': flip_bits(0, 4), 'far.nef': flip_bits(0, 32, 32)}
+
+    groups = group_similar(hashes, 4)
+
+    assert groups == {'a.nef': 'a.nef', 'b.nef': 'a.nef', 'c.nef': 'a.nef'}
+    assert {group: sorted(members) for group, members in get_group_members(groups).items()} == {
+        'a.nef': ['a.nef', 'b.nef', 'c.nef']
+    }
+
+
+def test_group_similar_distance_threshold():
+    hashes = {'a.nef': 0, 'b.nef': flip_bits(0, 5)}
+
+    assert group_similar(hashes, 4) == {}
+    assert group_similar(hashes, 5) == {'a.nef': 'a.nef', 'b.nef': 'a.nef'}
+    assert group_similar({'a.nef': 7, 'b.nef': 7}, 0) == {'a.nef': 'a.nef', 'b.nef': 'a.nef'}
+
+
+def test_collapse_file_names_keeps_first_of_each_group():
+    groups = {'a.nef': 'a.nef', 'b.nef': 'a.nef', 'x.nef': 'x.nef', 'y.nef': 'x.nef'}
+
+    assert collapse_file_names(['b.nef', 'a.nef', 'c.nef', 'y.nef', 'x.nef'], groups) == {'a.nef', 'c.nef', 'x.nef'}
+    # Filtered out representatives: the first remaining member stands in for the group
+    assert collapse_file_names(['b.nef', 'y.nef'], groups) == {'b.nef', 'y.nef'}
+
+
+def test_compute_dhashes():
+    pytest.importorskip('numpy')
+    rising = [list(range(DHASH_SIZE + 1))] * DHASH_SIZE
+    falling = [list(reversed(range(DHASH_SIZE + 1)))] * DHASH_SIZE
+
+    assert compute_dhashes([rising, falling]) == [(1 << 64) - 1, 0]
+    assert compute_dhashes([]) == []
+
+
+def test_update_image_hashes_reuses_stored_hashes(tmp_path, monkeypatch):
+    pytest.importorskip('numpy')
+    Image = pytest.importorskip('PIL.Image')
+    thumbnail_dir_path = thumbs.get_thumbnail_dir_path(tmp_path)
+    thumbnail_dir_path.mkdir()
+
+    for file_name, color in (('a.png', 'white'), ('b.png', 'black')):
+        Image.new('RGB', (64, 48), color).save(tmp_path / file_name)
+        thumbs.generate_thumbnail(thumbnail_dir_path, tmp_path / file_name)
+
+    Image.new('RGB', (64, 48)).save(tmp_path / 'no_thumbnail.png')
+    entries = scan_dir_entries(tmp_path, ('.png',))
+
+    hashes = update_image_hashes(tmp_path, entries)
+
+    assert set(hashes) == {'a.png', 'b.png'}
+    assert (thumbnail_dir_path / HASHES_FILE_NAME).exists()
+
+    def load_dhash_image(thumbnail_data):
+        raise AssertionError('Hashed again')
+
+    monkeypatch.setattr('dataset_image_annotator.similarity.load_dhash_image', load_dhash_image)
+
+    assert update_image_hashes(tmp_path, {'a.png': entries['a.png']}) == {'a.png': hashes['a.png']}
+
+
+def test_read_thumbnail_data_opens_no_store_for_loose_thumbnails(tmp_path, monkeypatch):
+    thumbnail_dir_path = thumbs.get_thumbnail_dir_path(tmp_path)
+    thumbnail_dir_path.mkdir()
+    image_path = tmp_path / 'a.nef'
+    image_path.write_bytes(b'raw')
+    stat = image_path.stat()
+    source_entry = (stat.st_mtime_ns, stat.st_size)
+    thumbs.get_preview_path(thumbnail_dir_path, image_path).write_bytes(b'loose preview')
+    thumbs.get_thumbnail_path(thumbnail_dir_path, image_path).write_bytes(b'loose thumb')
+
+    def open_packed_store(thumbnail_dir_path):
+        raise AssertionError('Store opened')
+
+    monkeypatch.setattr(thumbs, 'open_packed_store', open_packed_store)
+
+    assert thumbs.read_thumbnail_data(thumbnail_dir_path, image_path, source_entry) == b'loose thumb'
+
+    monkeypatch.undo()
+    thumbs.open_packed_store(thumbnail_dir_path).put(image_path, b'packed preview', b'packed thumb')
+
+    assert thumbs.read_thumbnail_data(thumbnail_dir_path, image_path, source_entry, packed=True) == b'packed thumb'
+    assert thumbs.read_thumbnail_data(thumbnail_dir_path, tmp_path / 'b.nef', source_entry, packed=True) is None
@@ -0,0 +1,37 @@
+import asyncio
+import hashlib
+
+import pytest
+
+from dataset_image_annotator.core.storage import TMP_DIR_NAME, get_image_location, store_stream
+
+
+async def iter_data(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+def test_store_stream_dedups_identical_content(storage_dir):
+    checksum, location, size = asyncio.run(store_stream(iter_data(b'ab', b'cd'), '.NEF'))
+
+    assert checksum == hashlib.sha256(b'abcd').hexdigest()
+    assert location == get_image_location(checksum, '.nef')
+    assert location.read_bytes() == b'abcd'
+    assert size == 4
+
+    # The same content in other chunks, under another suffix case
+    assert asyncio.run(store_stream(iter_data(b'abcd'), '.nef')) == (checksum, location, size)
+    assert [path for path in (storage_dir / 'images').rglob('*') if path.is_file()] == [location]
+    assert list((storage_dir / TMP_DIR_NAME).iterdir()) == []
+
+
+def test_store_stream_removes_partial_file_on_error(storage_dir):
+    async def iter_failing_data():
+        yield b'ab'
+        raise ConnectionError('Client went away')
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(store_stream(iter_failing_data(), '.nef'))
+
+    assert list((storage_dir / TMP_DIR_NAME).iterdir()) == []
+    assert not (storage_dir / 'images').exists()
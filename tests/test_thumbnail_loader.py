@@ -0,0 +1,105 @@
+import os
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('PySide6')
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PySide6.QtWidgets import QApplication  # noqa: E402
+
+from dataset_image_annotator import thumbs  # noqa: E402
+from dataset_image_annotator.__main__ import ThumbnailLoader  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def generated(monkeypatch):
+    calls = []
+
+    def generate_thumbnail(thumbnail_dir_path, path, packed=False):
+        calls.append((path.name, threading.current_thread() is threading.main_thread()))
+
+        if path.name.startswith('broken'):
+            raise ValueError('Unsupported file')
+
+    monkeypatch.setattr(thumbs, 'generate_thumbnail', generate_thumbnail)
+
+    return calls
+
+
+def wait_for(app, loader: ThumbnailLoader, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+
+    # The results are queued to the GUI thread, which delivers them while processing events
+    while loader.pending:
+        assert time.monotonic() < deadline, 'Thumbnails not generated in time'
+        app.processEvents()
+        time.sleep(0.01)
+
+
+def test_thumbnails_are_generated_off_the_gui_thread(app, generated, tmp_path):
+    loader = ThumbnailLoader()
+    ready = []
+    loader.thumbnail_ready.connect(ready.append)
+    file_paths = [str(tmp_path / f'{i}.nef') for i in range(4)]
+
+    for file_path in file_paths:
+        loader.request(file_path)
+        # Asked again while pending, e.g. by the next repaint
+        loader.request(file_path)
+
+    wait_for(app, loader)
+
+    assert sorted(ready) == sorted(file_paths)
+    assert len(generated) == 4
+    assert not any(is_main_thread for _, is_main_thread in generated)
+
+
+def test_failed_thumbnails_are_not_requested_again(app, generated, tmp_path):
+    loader = ThumbnailLoader()
+    ready = []
+    loader.thumbnail_ready.connect(ready.append)
+    file_path = str(tmp_path / 'broken.nef')
+
+    loader.request(file_path)
+    wait_for(app, loader)
+    loader.request(file_path)
+    wait_for(app, loader)
+
+    assert ready == []
+    assert loader.failed == {file_path}
+    assert len(generated) == 1
+
+    # The file has changed on disk
+    loader.refresh(file_path)
+    wait_for(app, loader)
+
+    assert len(generated) == 2
+
+
+def test_packed_store_is_flushed_off_the_gui_thread(app, generated, tmp_path, monkeypatch):
+    flushed = []
+
+    class FakeStore:
+        def is_fresh(self, file_name, mtime_ms, size):
+            return False
+
+        def flush(self):
+            flushed.append(threading.current_thread() is threading.main_thread())
+
+    monkeypatch.setattr('dataset_image_annotator.__main__.open_packed_store', lambda thumbnail_dir_path: FakeStore())
+    monkeypatch.setattr(thumbs, 'open_packed_store', lambda thumbnail_dir_path: FakeStore())
+    loader = ThumbnailLoader(packed=True)
+    (tmp_path / 'a.nef').write_bytes(b'raw')
+
+    loader.request(str(tmp_path / 'a.nef'))
+    wait_for(app, loader)
+    loader.thread_pool.waitForDone()
+
+    assert flushed == [False]
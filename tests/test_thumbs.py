@@ -0,0 +1,44 @@
+import os
+
+import pytest
+
+from dataset_image_annotator import thumbs
+
+
+def test_write_file_replaces_the_whole_file(tmp_path):
+    path = tmp_path / 'a.nef.jpg'
+    path.write_bytes(b'old thumbnail')
+
+    thumbs.write_file(path, b'new')
+
+    assert path.read_bytes() == b'new'
+    assert os.listdir(tmp_path) == ['a.nef.jpg']
+
+
+def test_write_file_keeps_the_old_file_on_error(tmp_path, monkeypatch):
+    path = tmp_path / 'a.nef.jpg'
+    path.write_bytes(b'old thumbnail')
+
+    def replace(src, dst):
+        raise OSError('Disk full')
+
+    monkeypatch.setattr(os, 'replace', replace)
+
+    with pytest.raises(OSError):
+        thumbs.write_file(path, b'new')
+
+    assert path.read_bytes() == b'old thumbnail'
+    assert os.listdir(tmp_path) == ['a.nef.jpg']
+
+
+def test_generate_loose_thumbnail(tmp_path):
+    Image = pytest.importorskip('PIL.Image')
+    thumbnail_dir_path = thumbs.get_thumbnail_dir_path(tmp_path)
+    thumbnail_dir_path.mkdir()
+    image_path = tmp_path / 'A.png'
+    Image.new('RGB', (160, 120), 'white').save(image_path)
+
+    thumbs.generate_thumbnail(thumbnail_dir_path, image_path)
+
+    assert sorted(os.listdir(thumbnail_dir_path)) == ['a.png.jpg', 'anon_A.png.jpg']
+    assert thumbs.is_thumbnail_fresh(thumbnail_dir_path, image_path)
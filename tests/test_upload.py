@@ -0,0 +1,116 @@
+import asyncio
+import hashlib
+
+from dataset_image_annotator.upload import UploadJournal, iter_checksum_batches, list_upload_files, upload_files
+
+
+class FakeClient:
+    def __init__(self, existing_checksums: set[str]):
+        self.existing_checksums = existing_checksums
+        self.checked_batch_sizes = []
+        self.uploaded = []
+
+    async def get_existing_checksums(self, checksums):
+        self.checked_batch_sizes.append(len(checksums))
+
+        return self.existing_checksums & set(checksums)
+
+    async def upload_raw_file(self, file_path, checksum=None):
+        self.uploaded.append((file_path.name, checksum))
+
+
+def test_iter_checksum_batches():
+    batches = list(iter_checksum_batches(range(100), 8, 32))
+
+    assert [len(batch) for batch in batches] == [8, 16, 32, 32, 12]
+    assert [item for batch in batches for item in batch] == list(range(100))
+    assert list(iter_checksum_batches([], 8, 32)) == []
+
+
+def test_upload_files_skips_journaled_and_existing_files(tmp_path):
+    for i in range(20):
+        (tmp_path / f'{i:02}.nef').write_bytes(f'image {i}'.encode())
+
+    journal = UploadJournal(tmp_path / '.uploaded.jsonl')
+    files = list_upload_files(tmp_path, ('.nef',))
+    journal.add('00.nef', files[0][1])
+    client = FakeClient({hashlib.sha256(b'image 1').hexdigest()})
+
+    stats = asyncio.run(upload_files(client, tmp_path, files, journal, concurrency=2))
+    journal.close()
+
+    assert (stats.skipped_count, stats.existing_count, stats.uploaded_count, stats.failed_count) == (1, 1, 18, 0)
+    # A small first batch, so uploads start early
+    assert client.checked_batch_sizes == [8, 11]
+    assert sorted(name for name, _ in client.uploaded) == [f'{i:02}.nef' for i in range(2, 20)]
+    assert all(checksum == hashlib.sha256(f'image {int(name[:2])}'.encode()).hexdigest()
+               for name, checksum in client.uploaded)
+    journal = UploadJournal(tmp_path / '.uploaded.jsonl')
+    journal.close()
+    assert len(journal.entries) == 20
+
+
+
+class BrokenResponseClient(FakeClient):
+    async def get_existing_checksums(self, checksums):
+        raise KeyError('checksums')
+
+    async def upload_raw_file(self, file_path, checksum=None):
+        if file_path.name == '01.nef':
+            raise ValueError('Expecting value: line 1 column 1 (char 0)')
+
+        await super().upload_raw_file(file_path, checksum)
+
+
+def test_upload_files_continues_after_unexpected_errors(tmp_path):
+    for i in range(4):
+        (tmp_path / f'{i:02}.nef').write_bytes(f'image {i}'.encode())
+
+    journal = UploadJournal(tmp_path / '.uploaded.jsonl')
+    client = BrokenResponseClient(set())
+
+    stats = asyncio.run(upload_files(client, tmp_path, list_upload_files(tmp_path, ('.nef',)), journal, concurrency=2))
+    journal.close()
+
+    assert (stats.uploaded_count, stats.failed_count) == (3, 1)
+    assert sorted(name for name, _ in client.uploaded) == ['00.nef', '02.nef', '03.nef']
+    # Retried by the next run
+    assert set(journal.entries) == {'00.nef', '02.nef', '03.nef'}
+
+def test_upload_journal_survives_reopening(tmp_path):
+    journal_path = tmp_path / 'journal.jsonl'
+    journal = UploadJournal(journal_path)
+    journal.add('a.nef', (1, 10))
+    journal.add('sub/b.nef', [2, 20])
+    journal.close()
+
+    journal = UploadJournal(journal_path)
+
+    try:
+        assert journal.entries == {'a.nef': (1, 10), 'sub/b.nef': (2, 20)}
+        assert journal.is_uploaded('sub/b.nef', [2, 20])
+        # Changed since
+        assert not journal.is_uploaded('a.nef', (3, 10))
+        assert not journal.is_uploaded('a.nef', (1, 11))
+        assert not journal.is_uploaded('c.nef', (1, 10))
+    finally:
+        journal.close()
+
+
+def test_upload_journal_skips_torn_line(tmp_path):
+    journal_path = tmp_path / 'journal.jsonl'
+    journal_path.write_text('{"path": "a.nef", "mtime_ns": 1, "size": 10}\n{"path": "b.n')
+
+    journal = UploadJournal(journal_path)
+
+    try:
+        assert journal.entries == {'a.nef': (1, 10)}
+        journal.add('c.nef', (3, 30))
+    finally:
+        journal.close()
+
+    # Not appended to the torn line
+    journal = UploadJournal(journal_path)
+    journal.close()
+
+    assert journal.entries == {'a.nef': (1, 10), 'c.nef': (3, 30)}
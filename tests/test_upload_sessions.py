@@ -0,0 +1,150 @@
+import asyncio
+import hashlib
+import os
+import time
+import uuid
+
+import pytest
+
+from dataset_image_annotator.core import upload_handler, upload_sessions
+from dataset_image_annotator.core.storage import get_image_location
+
+DATA = b'0123456789'
+CHECKSUM = hashlib.sha256(DATA).hexdigest()
+
+
+async def iter_data(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+def create(filename: str = 'a.nef', size: int = len(DATA), checksum: str | None = CHECKSUM) -> dict:
+    return asyncio.run(upload_sessions.create_upload_session(filename, size, checksum))
+
+
+def write(upload_session: dict, offset: int, *chunks: bytes) -> dict:
+    return asyncio.run(upload_sessions.write_upload_chunk(uuid.UUID(upload_session['id']), offset,
+                                                          iter_data(*chunks)))
+
+
+def read_data(upload_session: dict) -> bytes:
+    session_dir_path = upload_sessions.get_session_dir_path(uuid.UUID(upload_session['id']))
+
+    return (session_dir_path / upload_sessions.DATA_FILE_NAME).read_bytes()
+
+
+@pytest.fixture(autouse=True)
+def clear_locks(storage_dir, monkeypatch):
+    monkeypatch.setattr(upload_sessions, '_session_locks', {})
+
+
+def test_chunks_are_appended():
+    upload_session = create()
+
+    assert write(upload_session, 0, DATA[:4])['offset'] == 4
+    assert write(upload_session, 4, DATA[4:6], DATA[6:])['offset'] == 10
+    assert read_data(upload_session) == DATA
+
+
+def test_retried_chunk_truncates_what_followed_it():
+    upload_session = create()
+    write(upload_session, 0, b'012345')
+
+    # The response to the chunk at 3 got lost, it is sent again
+    assert write(upload_session, 3, b'345')['offset'] == 6
+    assert read_data(upload_session) == b'012345'
+
+
+def test_offset_past_received_data_is_rejected():
+    upload_session = create()
+    write(upload_session, 0, b'012')
+
+    with pytest.raises(ValueError, match='past'):
+        write(upload_session, 4, b'4')
+
+
+def test_data_past_declared_size_is_rejected():
+    upload_session = create()
+
+    with pytest.raises(ValueError, match='declared'):
+        write(upload_session, 0, DATA, b'!')
+
+    assert len(read_data(upload_session)) <= len(DATA)
+
+
+def test_unknown_session_does_not_leave_a_lock():
+    session_id = uuid.uuid4()
+
+    with pytest.raises(LookupError):
+        asyncio.run(upload_sessions.write_upload_chunk(session_id, 0, iter_data(b'x')))
+
+    with pytest.raises(LookupError):
+        asyncio.run(upload_sessions.finalize_upload_session(None, session_id, CHECKSUM))
+
+    assert upload_sessions._session_locks == {}
+
+
+def test_same_file_resumes_the_unfinished_session():
+    upload_session = create()
+    write(upload_session, 0, DATA[:7])
+
+    resumed_session = create()
+
+    assert resumed_session['id'] == upload_session['id']
+    assert resumed_session['offset'] == 7
+    # Another checksum is another file
+    assert create(checksum='f' * 64)['id'] != upload_session['id']
+
+
+def test_finalize_stores_file_by_checksum(monkeypatch):
+    added = []
+
+    async def add_image_sample(session, filename, checksum, location, size):
+        added.append((filename, checksum, location, size))
+
+    monkeypatch.setattr(upload_handler, 'add_image_sample', add_image_sample)
+    upload_session = create()
+    write(upload_session, 0, DATA)
+    asyncio.run(upload_sessions.finalize_upload_session(None, uuid.UUID(upload_session['id'])))
+
+    location = get_image_location(CHECKSUM, '.nef')
+    assert added == [('a.nef', CHECKSUM, location, len(DATA))]
+    assert location.read_bytes() == DATA
+
+    with pytest.raises(LookupError):
+        asyncio.run(upload_sessions.get_upload_session(uuid.UUID(upload_session['id'])))
+
+
+def test_finalize_discards_file_with_wrong_checksum():
+    upload_session = create(checksum=hashlib.sha256(b'something else').hexdigest())
+    write(upload_session, 0, DATA)
+
+    with pytest.raises(ValueError, match='Checksum mismatch'):
+        asyncio.run(upload_sessions.finalize_upload_session(None, uuid.UUID(upload_session['id'])))
+
+    with pytest.raises(LookupError):
+        asyncio.run(upload_sessions.get_upload_session(uuid.UUID(upload_session['id'])))
+
+    assert not get_image_location(CHECKSUM, '.nef').exists()
+
+
+def test_finalize_rejects_incomplete_file():
+    upload_session = create()
+    write(upload_session, 0, DATA[:5])
+
+    with pytest.raises(ValueError, match='Only 5 of 10'):
+        asyncio.run(upload_sessions.finalize_upload_session(None, uuid.UUID(upload_session['id'])))
+
+
+def test_stale_sessions_are_removed():
+    stale_session = create('stale.nef')
+    fresh_session = create('fresh.nef')
+    stale_dir_path = upload_sessions.get_session_dir_path(uuid.UUID(stale_session['id']))
+    old = time.time() - 2 * 3600
+
+    for path in (stale_dir_path, stale_dir_path / upload_sessions.DATA_FILE_NAME):
+        os.utime(path, (old, old))
+
+    assert upload_sessions.remove_stale_upload_sessions(3600) == 1
+    assert not stale_dir_path.exists()
+    assert asyncio.run(upload_sessions.get_upload_session(uuid.UUID(fresh_session['id'])))['filename'] == 'fresh.nef'
@@ -0,0 +1,48 @@
+import json
+
+from dataset_image_annotator.vocabulary import VocabularyIndex, get_vocabulary_path, load_vocabulary, save_vocabulary
+
+
+def test_update_record_returns_changed_fields():
+    index = VocabularyIndex.from_metadata({'a.nef': {'type': 'car'}, 'b.nef': {'type': 'car', 'color': 'red'}})
+
+    assert index.update_record('a.nef', {'type': 'car'}) == set()
+    assert index.update_record('a.nef', {'type': 'bus'}) == {'type'}
+    assert index.get_values('type') == ['bus', 'car']
+    assert index.update_record('b.nef', None) == {'type', 'color'}
+    assert index.get_values('color') == []
+    assert index.get_files('type', 'car') == set()
+
+
+def test_get_values_by_frequency():
+    index = VocabularyIndex.from_metadata({'a.nef': {'make': 'b'}, 'b.nef': {'make': 'a'}, 'c.nef': {'make': 'b'}})
+
+    assert index.get_values('make') == ['b', 'a']
+    assert index.find_files('make', 'b') == {'a.nef', 'c.nef'}
+
+
+def test_save_and_load_vocabulary(tmp_path):
+    index = VocabularyIndex.from_metadata({'a.nef': {'type': 'car'}, 'b.nef': {'type': 'bus'}})
+    entries = {'a.nef.json': (1, 10), 'b.nef.json': (2, 20)}
+
+    save_vocabulary(tmp_path, index, entries)
+    loaded_index, loaded_entries = load_vocabulary(tmp_path)
+
+    assert loaded_entries == entries
+    assert loaded_index.values == index.values
+    assert loaded_index.get_files('type', 'car') == {'a.nef'}
+
+
+def test_load_vocabulary_ignores_unusable_files(tmp_path):
+    assert load_vocabulary(tmp_path) is None
+
+    get_vocabulary_path(tmp_path).write_text('{')
+    assert load_vocabulary(tmp_path) is None
+
+    # Saved for other fields
+    save_vocabulary(tmp_path, VocabularyIndex(('type',)), {})
+    assert load_vocabulary(tmp_path) is None
+    assert load_vocabulary(tmp_path, ('type',)) is not None
+
+    get_vocabulary_path(tmp_path).write_text(json.dumps({'fields': ['type'], 'entries': {'a.json': 1}, 'values': {}}))
+    assert load_vocabulary(tmp_path, ('type',)) is None
@@ -0,0 +1,35 @@
+import os
+
+from dataset_image_annotator.watch import DirectorySnapshot
+
+
+def test_refresh_reports_added_removed_and_modified_files(tmp_path):
+    for name in ('a.nef', 'b.nef', 'c.nef', 'notes.txt'):
+        (tmp_path / name).write_bytes(b'x')
+
+    snapshot = DirectorySnapshot(tmp_path, ('.nef',))
+
+    assert set(snapshot.entries) == {'a.nef', 'b.nef', 'c.nef'}
+    assert snapshot.refresh() == ((), (), ())
+
+    (tmp_path / 'a.nef').unlink()
+    (tmp_path / 'b.nef').write_bytes(b'xx')
+    os.utime(tmp_path / 'c.nef', ns=(1, 1))
+    (tmp_path / 'D.NEF').write_bytes(b'x')
+    (tmp_path / 'more.txt').write_bytes(b'x')
+
+    added, removed, modified = snapshot.refresh()
+
+    assert (added, removed, sorted(modified)) == (('D.NEF',), ('a.nef',), ['b.nef', 'c.nef'])
+    assert snapshot.refresh() == ((), (), ())
+
+
+def test_missing_directory_is_empty(tmp_path):
+    snapshot = DirectorySnapshot(tmp_path / 'missing', ('.json',))
+
+    assert snapshot.entries == {}
+
+    (tmp_path / 'missing').mkdir()
+    (tmp_path / 'missing' / 'a.nef.json').write_text('{}')
+
+    assert snapshot.refresh() == (('a.nef.json',), (), ())